@@ -0,0 +1,235 @@
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.http import Http404, HttpResponse
+from django.urls import resolve
+from django.utils.cache import get_conditional_response
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from foodgram.metrics import track_queries
+from .authentication import CachedTokenAuthentication
+from .cache import CachedReadMixin, get_user_flags
+from .paginators import LimitPageNumberPaginator
+from .serializers import SubscriptionSerializer
+from .views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
+                    TagViewSet)
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def run_in_thread(func, *args, **kwargs):
+    """Выполняет синхронный вызов в пуле потоков.
+
+    Вызовы не привязаны к общему потоку Django, поэтому независимые
+    запросы к БД и кешу идут параллельно. Соединение с БД потока
+    закрывается (при пуле - возвращается в него) после вызова.
+    """
+    def call():
+        try:
+            with track_queries():
+                return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(call, thread_sensitive=False)()
+
+
+def json_response(data, status=200, headers=None):
+    return HttpResponse(
+        JSONRenderer().render(data),
+        content_type='application/json',
+        status=status,
+        headers=headers,
+    )
+
+
+def error_response(error):
+    headers = None
+    if isinstance(error, (exceptions.AuthenticationFailed,
+                          exceptions.NotAuthenticated)):
+        headers = {'WWW-Authenticate': CachedTokenAuthentication.keyword}
+    return json_response(
+        {'detail': error.detail}, status=error.status_code, headers=headers
+    )
+
+
+async def call_sync_view(request):
+    """Передает запрос синхронному представлению из ROOT_URLCONF."""
+    match = resolve(request.path_info, urlconf=settings.ROOT_URLCONF)
+    request.resolver_match = match
+    return await run_in_thread(
+        match.func, request, *match.args, **match.kwargs
+    )
+
+
+async def authenticate(request):
+    """Пользователь по токену или AnonymousUser."""
+    result = await run_in_thread(
+        CachedTokenAuthentication().authenticate, request
+    )
+    return AnonymousUser() if result is None else result[0]
+
+
+def read_view(view):
+    """Асинхронное чтение JSON, остальное - синхронному представлению.
+
+    Представление не занимает поток на время ожидания: аутентификация,
+    версии кеша, общий ответ и флаги пользователя получаются
+    параллельно в пуле потоков. Запросы других методов и форматов, а
+    также промахи кеша обслуживают представления DRF из ROOT_URLCONF.
+    Представление получает запрос DRF с пользователем по токену.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if (
+            request.method not in READ_METHODS
+            or 'text/html' in request.headers.get('Accept', '')
+            or 'format' in request.GET
+        ):
+            return await call_sync_view(request)
+        try:
+            user = await authenticate(request)
+        except exceptions.APIException as error:
+            return error_response(error)
+        drf_request = Request(request)
+        drf_request.user = user
+        try:
+            return await view(drf_request, *args, **kwargs)
+        except exceptions.APIException as error:
+            return error_response(error)
+
+    # csrf_exempt в Django 3.2 превращает представление в синхронное.
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+async def gather_user_flags(view, user):
+    if not user.is_authenticated or not view.user_flag_kinds:
+        return None
+    flags = await asyncio.gather(*(
+        run_in_thread(get_user_flags, user.id, kind)
+        for kind in view.user_flag_kinds
+    ))
+    return dict(zip(view.user_flag_kinds, flags))
+
+
+async def conditional_read(request, view, build_response):
+    """Асинхронный аналог CachedReadMixin.conditional_response()."""
+    view.request = request
+    key, etag, last_modified = await run_in_thread(
+        view.get_validators, request
+    )
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = await build_response(key)
+    view.set_validators(response, request, etag, last_modified)
+    return response
+
+
+def build_shared_response(view, request, key):
+    """Промах общего кеша: ответ действия DRF без повторной диспетчеризации.
+
+    Пользователь и валидаторы уже получены, поэтому в потоке выполняются
+    только проверка прав и само действие, результат попадает в кеш.
+    """
+    view.check_permissions(request)
+    handler = getattr(super(CachedReadMixin, view), view.action)
+    try:
+        return view.get_shared_response(key, handler, request, **view.kwargs)
+    except Http404:
+        raise exceptions.NotFound()
+
+
+async def cached_read(request, viewset, action, **kwargs):
+    """Ответ из общего кеша CachedReadMixin с флагами пользователя."""
+    view = viewset(action=action, kwargs=kwargs, format_kwarg=None)
+    if not view.is_cacheable(request):
+        return await call_sync_view(request._request)
+
+    async def build_response(key):
+        data, flags = await asyncio.gather(
+            run_in_thread(cache.get, key),
+            gather_user_flags(view, request.user),
+        )
+        if data is None:
+            response = await run_in_thread(
+                build_shared_response, view, request, key
+            )
+            return json_response(response.data, status=response.status_code)
+        if flags is not None:
+            data = view.overlay_user_data(data, flags)
+        return json_response(data)
+
+    return await conditional_read(request, view, build_response)
+
+
+@read_view
+async def recipe_list(request):
+    return await cached_read(request, RecipeViewSet, 'list')
+
+
+@read_view
+async def recipe_detail(request, pk):
+    return await cached_read(request, RecipeViewSet, 'retrieve', pk=pk)
+
+
+@read_view
+async def tag_list(request):
+    return await cached_read(request, TagViewSet, 'list')
+
+
+@read_view
+async def tag_detail(request, pk):
+    return await cached_read(request, TagViewSet, 'retrieve', pk=pk)
+
+
+@read_view
+async def ingredient_list(request):
+    view = IngredientViewSet(action='list', kwargs={}, format_kwarg=None)
+
+    async def build_response(key):
+        # Индекс в памяти или, пока он недоступен, запрос к БД.
+        response = await run_in_thread(view.search, key, request)
+        return json_response(response.data)
+
+    return await conditional_read(request, view, build_response)
+
+
+@read_view
+async def ingredient_detail(request, pk):
+    return await cached_read(request, IngredientViewSet, 'retrieve', pk=pk)
+
+
+@read_view
+async def subscriptions(request):
+    """Подписки с пагинацией LimitPageNumberPaginator.
+
+    Страница, включая page=last, и ссылки на соседние страницы те же,
+    что у синхронного представления.
+    """
+    if not request.user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    view = CustomUserViewSet(
+        action='subscriptions', kwargs={}, format_kwarg=None
+    )
+    view.request = request
+
+    def get_page():
+        paginator = LimitPageNumberPaginator()
+        authors = paginator.paginate_queryset(
+            view.get_subscriptions_queryset(request), request, view=view
+        )
+        return paginator.get_paginated_response(SubscriptionSerializer(
+            authors, many=True, context={'request': request}
+        ).data).data
+
+    return json_response(await run_in_thread(get_page))
@@ -0,0 +1,65 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from rest_framework.authentication import TokenAuthentication
+
+TOKEN_KEY = 'api:token:{}'
+# Поля снимка пользователя: без пароля и часто меняющихся счетчиков.
+SNAPSHOT_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name',
+    'is_active', 'is_staff', 'is_superuser',
+)
+
+
+def get_token_cache_key(key):
+    # Сам токен в ключ кеша не попадает.
+    return TOKEN_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def invalidate_tokens(*keys):
+    cache.delete_many([get_token_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication со снимком пользователя в общем кеше.
+
+    При попадании в кеш запрос к БД не выполняется: пользователь
+    собирается из снимка, остальные поля модели отложены и загружаются
+    при первом обращении. Снимок удаляют сигналы при удалении токена
+    и любом изменении пользователя, кроме обновления last_login.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = get_token_cache_key(key)
+        snapshot = cache.get(cache_key)
+        if snapshot is None:
+            user, token = super().authenticate_credentials(key)
+            if settings.TOKEN_CACHE_TIMEOUT:
+                cache.set(
+                    cache_key,
+                    {name: getattr(user, name) for name in SNAPSHOT_FIELDS},
+                    settings.TOKEN_CACHE_TIMEOUT,
+                )
+            return user, token
+        user_model = get_user_model()
+        # from_db ждет значения в порядке полей модели.
+        names = [
+            field.attname for field in user_model._meta.concrete_fields
+            if field.attname in snapshot
+        ]
+        user = user_model.from_db(
+            router.db_for_read(user_model),
+            names,
+            [snapshot[name] for name in names],
+        )
+        token_model = self.get_model()
+        token = token_model.from_db(
+            router.db_for_read(token_model),
+            ('key', 'user_id'),
+            (key, user.pk),
+        )
+        token.user = user
+        return user, token
@@ -0,0 +1,208 @@
+import copy
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscribe
+
+VERSION_KEY = 'api:version:{}'
+RESPONSE_KEY = 'api:response:{}'
+USER_FLAGS_KEY = 'api:flags:{}:{}'
+USER_FLAGS_VERSION = 'flags:{}:{}'
+
+USER_FLAG_QUERIES = {
+    'favorites': lambda user_id: Favorite.objects.filter(
+        user_id=user_id
+    ).values_list('recipe_id', flat=True),
+    'shopping_cart': lambda user_id: ShoppingCart.objects.filter(
+        user_id=user_id
+    ).values_list('recipe_id', flat=True),
+    'subscriptions': lambda user_id: Subscribe.objects.filter(
+        user_id=user_id
+    ).values_list('author_id', flat=True),
+}
+
+
+def initial_version():
+    # Версия, вытесненная из кеша, не должна повторно совпасть со старой.
+    return int(time.time() * 1000)
+
+
+def md5(parts):
+    return hashlib.md5('|'.join(map(str, parts)).encode()).hexdigest()
+
+
+def get_versions(names):
+    """Текущие версии пространств имен кеша."""
+    keys = [VERSION_KEY.format(name) for name in names]
+    versions = cache.get_many(keys)
+    missing = {key: initial_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*names):
+    """Делает недействительными все ответы, зависящие от names.
+
+    Версия увеличивается атомарным incr не меньше чем до текущего
+    времени в миллисекундах, поэтому она же служит датой последнего
+    изменения для Last-Modified.
+    """
+    for name in names:
+        key = VERSION_KEY.format(name)
+        now = initial_version()
+        if cache.add(key, now, timeout=None):
+            continue
+        try:
+            cache.incr(key, max(now - cache.get(key), 1))
+        except (TypeError, ValueError):
+            cache.set(key, now, timeout=None)
+
+
+def get_user_flags(user_id, kind):
+    """Множество id из избранного, корзины или подписок пользователя."""
+    key = USER_FLAGS_KEY.format(kind, user_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(USER_FLAG_QUERIES[kind](user_id))
+        cache.set(key, ids, settings.API_CACHE_TIMEOUT)
+    return ids
+
+
+def invalidate_user_flags(user_id, kind):
+    def invalidate():
+        cache.delete(USER_FLAGS_KEY.format(kind, user_id))
+        bump_versions(USER_FLAGS_VERSION.format(kind, user_id))
+
+    transaction.on_commit(invalidate)
+
+
+class CachedReadMixin:
+    """Кеширование list и retrieve для ViewSet только для чтения.
+
+    Ключ ответа включает версии пространств имен из
+    get_cache_dependencies(), поэтому для инвалидации достаточно
+    увеличить версию. Кешируется общий для всех пользователей ответ,
+    персональные данные накладываются в overlay_user_data().
+
+    Те же версии и версии флагов пользователя из user_flag_kinds дают
+    ETag и Last-Modified: на If-None-Match и If-Modified-Since ответ 304
+    отдается без обращения к БД и сериализаторам. Поэтому любое поле
+    общего ответа, включая счетчики, должно менять одну из версий из
+    get_cache_dependencies() (см. api/signals.py).
+    """
+
+    cache_dependencies = ()
+    cache_bypass_params = ()
+    user_flag_kinds = ()
+    shared_payload = False
+
+    def get_cache_dependencies(self):
+        return self.cache_dependencies
+
+    def is_cacheable(self, request):
+        return not any(
+            param in request.query_params
+            for param in self.cache_bypass_params
+        )
+
+    def get_validators(self, request):
+        """Ключ общего ответа, ETag и время последнего изменения."""
+        names = list(self.get_cache_dependencies())
+        user = request.user
+        if user.is_authenticated:
+            names += [
+                USER_FLAGS_VERSION.format(kind, user.id)
+                for kind in self.user_flag_kinds
+            ]
+        versions = get_versions(names)
+        shared = len(self.get_cache_dependencies())
+        key = RESPONSE_KEY.format(
+            md5([request.build_absolute_uri(), *versions[:shared]])
+        )
+        etag = quote_etag(md5([key, user.id, *versions[shared:]]))
+        last_modified = min(
+            max(versions, default=initial_version()) // 1000,
+            int(time.time()),
+        )
+        return key, etag, last_modified
+
+    def get_user_flags(self, user):
+        return {
+            kind: get_user_flags(user.id, kind)
+            for kind in self.user_flag_kinds
+        }
+
+    def overlay_user_data(self, data, flags):
+        return data
+
+    def get_shared_response(self, key, handler, request, *args, **kwargs):
+        data = cache.get(key)
+        if data is None:
+            self.shared_payload = True
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            data = response.data
+            cache.set(key, data, settings.API_CACHE_TIMEOUT)
+        else:
+            response = None
+        if request.user.is_authenticated and self.user_flag_kinds:
+            data = self.overlay_user_data(
+                copy.deepcopy(data), self.get_user_flags(request.user)
+            )
+        if response is None:
+            return Response(data)
+        response.data = data
+        return response
+
+    def conditional_response(self, build_response, request):
+        """Ответ 304 по валидаторам или build_response(key)."""
+        key, etag, last_modified = self.get_validators(request)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = build_response(key)
+        self.set_validators(response, request, etag, last_modified)
+        return response
+
+    def set_validators(self, response, request, etag, last_modified):
+        if response.status_code not in (200, 304):
+            return
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization',))
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True)
+        patch_cache_control(response, no_cache=True)
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return handler(request, *args, **kwargs)
+        return self.conditional_response(
+            lambda key: self.get_shared_response(
+                key, handler, request, *args, **kwargs
+            ),
+            request,
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -0,0 +1,129 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from foodgram.queue import enqueue, get_job_status
+from recipes.models import RecipeIngredient
+from .renderers import SHOPPING_LIST_RENDERERS
+from .utils import get_recipes_shopping_list
+
+EXPORT_META_KEY = 'api:export:meta:{}'
+EXPORT_FILE_KEY = 'api:export:file:{}'
+EXPORT_PENDING_STATUSES = ('queued', 'started', 'deferred', 'scheduled')
+EXPORT_RENDERERS = {
+    renderer.format: renderer for renderer in SHOPPING_LIST_RENDERERS
+}
+
+
+class ExportOutdated(Exception):
+    """Корзина изменилась после того, как выгрузка была поставлена."""
+
+
+def get_cart_rows(user_id):
+    """Ингредиенты рецептов корзины в том виде, в каком они попадут в файл.
+
+    Строки зависят только от корзины пользователя и состава ее рецептов:
+    чужие клики по избранному и корзине их не меняют.
+    """
+    return list(
+        RecipeIngredient.objects.filter(
+            recipe__shopping_list__user_id=user_id
+        ).order_by('recipe_id', 'ingredient_id').values_list(
+            'recipe_id',
+            'ingredient_id',
+            'amount',
+            'ingredient__name',
+            'ingredient__measurement_unit',
+        )
+    )
+
+
+def get_snapshot(rows):
+    """Хеш строк корзины из get_cart_rows."""
+    return hashlib.sha256(repr(rows).encode()).hexdigest()
+
+
+def get_cart_snapshot(user_id):
+    return get_snapshot(get_cart_rows(user_id))
+
+
+def get_export_id(user_id, export_format, snapshot):
+    """Хеш снимка корзины пользователя и формата файла."""
+    raw = f'{user_id}|{export_format}|{snapshot}'
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def build_shopping_list_export(export_id, user_id, export_format, snapshot):
+    """Задача RQ: собирает файл списка покупок и кладет его в кеш.
+
+    Файл собирается по корзине, с которой посчитан export_id. Если
+    корзина или состав ее рецептов изменились до конца сборки, файл
+    под этим id уже не соответствует корзине: задача завершается
+    ошибкой, а клиент запрашивает новую выгрузку.
+    """
+    rows = get_cart_rows(user_id)
+    if get_snapshot(rows) != snapshot:
+        raise ExportOutdated(export_id)
+    recipe_ids = sorted({row[0] for row in rows})
+    renderer = EXPORT_RENDERERS[export_format]()
+    content = b''.join(
+        chunk.encode() if isinstance(chunk, str) else chunk
+        for chunk in renderer.stream(get_recipes_shopping_list(recipe_ids))
+    )
+    if get_cart_snapshot(user_id) != snapshot:
+        raise ExportOutdated(export_id)
+    cache.set(
+        EXPORT_FILE_KEY.format(export_id),
+        content,
+        settings.SHOPPING_LIST_EXPORT_TIMEOUT,
+    )
+
+
+def start_export(user, export_format):
+    """Запускает сборку файла, если готового файла для корзины нет."""
+    snapshot = get_cart_snapshot(user.id)
+    export_id = get_export_id(user.id, export_format, snapshot)
+    meta = {'user_id': user.id, 'format': export_format}
+    cache.set(
+        EXPORT_META_KEY.format(export_id),
+        meta,
+        settings.SHOPPING_LIST_EXPORT_TIMEOUT,
+    )
+    if get_export_status(export_id) in (None, 'failed'):
+        try:
+            enqueue(
+                build_shopping_list_export,
+                export_id,
+                user.id,
+                export_format,
+                snapshot,
+                job_id=export_id,
+            )
+        except ExportOutdated:
+            # Без очереди задача выполняется сразу, и ее ошибка
+            # попадает сюда: выгрузка остается без файла.
+            pass
+    return export_id
+
+
+def get_export(export_id, user):
+    """Описание выгрузки пользователя или None для чужой/неизвестной."""
+    meta = cache.get(EXPORT_META_KEY.format(export_id))
+    if meta is None or meta['user_id'] != user.id:
+        return None
+    return meta
+
+
+def get_export_status(export_id):
+    """finished, статус задачи в очереди, failed или None."""
+    if cache.has_key(EXPORT_FILE_KEY.format(export_id)):
+        return 'finished'
+    status = get_job_status(export_id)
+    if status in EXPORT_PENDING_STATUSES or status == 'failed':
+        return status
+    return None
+
+
+def get_export_file(export_id):
+    return cache.get(EXPORT_FILE_KEY.format(export_id))
@@ -0,0 +1,245 @@
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from foodgram.queue import enqueue
+from recipes.models import Recipe
+from users.models import CustomUser, Subscribe
+
+TIMELINE_KEY = 'feed:{}'
+# Отметка собранной ленты, в лексикографическом порядке старше рецептов.
+BUILT = '~'
+BATCH_SIZE = 1000
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+@lru_cache(maxsize=None)
+def get_client():
+    return redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+
+def get_key(user_id):
+    return TIMELINE_KEY.format(user_id)
+
+
+def make_member(pub_date, pk):
+    """Элемент ленты: порядок строк совпадает с порядком (pub_date, id).
+
+    Все элементы хранятся с одинаковым весом, поэтому Redis сортирует их
+    лексикографически и курсор переводится в границу ZREVRANGEBYLEX.
+    """
+    return f'{(pub_date - EPOCH) // MICROSECOND:017d}:{pk:010d}'
+
+
+def parse_member(member):
+    """(pub_date, id) элемента ленты."""
+    timestamp, pk = member.split(':')
+    return EPOCH + int(timestamp) * MICROSECOND, int(pk)
+
+
+def subscribed_recipes(user_id):
+    return Recipe.objects.filter(author__subscribing__user_id=user_id)
+
+
+def get_members(queryset, limit=None):
+    rows = queryset.order_by('-pub_date', '-id').values_list('pub_date', 'id')
+    if limit is not None:
+        rows = rows[:limit]
+    return [make_member(*row) for row in rows]
+
+
+def build_timeline(user_id):
+    """Собирает ленту из БД при первом чтении или после вытеснения."""
+    key = get_key(user_id)
+    members = get_members(subscribed_recipes(user_id), settings.FEED_LENGTH)
+    with get_client().pipeline() as pipeline:
+        pipeline.delete(key)
+        pipeline.zadd(key, dict.fromkeys([BUILT, *members], 0))
+        pipeline.expire(key, settings.FEED_TIMEOUT)
+        pipeline.execute()
+
+
+def touch_timeline(user_id):
+    """Продлевает ленту пользователя или собирает ее заново."""
+    key = get_key(user_id)
+    with get_client().pipeline() as pipeline:
+        pipeline.zscore(key, BUILT)
+        pipeline.expire(key, settings.FEED_TIMEOUT)
+        built, _ = pipeline.execute()
+    if built is None:
+        build_timeline(user_id)
+
+
+def add_to_timelines(user_ids, members):
+    """Добавляет рецепты в уже собранные ленты пользователей.
+
+    Ленты тех, кто давно не читал, не создаются: их соберет чтение.
+    Если лента исчезла между проверкой и записью, в ней не будет
+    отметки BUILT и чтение соберет ее заново.
+    """
+    keys = [get_key(user_id) for user_id in user_ids]
+    with get_client().pipeline(transaction=False) as pipeline:
+        for key in keys:
+            pipeline.exists(key)
+        existing = [
+            key for key, exists in zip(keys, pipeline.execute()) if exists
+        ]
+        for key in existing:
+            pipeline.zadd(key, dict.fromkeys(members, 0))
+            pipeline.zremrangebyrank(key, 0, -settings.FEED_LENGTH - 2)
+        pipeline.execute()
+
+
+def fan_out_recipe(recipe_id):
+    """Задача RQ: рассылает новый рецепт в ленты подписчиков автора."""
+    recipe = Recipe.objects.filter(id=recipe_id).values_list(
+        'author_id', 'pub_date'
+    ).first()
+    if recipe is None:
+        return
+    author_id, pub_date = recipe
+    members = [make_member(pub_date, recipe_id)]
+    followers = list(
+        Subscribe.objects.filter(author_id=author_id)
+        .values_list('user_id', flat=True)
+    )
+    for start in range(0, len(followers), BATCH_SIZE):
+        add_to_timelines(followers[start:start + BATCH_SIZE], members)
+
+
+def publish_recipe(recipe_id, author_id):
+    """Рассылка нового рецепта по лентам подписчиков.
+
+    Для немногих подписчиков рецепт рассылается сразу, для многих -
+    задачей RQ. Рецепты авторов с более чем FEED_PULL_FOLLOWERS
+    подписчиками не рассылаются: лента подмешивает их при чтении.
+    """
+    if not settings.FEED_TIMELINES_ENABLED:
+        return
+    followers = CustomUser.objects.filter(pk=author_id).values_list(
+        'followers_count', flat=True
+    ).first()
+    if not followers or followers > settings.FEED_PULL_FOLLOWERS:
+        return
+    if followers > settings.FEED_INLINE_FOLLOWERS:
+        enqueue(fan_out_recipe, recipe_id)
+    else:
+        fan_out_recipe(recipe_id)
+
+
+def backfill_timeline(user_id, author_ids):
+    """Добавляет в ленту последние рецепты новых авторов."""
+    members = get_members(
+        Recipe.objects.filter(author_id__in=author_ids), settings.FEED_LENGTH
+    )
+    if members:
+        add_to_timelines([user_id], members)
+
+
+def prune_timeline(user_id, author_ids):
+    """Убирает из ленты рецепты авторов, от которых пользователь отписался.
+
+    Проверяются только рецепты не старше самого старого элемента ленты.
+    """
+    key = get_key(user_id)
+    client = get_client()
+    oldest = client.zrange(key, 0, 0)
+    if not oldest or oldest[0] == BUILT:
+        return
+    pub_date, _ = parse_member(oldest[0])
+    members = get_members(Recipe.objects.filter(
+        author_id__in=author_ids, pub_date__gte=pub_date
+    ))
+    for start in range(0, len(members), BATCH_SIZE):
+        client.zrem(key, *members[start:start + BATCH_SIZE])
+
+
+def subscriptions_changed(user_id, author_ids, delta):
+    """Дополняет или чистит ленту после фиксации подписок."""
+    if not author_ids or not settings.FEED_TIMELINES_ENABLED:
+        return
+    update = backfill_timeline if delta > 0 else prune_timeline
+    author_ids = list(author_ids)
+    transaction.on_commit(lambda: update(user_id, author_ids))
+
+
+def pull_members(user_id, cursor, limit, pull_only=True):
+    """Элементы ленты прямо из БД.
+
+    С лентами в Redis так читаются только рецепты популярных авторов,
+    которые не рассылаются подписчикам, а с pull_only=False - рецепты
+    всех подписок, когда страница выходит за конец ленты.
+    """
+    queryset = subscribed_recipes(user_id)
+    if settings.FEED_TIMELINES_ENABLED and pull_only:
+        queryset = queryset.filter(
+            author__followers_count__gt=settings.FEED_PULL_FOLLOWERS
+        )
+    if cursor is not None:
+        pub_date, pk = cursor
+        queryset = queryset.filter(
+            Q(pub_date__lt=pub_date) | Q(id__lt=pk),
+            pub_date__lte=pub_date,
+        )
+    return get_members(queryset, limit)
+
+
+def read_timeline(user_id, cursor, limit):
+    """Элементы ленты в Redis после курсора, проверенные по БД.
+
+    Рецепты, которые удалены или чьи авторы уже не в подписках,
+    убираются из ленты при чтении, а вместо них дочитывается
+    следующая часть ленты.
+    """
+    touch_timeline(user_id)
+    key = get_key(user_id)
+    client = get_client()
+    bound = BUILT if cursor is None else make_member(*cursor)
+    found = []
+    while len(found) < limit:
+        window = client.zrevrangebylex(
+            key, f'({bound}', '-', start=0, num=limit
+        )
+        if not window:
+            break
+        ids = {parse_member(member)[1]: member for member in window}
+        valid = set(
+            subscribed_recipes(user_id).filter(id__in=ids)
+            .values_list('id', flat=True)
+        )
+        stale = [member for pk, member in ids.items() if pk not in valid]
+        if stale:
+            client.zrem(key, *stale)
+        found.extend(member for pk, member in ids.items() if pk in valid)
+        if len(window) < limit:
+            break
+        bound = window[-1]
+    return found
+
+
+def get_feed(user_id, cursor, limit):
+    """id не более limit рецептов ленты после курсора (pub_date, id).
+
+    Рецепты идут от новых к старым, как в keyset-режиме RecipePaginator.
+    Лента в Redis хранит только FEED_LENGTH последних рецептов, поэтому
+    страницу, которую она не заполняет целиком, читает из БД.
+    """
+    if not settings.FEED_TIMELINES_ENABLED:
+        members = pull_members(user_id, cursor, limit)
+    else:
+        members = read_timeline(user_id, cursor, limit)
+        if len(members) < limit:
+            members = pull_members(user_id, cursor, limit, pull_only=False)
+        else:
+            members = set(members).union(
+                pull_members(user_id, cursor, limit)
+            )
+    return [
+        parse_member(member)[1]
+        for member in sorted(members, reverse=True)[:limit]
+    ]
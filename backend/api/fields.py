@@ -1,15 +1,77 @@
 import base64
+import binascii
 
 from django.core.files.base import ContentFile
 from rest_framework import serializers
 
+from recipes.constants import (ALLOWED_IMAGE_FORMATS, IMAGE_VARIANTS,
+                               MAX_IMAGE_SIZE)
+
 
 class Base64ImageField(serializers.ImageField):
+    """Изображение из data URI.
+
+    Декодирование остается в запросе: ImageField проверяет файл через
+    Pillow до сохранения рецепта, а оригинал сохраняется в той же
+    транзакции. В фоновую задачу вынесено создание копий.
+    """
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format_, img_str = data.split(';base64,')
+            format_, separator, img_str = data.partition(';base64,')
+            if not separator:
+                raise serializers.ValidationError(
+                    'Некорректное изображение в base64.'
+                )
             ext = format_.split('/')[-1]
+            if ext.lower() not in ALLOWED_IMAGE_FORMATS:
+                raise serializers.ValidationError(
+                    'Неподдерживаемый формат изображения.'
+                )
+            # Размер проверяется до декодирования, чтобы не тратить
+            # время воркера на заведомо слишком большие файлы.
+            if len(img_str) * 3 // 4 > MAX_IMAGE_SIZE:
+                raise serializers.ValidationError(
+                    'Размер изображения не должен превышать '
+                    f'{MAX_IMAGE_SIZE // (1024 * 1024)} МБ.'
+                )
+            try:
+                decoded = base64.b64decode(img_str, validate=True)
+            except (binascii.Error, ValueError):
+                # ValueError - символы вне ASCII.
+                raise serializers.ValidationError(
+                    'Некорректное изображение в base64.'
+                )
 
-            data = ContentFile(base64.b64decode(img_str), name='temp.' + ext)
+            data = ContentFile(decoded, name='temp.' + ext)
 
         return super().to_internal_value(data)
+
+
+def build_file_url(file, request):
+    if not file:
+        return None
+    if request is None:
+        return file.url
+    return request.build_absolute_uri(file.url)
+
+
+class ImageVariantsField(serializers.Field):
+    """Ссылки на уменьшенные копии изображения рецепта.
+
+    Пока копии не созданы фоновой задачей, отдается оригинал.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        request = self.context.get('request')
+        return {
+            name: build_file_url(
+                getattr(recipe, f'image_{name}') or recipe.image, request
+            )
+            for name in IMAGE_VARIANTS
+        }
@@ -1,6 +1,17 @@
+from django.contrib.postgres.search import (SearchHeadline, SearchQuery,
+                                            SearchRank)
+from django import forms
+from django.db import connection
+from django.db.models import Exists, F, OuterRef, Q
 from django_filters import rest_framework as filters
 
-from recipes.models import Ingredient, Recipe
+from recipes.constants import SEARCH_CONFIG
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart)
+from .tag_registry import get_tag_choices, tag_registry
+
+# Наибольший id: индекс рецептов хранит id ингредиентов в int64.
+MAX_ID = 2 ** 63 - 1
 
 
 class IngredientFilter(filters.FilterSet):
@@ -16,21 +27,44 @@ class IngredientFilter(filters.FilterSet):
         fields = ('name',)
 
 
+class IntegerInFilter(filters.BaseInFilter, filters.NumberFilter):
+    field_class = forms.IntegerField
+
+
 class RecipeFilter(filters.FilterSet):
-    """Фильтрация по избранному, автору, списку покупок и тегам."""
+    """Фильтрация по избранному, автору, списку покупок и тегам.
+
+    Каждый критерий добавляет к одному запросу условие по столбцу или
+    EXISTS, поэтому строки рецептов не дублируются и DISTINCT не нужен.
+    """
 
     is_favorited = filters.BooleanFilter(
         method='get_favorite',
         label='Избранные рецепты',
     )
-    tags = filters.AllValuesMultipleFilter(
-        field_name='tags__slug',
+    tags = filters.MultipleChoiceFilter(
+        choices=get_tag_choices,
+        method='get_tags',
         label='Тэги',
     )
+    author = filters.NumberFilter(
+        field_name='author_id',
+        label='Автор',
+    )
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart',
         label='Рецепты в корзине',
     )
+    search = filters.CharFilter(
+        method='get_search',
+        label='Поиск по названию, описанию и ингредиентам',
+    )
+    have = IntegerInFilter(
+        method='get_have',
+        min_value=1,
+        max_value=MAX_ID,
+        label='Имеющиеся ингредиенты (id через запятую)',
+    )
 
     class Meta:
         model = Recipe
@@ -39,13 +73,62 @@ class RecipeFilter(filters.FilterSet):
             'author',
             'is_favorited',
             'is_in_shopping_cart',
+            'search',
+            'have',
         )
 
+    def filter_by_user(self, queryset, model, value):
+        """Рецепты, связанные с текущим пользователем через model."""
+        if not value:
+            return queryset
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.none()
+        return queryset.filter(Exists(
+            model.objects.filter(user=user, recipe=OuterRef('pk'))
+        ))
+
     def get_favorite(self, queryset, name, value):
-        if value:
-            return queryset.filter(favorites__user=self.request.user)
-        return queryset
+        return self.filter_by_user(queryset, Favorite, value)
 
     def get_is_in_shopping_cart(self, queryset, name, value):
-        if value:
-            return Recipe.objects.filter(shopping_list__user=self.request.user)
+        return self.filter_by_user(queryset, ShoppingCart, value)
+
+    def get_tags(self, queryset, name, value):
+        """Рецепты хотя бы с одним из тегов, id берутся из реестра."""
+        ids = tag_registry.get_ids()
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'),
+                tag_id__in=[ids[slug] for slug in value if slug in ids],
+            )
+        ))
+
+    def get_have(self, queryset, name, value):
+        """Ранжирование по покрытию выполняет RecipeViewSet."""
+        return queryset
+
+    def get_search(self, queryset, name, value):
+        """Полнотекстовый поиск в PostgreSQL, icontains в остальных БД."""
+        if connection.vendor != 'postgresql':
+            return queryset.filter(
+                Q(name__icontains=value)
+                | Q(text__icontains=value)
+                | Exists(RecipeIngredient.objects.filter(
+                    recipe=OuterRef('pk'), ingredient__name__icontains=value
+                ))
+            )
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query),
+            search_headline=SearchHeadline(
+                'text',
+                query,
+                config=SEARCH_CONFIG,
+                start_sel='<mark>',
+                stop_sel='</mark>',
+                max_fragments=2,
+            ),
+        ).order_by('-rank', '-pub_date')
@@ -0,0 +1,67 @@
+import threading
+from bisect import bisect_left
+
+from recipes.models import Ingredient
+from .cache import get_versions
+
+PREFIX_UPPER_BOUND = '\uffff'
+
+
+class IngredientPrefixIndex:
+    """Индекс ингредиентов для автодополнения по началу названия.
+
+    Хранит отсортированные по названию в нижнем регистре ключи и уже
+    сериализованные ингредиенты. Индекс строится лениво и перестраивается,
+    когда сигналы меняют версию 'ingredients' в общем кеше, поэтому
+    изменения видны во всех процессах.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+
+    def build(self, version):
+        from .serializers import IngredientSerializer
+
+        ingredients = Ingredient.objects.order_by('id')
+        data = [
+            dict(item)
+            for item in IngredientSerializer(ingredients, many=True).data
+        ]
+        entries = sorted(
+            (item['name'].lower(), item['id'], item) for item in data
+        )
+        self._state = (
+            version,
+            [entry[0] for entry in entries],
+            [entry[2] for entry in entries],
+            data,
+        )
+
+    def search(self, prefix=''):
+        """Ингредиенты, название которых начинается с prefix.
+
+        Возвращает None, пока индекс перестраивает другой поток: такой
+        запрос не ждет перестройки и обслуживается из БД.
+        """
+        version = get_versions(('ingredients',))[0]
+        state = self._state
+        if state is None or state[0] != version:
+            if not self._lock.acquire(blocking=False):
+                return None
+            try:
+                if self._state is None or self._state[0] != version:
+                    self.build(version)
+                state = self._state
+            finally:
+                self._lock.release()
+        keys, items, all_items = state[1:]
+        if not prefix:
+            return all_items
+        prefix = prefix.lower()
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + PREFIX_UPPER_BOUND, start)
+        return sorted(items[start:end], key=lambda item: item['id'])
+
+
+ingredient_index = IngredientPrefixIndex()
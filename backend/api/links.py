@@ -0,0 +1,180 @@
+from collections import namedtuple
+
+from django.db import connection, transaction
+
+from foodgram.counters import change_counter
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscribe
+from .cache import bump_versions, invalidate_user_flags
+from .feed import subscriptions_changed
+
+# namespace: пространство имен кеша API с ответами, где есть счетчик.
+Link = namedtuple('Link', 'model field counter flags namespace')
+
+FAVORITE = Link(
+    Favorite, 'recipe', 'favorites_count', 'favorites', 'recipes'
+)
+SHOPPING_CART = Link(
+    ShoppingCart, 'recipe', 'in_carts_count', 'shopping_cart', 'recipes'
+)
+SUBSCRIBE = Link(
+    Subscribe, 'author', 'followers_count', 'subscriptions', 'users'
+)
+
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+MISSING = 'missing'
+NOT_FOUND = 'not_found'
+SELF = 'self'
+
+
+def get_target_model(link):
+    return link.model._meta.get_field(link.field).related_model
+
+
+def get_existing_ids(link, ids):
+    return set(
+        get_target_model(link).objects.filter(id__in=ids)
+        .values_list('id', flat=True)
+    )
+
+
+def links_changed(link, user, ids, delta):
+    """Счетчики и кеш после записи в обход сигналов моделей."""
+    if not ids:
+        return
+    change_counter(
+        get_target_model(link).objects.filter(id__in=ids),
+        link.counter,
+        delta,
+    )
+    if link.model is Subscribe:
+        change_counter(
+            type(user).objects.filter(pk=user.pk),
+            'following_count',
+            delta * len(ids),
+        )
+        subscriptions_changed(user.id, ids, delta)
+        names = [link.namespace]
+    else:
+        names = [link.namespace, *(f'recipe:{pk}' for pk in ids)]
+    transaction.on_commit(lambda: bump_versions(*names))
+    invalidate_user_flags(user.id, link.flags)
+
+
+def can_return_rows():
+    """Поддерживает ли БД RETURNING в INSERT и DELETE."""
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35, 0)
+    return connection.vendor == 'postgresql'
+
+
+def insert_sql(link, user, ids):
+    """INSERT ... SELECT только существующих объектов без конфликтов.
+
+    Наличие объекта и уникальность связи проверяет сам запрос, поэтому
+    одновременные запросы не приводят к IntegrityError.
+    """
+    opts = link.model._meta
+    target = get_target_model(link)._meta
+    quote = connection.ops.quote_name
+    target_pk = quote(target.pk.column)
+    sql = (
+        f'INSERT INTO {quote(opts.db_table)} '
+        f'({quote(opts.get_field("user").column)}, '
+        f'{quote(opts.get_field(link.field).column)}) '
+        f'SELECT %s, {target_pk} FROM {quote(target.db_table)} '
+        f'WHERE {target_pk} IN ({", ".join(["%s"] * len(ids))})'
+    )
+    params = [user.pk, *ids]
+    if link.model is Subscribe:
+        sql += f' AND {target_pk} <> %s'
+        params.append(user.pk)
+    return sql + ' ON CONFLICT DO NOTHING', params
+
+
+def delete_sql(link, user, ids):
+    opts = link.model._meta
+    quote = connection.ops.quote_name
+    return (
+        f'DELETE FROM {quote(opts.db_table)} '
+        f'WHERE {quote(opts.get_field("user").column)} = %s '
+        f'AND {quote(opts.get_field(link.field).column)} '
+        f'IN ({", ".join(["%s"] * len(ids))})',
+        [user.pk, *ids],
+    )
+
+
+def execute_links(build_sql, link, user, ids):
+    """Выполняет INSERT или DELETE и возвращает id измененных связей.
+
+    Без RETURNING запрос выполняется по одному id и результат берется
+    из rowcount.
+    """
+    column = connection.ops.quote_name(
+        link.model._meta.get_field(link.field).column
+    )
+    with connection.cursor() as cursor:
+        if not can_return_rows():
+            changed = []
+            for pk in ids:
+                cursor.execute(*build_sql(link, user, [pk]))
+                if cursor.rowcount:
+                    changed.append(pk)
+            return changed
+        sql, params = build_sql(link, user, ids)
+        cursor.execute(f'{sql} RETURNING {column}', params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def add_links(link, user, ids):
+    added = execute_links(insert_sql, link, user, ids)
+    links_changed(link, user, added, 1)
+    return added
+
+
+def remove_links(link, user, ids):
+    """Удаляет связи одним DELETE без загрузки строк и сигналов."""
+    removed = execute_links(delete_sql, link, user, ids)
+    links_changed(link, user, removed, -1)
+    return removed
+
+
+def get_add_status(link, user, pk, existing):
+    if pk not in existing:
+        return NOT_FOUND
+    if link.model is Subscribe and pk == user.pk:
+        return SELF
+    return EXISTS
+
+
+def get_remove_status(pk, existing):
+    return MISSING if pk in existing else NOT_FOUND
+
+
+@transaction.atomic
+def apply_batch(link, user, add, remove):
+    """Добавляет и удаляет связи пачкой, возвращает статус каждого id.
+
+    Выполняется один INSERT и один DELETE, статус берется из RETURNING.
+    Только для id, которые не удалось изменить, отдельным запросом
+    проверяется, существует ли объект.
+    """
+    added = set(add_links(link, user, add)) if add else set()
+    removed = set(remove_links(link, user, remove)) if remove else set()
+    failed = [pk for pk in add if pk not in added] + [
+        pk for pk in remove if pk not in removed
+    ]
+    existing = get_existing_ids(link, failed) if failed else set()
+    return [
+        {'id': pk, 'action': 'add',
+         'status': ADDED if pk in added
+         else get_add_status(link, user, pk, existing)}
+        for pk in add
+    ] + [
+        {'id': pk, 'action': 'remove',
+         'status': REMOVED if pk in removed
+         else get_remove_status(pk, existing)}
+        for pk in remove
+    ]
@@ -0,0 +1,730 @@
+import asyncio
+import io
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from fnmatch import fnmatch
+from itertools import combinations
+from urllib.parse import urlencode, urlparse
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone as django_timezone
+from rest_framework.authtoken.models import Token
+
+from api.authentication import invalidate_tokens
+from api.renderers import (CSVShoppingListRenderer, PDFShoppingListRenderer,
+                           TextShoppingListRenderer)
+from api.utils import get_shopping_list
+from foodgram.explain import find_seq_scans
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.similarity import refresh_similar_recipes
+from users.models import CustomUser, Subscribe
+
+Scenario = namedtuple('Scenario', 'name requests')
+METRICS_MIDDLEWARE = 'foodgram.metrics.MetricsMiddleware'
+SEARCH_WORD = 'суп'
+SHOPPING_LIST_CARTS = (10, 1000, 10000)
+SHOPPING_LIST_RENDERERS = (TextShoppingListRenderer, CSVShoppingListRenderer,
+                           PDFShoppingListRenderer)
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    values = sorted(values)
+    index = max(int(round(percent / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+def summarize(values, scale=1):
+    if not values:
+        return None
+    return {
+        'mean': round(sum(values) / len(values) * scale, 3),
+        'p50': round(percentile(values, 50) * scale, 3),
+        'p95': round(percentile(values, 95) * scale, 3),
+        'p99': round(percentile(values, 99) * scale, 3),
+        'max': round(max(values) * scale, 3),
+    }
+
+
+def create_shopping_list_report(user):
+    """Список покупок в txt так, как он собирался до потоковой отдачи.
+
+    Копия прежней реализации для --shopping-list: агрегация без
+    сортировки и сборка всего файла в одну строку через +=, которая
+    отдается одной частью.
+    """
+    buy_list = (
+        RecipeIngredient.objects.filter(
+            recipe__in=ShoppingCart.objects.filter(
+                user=user
+            ).values('recipe_id')
+        ).values(
+            'ingredient__name',
+            'ingredient__measurement_unit',
+        ).annotate(amount=Sum('amount'))
+    )
+    buy_list_text = 'Foodgram\nСписок покупок:\n'
+    for item in buy_list:
+        name = item['ingredient__name']
+        measurement_unit = item['ingredient__measurement_unit']
+        amount = item['amount']
+        buy_list_text += f'{name}, {amount} {measurement_unit}\n'
+    yield buy_list_text
+
+
+def stream_shopping_list(renderer):
+    def stream(user):
+        return renderer.stream(get_shopping_list(user))
+    return stream
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', 'HEAD'),
+            capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    """
+    Нагрузочный прогон основных эндпоинтов API:
+    python manage.py generate_data --users 1000
+    python manage.py benchmark --output before.json
+    python manage.py benchmark --compare before.json
+
+    Запросы идут через тестовый клиент Django последовательно в одном
+    процессе, поэтому результаты сравнимы между коммитами на одной
+    машине и одних данных. Для каждого сценария считаются пропускная
+    способность, перцентили задержки и времени до первого байта,
+    количество SQL-запросов и размер ответа. Дополнительно:
+    --memory - пик выделенной памяти на запрос (tracemalloc),
+    --explain - последовательные сканирования больших таблиц
+    (PostgreSQL), --metrics-overhead - стоимость MetricsMiddleware,
+    --auth-cache - запросы и задержка с кешем токенов и без него,
+    --concurrency N - пропускная способность N одновременных клиентов
+    через WSGI (потоки, как gthread) и ASGI (корутины, как uvicorn),
+    --similarity - время и память полного расчета похожих рецептов
+    и обновления после изменения 1% рецептов (до замеров API),
+    --shopping-list - список покупок прежней реализацией (весь txt
+    одной строкой) и потоковыми рендерерами для корзин из 10, 1000
+    и 10000 рецептов: время до первой части, полное время и пик
+    памяти.
+    """
+
+    help = 'Замер задержки, SQL-запросов и размера ответов API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50,
+                            help='Измерений на сценарий')
+        parser.add_argument('--warmup', type=int, default=5,
+                            help='Прогревочных запросов на сценарий')
+        parser.add_argument('--scenarios', default='*',
+                            help='Шаблон имен сценариев, например recipes-*')
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кеш перед каждым запросом')
+        parser.add_argument('--memory', action='store_true',
+                            help='Замерять пик памяти через tracemalloc')
+        parser.add_argument('--explain', action='store_true',
+                            help='Искать Seq Scan в планах (PostgreSQL)')
+        parser.add_argument('--seq-scan-rows', type=int, default=10000,
+                            help='Порог размера таблицы для --explain')
+        parser.add_argument('--metrics-overhead', action='store_true',
+                            help='Сравнить задержку с MetricsMiddleware '
+                                 'и без него')
+        parser.add_argument('--auth-cache', action='store_true',
+                            help='Сравнить запросы и задержку с кешем '
+                                 'токенов и без него')
+        parser.add_argument('--concurrency', type=int, default=0,
+                            help='Одновременных клиентов для сравнения '
+                                 'WSGI и ASGI')
+        parser.add_argument('--similarity', action='store_true',
+                            help='Замерить расчет похожих рецептов')
+        parser.add_argument('--shopping-list', action='store_true',
+                            help='Сравнить прежнюю и потоковую сборку '
+                                 'списка покупок')
+        parser.add_argument('--label', default='',
+                            help='Метка прогона в отчете')
+        parser.add_argument('--output', help='Файл для JSON-отчета')
+        parser.add_argument('--compare',
+                            help='JSON-отчет прошлого прогона для сравнения')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations должен быть больше нуля')
+        if options['explain'] and connection.vendor != 'postgresql':
+            raise CommandError('--explain поддерживается только в PostgreSQL')
+        self.options = options
+        similarity = None
+        if options['similarity']:
+            similarity = self.measure_similarity()
+        scenarios = [
+            scenario for scenario in self.get_scenarios()
+            if fnmatch(scenario.name, options['scenarios'])
+        ]
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            client = self.get_client()
+            report = {
+                'meta': self.get_meta(),
+                'scenarios': {
+                    scenario.name: self.run_scenario(client, scenario)
+                    for scenario in scenarios
+                },
+            }
+            if similarity is not None:
+                report['similarity'] = similarity
+            if options['metrics_overhead']:
+                report['metrics_overhead'] = self.measure_metrics_overhead()
+            if options['auth_cache']:
+                report['auth_cache'] = self.measure_auth_cache()
+            if options['shopping_list']:
+                report['shopping_list'] = self.measure_shopping_list()
+            if options['concurrency'] > 0:
+                report['concurrency'] = self.measure_concurrency(scenarios)
+        report['meta']['peak_rss_kb'] = resource.getrusage(
+            resource.RUSAGE_SELF
+        ).ru_maxrss
+        if options['compare']:
+            report['comparison'] = self.compare(report, options['compare'])
+        self.write_report(report)
+
+    def get_fixture(self):
+        """Пользователь с корзиной и избранным и данные для запросов."""
+        self.user = (
+            CustomUser.objects.filter(shopping_list__isnull=False)
+            .filter(favorites__isnull=False)
+            .order_by('id')
+            .first()
+        )
+        if self.user is None:
+            raise CommandError(
+                'Нет данных для замеров, запустите generate_data'
+            )
+        recipe = Recipe.objects.order_by('-favorites_count', 'id').first()
+        ingredient = Ingredient.objects.order_by('id').first()
+        self.fixture = {
+            'tags': list(Tag.objects.values_list('slug', flat=True)[:2]),
+            'author': recipe.author_id,
+            'is_favorited': 1,
+            'is_in_shopping_cart': 1,
+            'search': SEARCH_WORD,
+        }
+        self.recipe_id = recipe.id
+        self.have = ','.join(map(str, RecipeIngredient.objects.filter(
+            recipe=recipe
+        ).order_by('id').values_list('ingredient_id', flat=True)[:6]))
+        self.ingredient_prefix = ingredient.name[:3]
+        self.toggle_recipe_id = (
+            Recipe.objects.exclude(favorites__user=self.user)
+            .exclude(shopping_list__user=self.user)
+            .values_list('id', flat=True)
+            .first()
+        )
+
+    def get_scenarios(self):
+        self.get_fixture()
+        filters = list(self.fixture)
+        for size in range(len(filters) + 1):
+            for names in combinations(filters, size):
+                params = urlencode(
+                    {name: self.fixture[name] for name in names}, doseq=True
+                )
+                yield Scenario(
+                    'recipes-list' + ''.join(f'+{name}' for name in names),
+                    (('get', f'/api/recipes/?{params}'),),
+                )
+        yield Scenario('recipes-list-cursor',
+                       (('get', '/api/recipes/?cursor='),))
+        yield Scenario('recipes-detail',
+                       (('get', f'/api/recipes/{self.recipe_id}/'),))
+        yield Scenario('recipes-have', (
+            ('get', f'/api/recipes/?have={self.have}'),
+        ))
+        yield Scenario('recipes-similar', (
+            ('get', f'/api/recipes/{self.recipe_id}/similar/'),
+        ))
+        yield Scenario('subscriptions', (
+            ('get', '/api/users/subscriptions/?recipes_limit=3'),
+        ))
+        for renderer in ('txt', 'csv', 'pdf'):
+            yield Scenario(f'download-shopping-cart-{renderer}', (
+                ('get', f'/api/recipes/download_shopping_cart/'
+                        f'?format={renderer}'),
+            ))
+        yield Scenario('ingredients-search', (
+            ('get', '/api/ingredients/?' + urlencode(
+                {'name': self.ingredient_prefix}
+            )),
+        ))
+        yield Scenario('tags-list', (('get', '/api/tags/'),))
+        if self.toggle_recipe_id is not None:
+            for action in ('favorite', 'shopping_cart'):
+                path = f'/api/recipes/{self.toggle_recipe_id}/{action}/'
+                yield Scenario(f'{action}-toggle',
+                               (('post', path), ('delete', path)))
+
+    def get_client(self):
+        self.token, _ = Token.objects.get_or_create(user=self.user)
+        return Client(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def perform(self, client, scenario):
+        """Выполняет запросы сценария.
+
+        Возвращает время до первого байта первого ответа, размер ответов,
+        объем картинок на странице и количество ошибок.
+        """
+        started = time.perf_counter()
+        first_byte = None
+        size = image_size = errors = 0
+        for method, path in scenario.requests:
+            response = getattr(client, method)(path)
+            if response.status_code >= 400:
+                errors += 1
+            if response.streaming:
+                for chunk in response.streaming_content:
+                    if first_byte is None:
+                        first_byte = time.perf_counter() - started
+                    size += len(chunk)
+            else:
+                size += len(response.content)
+                image_size += self.get_image_size(response)
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+        return first_byte, size, image_size, errors
+
+    def get_image_size(self, response):
+        """Суммарный размер картинок рецептов, на которые ссылается ответ."""
+        if 'json' not in response.get('Content-Type', ''):
+            return 0
+        data = response.json()
+        if isinstance(data, dict):
+            data = data.get('results', [data])
+        if not isinstance(data, list):
+            return 0
+        if not hasattr(self, 'image_sizes'):
+            self.image_sizes = {}
+        total = 0
+        for item in data:
+            url = isinstance(item, dict) and item.get('image')
+            if not url:
+                continue
+            path = urlparse(url).path
+            if path not in self.image_sizes:
+                name = path[len(settings.MEDIA_URL):]
+                self.image_sizes[path] = (
+                    default_storage.size(name)
+                    if path.startswith(settings.MEDIA_URL)
+                    and default_storage.exists(name)
+                    else 0
+                )
+            total += self.image_sizes[path]
+        return total
+
+    def measure(self, client, scenario):
+        if self.options['cold']:
+            cache.clear()
+        if self.options['memory']:
+            tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            first_byte, size, image_size, errors = self.perform(
+                client, scenario
+            )
+            elapsed = time.perf_counter() - started
+        peak = None
+        if self.options['memory']:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return {
+            'latency': elapsed,
+            'ttfb': first_byte,
+            'queries': len(queries),
+            'bytes': size,
+            'image_bytes': image_size,
+            'errors': errors,
+            'memory_peak': peak,
+            'sql': queries.captured_queries,
+        }
+
+    def run_scenario(self, client, scenario):
+        for _ in range(self.options['warmup']):
+            self.perform(client, scenario)
+        samples = []
+        started = time.perf_counter()
+        for _ in range(self.options['iterations']):
+            samples.append(self.measure(client, scenario))
+        elapsed = time.perf_counter() - started
+        self.stderr.write(f'{scenario.name}: {elapsed:.2f} с')
+
+        def column(key):
+            return [sample[key] for sample in samples]
+
+        result = {
+            'requests': len(samples) * len(scenario.requests),
+            'errors': sum(column('errors')),
+            'throughput_rps': round(len(samples) / elapsed, 1),
+            'latency_ms': summarize(column('latency'), 1000),
+            'ttfb_ms': summarize(column('ttfb'), 1000),
+            'queries': summarize(column('queries')),
+            'response_bytes': summarize(column('bytes')),
+            'image_bytes': summarize(column('image_bytes')),
+        }
+        if self.options['memory']:
+            result['memory_peak_kb'] = summarize(column('memory_peak'), 1e-3)
+        if self.options['explain']:
+            result['seq_scans'] = self.find_seq_scans(samples[-1]['sql'])
+        return result
+
+    def find_seq_scans(self, queries):
+        """Таблицы больше --seq-scan-rows, читаемые последовательно."""
+        return find_seq_scans(
+            [
+                (query['sql'], None) for query in queries
+                if query['sql'].lstrip().upper().startswith('SELECT')
+            ],
+            self.options['seq_scan_rows'],
+        )
+
+    def measure_similarity(self):
+        """Полный расчет похожих рецептов и обновление после правки.
+
+        Для обновления у каждого сотого рецепта меняется updated_at.
+        Замер идет в транзакции, которая затем откатывается, поэтому
+        данные и таблица похожих рецептов остаются прежними.
+        """
+        result = {'recipes': Recipe.objects.count()}
+        ids = list(Recipe.objects.order_by('id').values_list('id', flat=True))
+        with transaction.atomic():
+            for key, full in (('full', True), ('incremental', False)):
+                if not full:
+                    Recipe.objects.filter(id__in=ids[::100]).update(
+                        updated_at=django_timezone.now()
+                    )
+                tracemalloc.start()
+                started = time.perf_counter()
+                updated = refresh_similar_recipes(full=full)
+                elapsed = time.perf_counter() - started
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                result[key] = {
+                    'seconds': round(elapsed, 3),
+                    'updated': updated,
+                    'peak_memory_kb': round(peak / 1024),
+                }
+            transaction.set_rollback(True)
+        return result
+
+    def measure_shopping_list(self):
+        """Сборка списка покупок прежним и текущим способом.
+
+        Корзина пользователя из фикстуры заполняется первыми рецептами
+        в транзакции, которая затем откатывается. Пик памяти снимается
+        отдельным прогоном, так как tracemalloc замедляет код.
+        """
+        builders = {'baseline-txt': create_shopping_list_report}
+        for renderer in SHOPPING_LIST_RENDERERS:
+            builders[renderer.format] = stream_shopping_list(renderer())
+        ids = list(Recipe.objects.order_by('id').values_list('id', flat=True))
+        result = {}
+        for size in sorted({min(size, len(ids))
+                            for size in SHOPPING_LIST_CARTS}):
+            with transaction.atomic():
+                ShoppingCart.objects.filter(user=self.user).delete()
+                ShoppingCart.objects.bulk_create(
+                    ShoppingCart(user=self.user, recipe_id=recipe_id)
+                    for recipe_id in ids[:size]
+                )
+                result[size] = {
+                    name: self.measure_builder(build)
+                    for name, build in builders.items()
+                }
+                transaction.set_rollback(True)
+        return result
+
+    def measure_builder(self, build):
+        for _ in range(self.options['warmup']):
+            for _ in build(self.user):
+                pass
+        totals, ttfbs = [], []
+        for _ in range(self.options['iterations']):
+            started = time.perf_counter()
+            chunks = build(self.user)
+            size = len(next(chunks))
+            ttfbs.append(time.perf_counter() - started)
+            size += sum(len(chunk) for chunk in chunks)
+            totals.append(time.perf_counter() - started)
+        tracemalloc.start()
+        for _ in build(self.user):
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return {
+            'ttfb_ms': summarize(ttfbs, 1000),
+            'total_ms': summarize(totals, 1000),
+            'peak_memory_kb': round(peak / 1024),
+            'size': size,
+        }
+
+    def measure_metrics_overhead(self):
+        """Задержка GET /api/tags/ с MetricsMiddleware и без него."""
+        scenario = Scenario('tags-list', (('get', '/api/tags/'),))
+        without = [
+            name for name in settings.MIDDLEWARE if name != METRICS_MIDDLEWARE
+        ]
+        result = {}
+        for key, middleware in (('with_ms', settings.MIDDLEWARE),
+                                ('without_ms', without)):
+            with override_settings(MIDDLEWARE=middleware):
+                client = self.get_client()
+                for _ in range(self.options['warmup']):
+                    self.perform(client, scenario)
+                latencies = []
+                for _ in range(self.options['iterations']):
+                    started = time.perf_counter()
+                    self.perform(client, scenario)
+                    latencies.append(time.perf_counter() - started)
+                result[key] = summarize(latencies, 1000)
+        result['overhead_p50_ms'] = round(
+            result['with_ms']['p50'] - result['without_ms']['p50'], 3
+        )
+        return result
+
+    def measure_auth_cache(self):
+        """GET /api/tags/ со снимком пользователя в кеше и без него.
+
+        Ответ берется из кеша API, поэтому в сценарии остаются только
+        запросы аутентификации.
+        """
+        scenario = Scenario('tags-list', (('get', '/api/tags/'),))
+        client = self.get_client()
+        result = {}
+        for key, timeout in (('cached', settings.TOKEN_CACHE_TIMEOUT),
+                             ('uncached', 0)):
+            invalidate_tokens(self.token.key)
+            with override_settings(TOKEN_CACHE_TIMEOUT=timeout):
+                for _ in range(self.options['warmup']):
+                    self.perform(client, scenario)
+                samples = [
+                    self.measure(client, scenario)
+                    for _ in range(self.options['iterations'])
+                ]
+            result[key] = {
+                'latency_ms': summarize(
+                    [sample['latency'] for sample in samples], 1000
+                ),
+                'queries': summarize(
+                    [sample['queries'] for sample in samples]
+                ),
+            }
+        return result
+
+    def measure_concurrency(self, scenarios):
+        """Сценарии из одного GET при --concurrency клиентах.
+
+        Каждый клиент отправляет --iterations запросов подряд напрямую
+        в WSGI- и ASGI-приложение, без сети.
+        """
+        from foodgram.asgi import application as asgi_application
+        from foodgram.wsgi import application as wsgi_application
+
+        result = {}
+        for scenario in scenarios:
+            if len(scenario.requests) != 1:
+                continue
+            method, path = scenario.requests[0]
+            if method != 'get':
+                continue
+            wsgi = self.run_wsgi_clients(wsgi_application, path)
+            asgi = asyncio.run(
+                self.run_asgi_clients(asgi_application, path)
+            )
+            result[scenario.name] = {
+                'wsgi': wsgi,
+                'asgi': asgi,
+                'asgi_to_wsgi_rps': round(
+                    asgi['throughput_rps']
+                    / max(wsgi['throughput_rps'], 1e-3),
+                    2,
+                ),
+            }
+            self.stderr.write(f'{scenario.name}: WSGI и ASGI')
+        return result
+
+    def summarize_clients(self, samples, elapsed):
+        return {
+            'requests': len(samples),
+            'errors': sum(status >= 400 for status, _ in samples),
+            'throughput_rps': round(len(samples) / elapsed, 1),
+            'latency_ms': summarize(
+                [latency for _, latency in samples], 1000
+            ),
+        }
+
+    def run_wsgi_clients(self, application, path):
+        path, _, query = path.partition('?')
+
+        def request():
+            statuses = []
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'SCRIPT_NAME': '',
+                'PATH_INFO': path,
+                'QUERY_STRING': query,
+                'SERVER_NAME': 'testserver',
+                'SERVER_PORT': '80',
+                'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_AUTHORIZATION': f'Token {self.token.key}',
+                'wsgi.version': (1, 0),
+                'wsgi.url_scheme': 'http',
+                'wsgi.input': io.BytesIO(),
+                'wsgi.errors': sys.stderr,
+                'wsgi.multithread': True,
+                'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+            }
+            started = time.perf_counter()
+            body = application(
+                environ,
+                lambda status, headers: statuses.append(
+                    int(status.split()[0])
+                ),
+            )
+            try:
+                for _ in body:
+                    pass
+            finally:
+                body.close()
+            return statuses[0], time.perf_counter() - started
+
+        def client():
+            return [request() for _ in range(self.options['iterations'])]
+
+        concurrency = self.options['concurrency']
+        with ThreadPoolExecutor(concurrency) as executor:
+            started = time.perf_counter()
+            results = list(executor.map(
+                lambda _: client(), range(concurrency)
+            ))
+            elapsed = time.perf_counter() - started
+        return self.summarize_clients(sum(results, []), elapsed)
+
+    async def run_asgi_clients(self, application, path):
+        path, _, query = path.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Token {self.token.key}'.encode()),
+            ],
+            'client': ('127.0.0.1', 0),
+            'server': ('testserver', 80),
+        }
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def request():
+            statuses = []
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+
+            started = time.perf_counter()
+            await application(dict(scope), receive, send)
+            return statuses[0], time.perf_counter() - started
+
+        async def client():
+            return [
+                await request() for _ in range(self.options['iterations'])
+            ]
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(
+            client() for _ in range(self.options['concurrency'])
+        ))
+        elapsed = time.perf_counter() - started
+        return self.summarize_clients(sum(results, []), elapsed)
+
+    def get_pool_stats(self):
+        pool = getattr(connection, 'pool', None)
+        return pool.stats() if pool is not None else None
+
+    def get_meta(self):
+        return {
+            'label': self.options['label'],
+            'commit': get_commit(),
+            'created': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'cache': settings.CACHES['default']['BACKEND'],
+            'db_pool': self.get_pool_stats(),
+            'iterations': self.options['iterations'],
+            'warmup': self.options['warmup'],
+            'cold': self.options['cold'],
+            'rows': {
+                model._meta.label: model.objects.count()
+                for model in (CustomUser, Recipe, RecipeIngredient,
+                              Ingredient, Favorite, ShoppingCart, Subscribe)
+            },
+        }
+
+    def compare(self, report, path):
+        """Отношение p95 задержки и запросов к прошлому прогону."""
+        with open(path, encoding='UTF-8') as file:
+            baseline = json.load(file)['scenarios']
+        comparison = {}
+        for name, result in report['scenarios'].items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            comparison[name] = {
+                'p95_ms': [before['latency_ms']['p95'],
+                           result['latency_ms']['p95']],
+                'p95_ratio': round(
+                    result['latency_ms']['p95']
+                    / max(before['latency_ms']['p95'], 1e-3),
+                    2,
+                ),
+                'queries_p50': [before['queries']['p50'],
+                                result['queries']['p50']],
+            }
+        return comparison
+
+    def write_report(self, report):
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if self.options['output']:
+            with open(self.options['output'], 'w', encoding='UTF-8') as file:
+                file.write(text)
+            self.stdout.write(self.style.SUCCESS(
+                f'Отчет сохранен в {self.options["output"]}'
+            ))
+        else:
+            self.stdout.write(text)
@@ -1,5 +1,167 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .feed import get_feed
+from .recipe_index import CoverageRanking
+
+CURSOR_SEPARATOR = '|'
+REVERSE_MARK = 'r'
 
 
 class LimitPageNumberPaginator(PageNumberPagination):
-    page_size_query_param = '6'
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+
+class RecipePaginator(LimitPageNumberPaginator):
+    """Постраничный вывод рецептов с опциональным keyset-режимом.
+
+    Без параметра cursor работает как обычная пагинация по номеру
+    страницы. С ?cursor= (пустым для первой страницы) выборка идет по
+    ключу (pub_date, id) без OFFSET и без COUNT(*), количество
+    считается только при ?count=true. Курсор ссылки previous читает
+    рецепты перед ключом в обратном порядке.
+    """
+
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = (
+            self.cursor_query_param in request.query_params
+            and not isinstance(queryset, CoverageRanking)
+        )
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = request.query_params[self.cursor_query_param]
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'true':
+            self.count = queryset.count()
+        self.next_cursor = self.previous_cursor = None
+        if not cursor:
+            return self.get_page_after(queryset, None, page_size)
+        pub_date, pk, reverse = self.decode_cursor(cursor)
+        if reverse:
+            return self.get_page_before(queryset, (pub_date, pk), page_size)
+        return self.get_page_after(queryset, (pub_date, pk), page_size)
+
+    def get_page_after(self, queryset, key, page_size):
+        queryset = queryset.order_by('-pub_date', '-id')
+        if key is not None:
+            pub_date, pk = key
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(id__lt=pk),
+                pub_date__lte=pub_date,
+            )
+        results = list(queryset[:page_size + 1])
+        if len(results) > page_size:
+            results = results[:page_size]
+            self.next_cursor = self.encode_cursor(
+                results[-1].pub_date, results[-1].id
+            )
+        if key is not None and results:
+            self.previous_cursor = self.encode_cursor(
+                results[0].pub_date, results[0].id, reverse=True
+            )
+        return results
+
+    def get_page_before(self, queryset, key, page_size):
+        pub_date, pk = key
+        results = list(queryset.filter(
+            Q(pub_date__gt=pub_date) | Q(id__gt=pk),
+            pub_date__gte=pub_date,
+        ).order_by('pub_date', 'id')[:page_size + 1])
+        if len(results) > page_size:
+            results = results[:page_size]
+            self.previous_cursor = self.encode_cursor(
+                results[-1].pub_date, results[-1].id, reverse=True
+            )
+        results.reverse()
+        if results:
+            self.next_cursor = self.encode_cursor(
+                results[-1].pub_date, results[-1].id
+            )
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_cursor_link(self.next_cursor)
+        response['previous'] = self.get_cursor_link(self.previous_cursor)
+        response['results'] = data
+        return Response(response)
+
+    def get_cursor_link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            cursor,
+        )
+
+    def encode_cursor(self, pub_date, pk, reverse=False):
+        value = f'{pub_date.isoformat()}{CURSOR_SEPARATOR}{pk}'
+        if reverse:
+            value += f'{CURSOR_SEPARATOR}{REVERSE_MARK}'
+        return urlsafe_b64encode(value.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """(pub_date, id, reverse) из курсора, 404 для неверного."""
+        try:
+            value = urlsafe_b64decode(cursor.encode()).decode()
+            pub_date, pk, *reverse = value.split(CURSOR_SEPARATOR)
+            pub_date = parse_datetime(pub_date)
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None or reverse not in ([], [REVERSE_MARK]):
+            raise NotFound(self.invalid_cursor_message)
+        return pub_date, pk, bool(reverse)
+
+
+class FeedPaginator(RecipePaginator):
+    """Keyset-страницы ленты подписок.
+
+    Курсор и порядок те же, что у RecipePaginator, но id рецептов
+    страницы берутся из ленты пользователя, а queryset их загружает.
+    Ссылки previous у ленты нет.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = True
+        self.count = None
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        self.next_cursor = self.previous_cursor = None
+        key = None
+        if cursor:
+            pub_date, pk, reverse = self.decode_cursor(cursor)
+            if reverse:
+                # Лента читается только вперед.
+                raise NotFound(self.invalid_cursor_message)
+            key = (pub_date, pk)
+        ids = get_feed(request.user.id, key, page_size + 1)
+        results = list(
+            queryset.filter(id__in=ids[:page_size])
+            .order_by('-pub_date', '-id')
+        )
+        if len(ids) > page_size and results:
+            last = results[-1]
+            self.next_cursor = self.encode_cursor(last.pub_date, last.id)
+        return results
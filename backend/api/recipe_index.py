@@ -0,0 +1,178 @@
+import threading
+from itertools import chain
+
+import numpy as np
+from django.db import connections
+
+from recipes.models import RecipeIngredient
+from .cache import get_versions
+
+# Ингредиентов в рецепте и совпадений меньше 2 ** 16.
+COUNT_BITS = 16
+COUNT_MASK = (1 << COUNT_BITS) - 1
+FETCH_CHUNK_SIZE = 10000
+
+
+def fetch_array(queryset, width=1):
+    """Строки values_list() целых чисел в виде массива int64."""
+    if width == 1:
+        values = queryset.iterator(chunk_size=FETCH_CHUNK_SIZE)
+    else:
+        values = chain.from_iterable(
+            queryset.iterator(chunk_size=FETCH_CHUNK_SIZE)
+        )
+    array = np.fromiter(values, dtype=np.int64)
+    return array if width == 1 else array.reshape(-1, width)
+
+
+class RecipeIngredientIndex:
+    """Инвертированный индекс ингредиент -> рецепты в памяти.
+
+    Для каждого ингредиента хранится отсортированный массив номеров
+    рецептов (формат CSR), для каждого рецепта - число ингредиентов.
+    Индекс строится при первом запросе и перестраивается, когда меняется
+    версия 'recipe_ingredients' в общем кеше. Перестройка читает всю
+    таблицу RecipeIngredient, поэтому идет в фоновом потоке, а запросы
+    до ее окончания получают прежний индекс.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._state = None
+        self._rebuild = None
+
+    def build(self):
+        pairs = fetch_array(
+            RecipeIngredient.objects.order_by().values_list(
+                'ingredient_id', 'recipe_id'
+            ),
+            width=2,
+        )
+        recipe_ids, rows = np.unique(pairs[:, 1], return_inverse=True)
+        ingredient_ids, columns = np.unique(pairs[:, 0], return_inverse=True)
+        order = np.lexsort((rows, columns))
+        postings = rows[order].astype(np.int32)
+        offsets = np.zeros(len(ingredient_ids) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(columns, minlength=len(ingredient_ids)),
+            out=offsets[1:],
+        )
+        totals = np.bincount(rows, minlength=len(recipe_ids))
+        return ingredient_ids, offsets, postings, recipe_ids, totals
+
+    def get_state(self):
+        version = get_versions(('recipe_ingredients',))[0]
+        with self._lock:
+            if self._state is None:
+                self._state = self.build()
+                self._version = version
+            elif self._version != version and self._rebuild is None:
+                self._rebuild = threading.Thread(
+                    target=self.rebuild, args=(version,), daemon=True
+                )
+                self._rebuild.start()
+            return self._state
+
+    def rebuild(self, version):
+        """Перестраивает индекс и подменяет им прежний."""
+        state = None
+        try:
+            state = self.build()
+        finally:
+            # У потока свое соединение с БД, оно возвращается в пул.
+            connections.close_all()
+            with self._lock:
+                if state is not None:
+                    self._state, self._version = state, version
+                self._rebuild = None
+
+    def wait(self):
+        """Ждет окончания фоновой перестройки, если она идет."""
+        thread = self._rebuild
+        if thread is not None:
+            thread.join()
+
+    def match(self, ingredient_ids, allowed_ids=None):
+        """Рецепты хотя бы с одним ингредиентом из ingredient_ids.
+
+        Возвращает ключи сортировки, id рецептов, число совпавших и
+        недостающих ингредиентов. allowed_ids ограничивает рецепты
+        результатом остальных фильтров.
+        """
+        known, offsets, postings, recipe_ids, totals = self.get_state()
+        ingredient_ids = np.unique(np.asarray(ingredient_ids, np.int64))
+        positions = np.searchsorted(known, ingredient_ids)
+        positions = positions[positions < len(known)]
+        positions = positions[np.isin(known[positions], ingredient_ids)]
+        rows, matched = np.unique(
+            np.concatenate([postings[:0]] + [
+                postings[offsets[position]:offsets[position + 1]]
+                for position in positions
+            ]),
+            return_counts=True,
+        )
+        if allowed_ids is not None:
+            keep = np.isin(recipe_ids[rows], allowed_ids)
+            rows, matched = rows[keep], matched[keep]
+        missing = totals[rows] - matched
+        # Меньше недостающих, затем больше совпавших, затем новее.
+        shift = int(len(recipe_ids)).bit_length()
+        keys = (
+            (missing << COUNT_BITS | (COUNT_MASK - matched)) << shift
+            | (len(recipe_ids) - 1 - rows)
+        )
+        return keys, recipe_ids[rows], matched, missing
+
+    def rank(self, match, start, stop):
+        """Позиции start:stop по покрытию без полной сортировки.
+
+        argpartition за линейное время выбирает первые stop рецептов,
+        сортируются только они.
+        """
+        keys, ids, matched, missing = match
+        stop = min(stop, len(keys))
+        if start >= stop:
+            return []
+        top = np.argpartition(keys, stop - 1)[:stop]
+        top = top[np.argsort(keys[top])][start:]
+        return list(zip(
+            ids[top].tolist(), matched[top].tolist(), missing[top].tolist()
+        ))
+
+
+recipe_index = RecipeIngredientIndex()
+
+
+class CoverageRanking:
+    """Рецепты queryset по покрытию ингредиентов для Paginator.
+
+    Рецепты страницы загружаются из queryset, у каждого появляются
+    атрибуты matched_ingredients и missing_ingredients.
+    """
+
+    def __init__(self, queryset, ingredient_ids):
+        self.queryset = queryset
+        allowed_ids = None
+        if queryset.query.where:
+            allowed_ids = fetch_array(
+                queryset.order_by().values_list('id', flat=True)
+            )
+        self.match = recipe_index.match(ingredient_ids, allowed_ids)
+
+    def __len__(self):
+        return len(self.match[0])
+
+    def __getitem__(self, index):
+        ranked = recipe_index.rank(self.match, index.start, index.stop)
+        recipes = self.queryset.order_by().in_bulk(
+            [pk for pk, _, _ in ranked]
+        )
+        page = []
+        for pk, matched, missing in ranked:
+            recipe = recipes.get(pk)
+            if recipe is not None:
+                recipe.matched_ingredients = matched
+                recipe.missing_ingredients = missing
+                page.append(recipe)
+        return page
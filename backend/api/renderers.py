@@ -0,0 +1,146 @@
+import csv
+import io
+import os
+from abc import ABCMeta, abstractmethod
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+SHOPPING_LIST_TITLE = 'Foodgram'
+SHOPPING_LIST_HEADER = 'Список покупок:'
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+PDF_LINE_HEIGHT = 18
+PDF_CHUNK_SIZE = 64 * 1024
+
+
+class ShoppingListRenderer(BaseRenderer, metaclass=ABCMeta):
+    """Базовый рендерер списка покупок.
+
+    stream() отдает файл по частям для StreamingHttpResponse,
+    render() используется DRF только для ответов с ошибками,
+    которые отдаются в JSON.
+    """
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return JSONRenderer().render(data)
+
+    @abstractmethod
+    def stream(self, items):
+        """Части файла по строкам get_shopping_list()."""
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    """Список покупок в виде текстового файла."""
+
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, items):
+        yield f'{SHOPPING_LIST_TITLE}\n{SHOPPING_LIST_HEADER}\n'
+        for item in items:
+            yield (
+                f'{item["ingredient__name"]}, {item["amount"]} '
+                f'{item["ingredient__measurement_unit"]}\n'
+            )
+
+
+class Echo:
+    """Буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    """Список покупок в формате CSV."""
+
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, items):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('Ингредиент', 'Количество', 'Единица'))
+        for item in items:
+            yield writer.writerow((
+                item['ingredient__name'],
+                item['amount'],
+                item['ingredient__measurement_unit'],
+            ))
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    """Список покупок в формате PDF.
+
+    reportlab собирает документ целиком, поэтому готовый файл отдается
+    частями по PDF_CHUNK_SIZE. Размер документа ограничен числом
+    различных ингредиентов, а не числом рецептов в корзине.
+    """
+
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+    def get_font_name(self):
+        """Шрифт из SHOPPING_LIST_PDF_FONT.
+
+        Встроенные шрифты reportlab не содержат кириллицы, поэтому без
+        файла шрифта названия ингредиентов превратились бы в мусор.
+        """
+        font_path = settings.SHOPPING_LIST_PDF_FONT
+        if not os.path.exists(font_path):
+            raise ImproperlyConfigured(
+                f'Шрифт для PDF не найден: {font_path}. Укажите в '
+                'SHOPPING_LIST_PDF_FONT путь к TTF-шрифту с кириллицей.'
+            )
+        if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, font_path))
+        return PDF_FONT_NAME
+
+    def stream(self, items):
+        # Документ собирается до ответа: так ошибка шрифта не обрывает
+        # начатый файл, а ASGIHandler, который читает ответ в цикле
+        # событий, получает уже готовые части.
+        buffer = self.build(items, self.get_font_name())
+        return iter(lambda: buffer.read(PDF_CHUNK_SIZE), b'')
+
+    def build(self, items, font_name):
+        buffer = io.BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        _, height = A4
+        pdf.setFont(font_name, PDF_FONT_SIZE)
+        y = height - PDF_MARGIN
+        for line in self.get_lines(items):
+            if y < PDF_MARGIN:
+                pdf.showPage()
+                pdf.setFont(font_name, PDF_FONT_SIZE)
+                y = height - PDF_MARGIN
+            pdf.drawString(PDF_MARGIN, y, line)
+            y -= PDF_LINE_HEIGHT
+        pdf.save()
+        buffer.seek(0)
+        return buffer
+
+    def get_lines(self, items):
+        yield SHOPPING_LIST_TITLE
+        yield SHOPPING_LIST_HEADER
+        for item in items:
+            yield (
+                f'{item["ingredient__name"]}, {item["amount"]} '
+                f'{item["ingredient__measurement_unit"]}'
+            )
+
+
+SHOPPING_LIST_RENDERERS = (
+    TextShoppingListRenderer,
+    CSVShoppingListRenderer,
+    PDFShoppingListRenderer,
+)
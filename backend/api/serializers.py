@@ -1,20 +1,23 @@
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from rest_framework import serializers
 from rest_framework.fields import SerializerMethodField
 from djoser.serializers import UserSerializer
-from django.shortcuts import get_object_or_404
 
-from api.fields import Base64ImageField
+from api.cache import bump_versions
+from api.fields import Base64ImageField, ImageVariantsField
+from foodgram.queue import enqueue
 from recipes.models import (
-    Favorite,
     Ingredient,
     Recipe,
     RecipeIngredient,
     Tag,
-    ShoppingCart
 )
-from users.models import CustomUser, Subscribe
+from users.models import CustomUser
 from recipes.constants import MIN_INGREDIENT_AMOUNT, COOKING_TIME
+from recipes.tasks import generate_image_variants
 
 
 class CustomUserSerializer(UserSerializer):
@@ -30,11 +33,16 @@ class CustomUserSerializer(UserSerializer):
             'first_name',
             'last_name',
             'is_subscribed',
+            'recipes_count',
+            'followers_count',
+            'following_count',
         )
         model = CustomUser
 
     def get_is_subscribed(self, obj):
         """Проверяет, подписан ли пользователь на автора."""
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         return (
             request
@@ -68,6 +76,7 @@ class ShortRecipeSerializer(serializers.ModelSerializer):
     """Серилизатор для краткого вывода рецептов."""
 
     image = Base64ImageField(required=True, allow_null=False)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -75,49 +84,17 @@ class ShortRecipeSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'image_variants',
             'cooking_time',
         )
 
-
-class FavoriteSerializer(serializers.ModelSerializer):
-    """Сериализатор для избранного"""
-
-    recipe = ShortRecipeSerializer(read_only=True)
-    user = serializers.PrimaryKeyRelatedField(
-        queryset=CustomUser.objects.all()
-    )
-
-    class Meta:
-        model = Favorite
-        fields = '__all__'
-
-    def to_internal_value(self, data):
-        recipe_id = data.get('recipe_id')
-        user_id = data.get('user_id')
-
-        if recipe_id is None or user_id is None:
-            raise serializers.ValidationError(
-                'Необходимо предоставить recipe_id и user_id'
-            )
-
-        recipe = get_object_or_404(Recipe, id=recipe_id)
-        user = get_object_or_404(CustomUser, id=user_id)
-
-        return {'recipe': recipe, 'user': user}
-
-    def validate(self, data):
-        user = data.get('user')
-        recipe = data.get('recipe')
-
-        if user.favorites.filter(recipe=recipe).exists():
-            raise serializers.ValidationError(
-                'Этот рецепт уже есть в избранном'
-            )
-
-        return data
-
     def to_representation(self, instance):
-        return ShortRecipeSerializer(instance.recipe).data
+        """В кратком выводе отдаем миниатюру вместо оригинала."""
+        representation = super().to_representation(instance)
+        representation['image'] = representation['image_variants'][
+            'thumbnail'
+        ]
+        return representation
 
 
 class RecipeIngredientGetSerializer(serializers.ModelSerializer):
@@ -139,6 +116,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
 
     tags = TagSerializer(many=True)
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
     author = CustomUserSerializer(read_only=True)
     ingredients = RecipeIngredientGetSerializer(
         many=True, source='recipe_ingredients'
@@ -150,18 +128,43 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         fields = (
             'id',
             'image',
+            'image_variants',
             'author',
             'ingredients',
             'tags',
             'is_favorited',
             'is_in_shopping_cart',
+            'favorites_count',
+            'in_carts_count',
             'name',
             'text',
             'cooking_time',
         )
         model = Recipe
 
+    def to_representation(self, instance):
+        if hasattr(instance, 'is_subscribed'):
+            instance.author.is_subscribed = instance.is_subscribed
+        representation = super().to_representation(instance)
+        if hasattr(instance, 'search_headline'):
+            representation['search_headline'] = instance.search_headline
+        if hasattr(instance, 'matched_ingredients'):
+            representation['matched_ingredients'] = (
+                instance.matched_ingredients
+            )
+            representation['missing_ingredients'] = (
+                instance.missing_ingredients
+            )
+        image_variant = self.context.get('image_variant')
+        if image_variant is not None:
+            representation['image'] = representation['image_variants'][
+                image_variant
+            ]
+        return representation
+
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         return (
             request
@@ -170,6 +173,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         )
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         return (
             request
@@ -250,6 +255,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             for ingredient_data in ingredients_data
         ]
         RecipeIngredient.objects.bulk_create(ingredients)
+        transaction.on_commit(lambda: bump_versions('recipe_ingredients'))
 
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
@@ -261,55 +267,129 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(author=author, **validated_data)
         self.add_ingredients(recipe, ingredients_data)
         recipe.tags.set(tags)
+        Recipe.objects.filter(pk=recipe.pk).update_search_vector()
+        transaction.on_commit(
+            lambda: enqueue(generate_image_variants, recipe.id)
+        )
         return recipe
 
-    def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        self.add_ingredients(instance, ingredients)
-        instance.tags.set(tags)
-        return super().update(instance, validated_data)
-
-
-class ShoppingCartSerializer(serializers.ModelSerializer):
-    """Сериализатор для добавления и удаления рецептов из корзины покупок."""
-
-    class Meta:
-        model = ShoppingCart
-        fields = ('recipe', 'user')
-
-    def to_internal_value(self, data):
-        recipe_id = data.get('recipe_id')
-        user_id = data.get('user_id')
-
-        if recipe_id is None or user_id is None:
-            raise serializers.ValidationError(
-                'Необходимо предоставить recipe_id и user_id'
+    def update_ingredients(self, recipe, ingredients_data):
+        """Применяет к составу рецепта только отличия от текущего.
+
+        Возвращает True, если состав изменился.
+        """
+        current = {
+            item.ingredient_id: item
+            for item in recipe.recipe_ingredients.all()
+        }
+        amounts = {
+            data['id'].id: data['amount'] for data in ingredients_data
+        }
+        removed = [
+            item.pk for pk, item in current.items() if pk not in amounts
+        ]
+        changed = []
+        for pk, item in current.items():
+            if pk in amounts and item.amount != amounts[pk]:
+                item.amount = amounts[pk]
+                changed.append(item)
+        added = [
+            RecipeIngredient(recipe=recipe, ingredient_id=pk, amount=amount)
+            for pk, amount in amounts.items()
+            if pk not in current
+        ]
+        if removed:
+            # Удаление отправляет post_delete, и сигнал сбрасывает версии.
+            RecipeIngredient.objects.filter(pk__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        if added:
+            RecipeIngredient.objects.bulk_create(added)
+        if changed or added:
+            # bulk-операции идут без сигналов: версия сбрасывается один раз.
+            transaction.on_commit(
+                lambda: bump_versions('recipe_ingredients')
             )
+        return bool(removed or changed or added)
 
-        recipe = get_object_or_404(Recipe, id=recipe_id)
-        user = get_object_or_404(CustomUser, id=user_id)
-
-        return {'recipe': recipe, 'user': user}
+    def update_tags(self, recipe, tags):
+        if {tag.id for tag in recipe.tags.all()} == {tag.id for tag in tags}:
+            return False
+        recipe.tags.set(tags)
+        return True
+
+    def is_same_image(self, recipe, image):
+        """Совпадает ли загруженное изображение с текущим."""
+        if not recipe.image:
+            return False
+        try:
+            if recipe.image.size != image.size:
+                return False
+            with recipe.image.open('rb') as current:
+                same = current.read() == image.read()
+        except OSError:
+            return False
+        image.seek(0)
+        return same
+
+    def get_changed_fields(self, instance, validated_data):
+        return [
+            name for name, value in validated_data.items()
+            if getattr(instance, name) != value
+        ]
 
-    def validate(self, data):
-        recipe = data.get('recipe')
-        user = data.get('user')
-        if user.shopping_list.filter(recipe=recipe).exists():
-            raise serializers.ValidationError(
-                'Этот рецепт уже есть в списке покупок'
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        image = validated_data.pop('image', None)
+        ingredients_changed = ingredients is not None and (
+            self.update_ingredients(instance, ingredients)
+        )
+        tags_changed = tags is not None and self.update_tags(instance, tags)
+        fields = self.get_changed_fields(instance, validated_data)
+        if image is not None and not self.is_same_image(instance, image):
+            # Файлы копий прежнего изображения удалит задача.
+            variant_files = [
+                field.name for field in (
+                    instance.image_thumbnail,
+                    instance.image_medium,
+                    instance.image_webp,
+                ) if field
+            ]
+            validated_data.update(
+                image=image,
+                image_thumbnail=None,
+                image_medium=None,
+                image_webp=None,
             )
-        return data
+            fields += ['image', 'image_thumbnail', 'image_medium',
+                       'image_webp']
+            transaction.on_commit(lambda: enqueue(
+                generate_image_variants, instance.id, variant_files
+            ))
+        for name in fields:
+            setattr(instance, name, validated_data[name])
+        if fields or ingredients_changed or tags_changed:
+            # Сохранение обновляет updated_at и через сигнал сбрасывает
+            # кеш, в том числе после bulk-операций с ингредиентами.
+            instance.save(update_fields=fields + ['updated_at'])
+        if ingredients_changed or {'name', 'text'} & set(fields):
+            Recipe.objects.filter(pk=instance.pk).update_search_vector()
+        return instance
+
+    def to_representation(self, instance):
+        request = self.context.get('request')
+        recipe = Recipe.objects.with_related().with_user_flags(
+            request.user if request else AnonymousUser()
+        ).get(pk=instance.pk)
+        return RecipeReadSerializer(recipe, context=self.context).data
 
 
 class SubscriptionSerializer(CustomUserSerializer):
     """Список подписок"""
 
     recipes = serializers.SerializerMethodField(read_only=True)
-    recipes_count = serializers.IntegerField(
-        read_only=True, source='recipes.count'
-    )
 
     class Meta:
         model = CustomUser
@@ -324,33 +404,37 @@ class SubscriptionSerializer(CustomUserSerializer):
         )
 
     def get_recipes(self, obj):
+        """Рецепты автора, заранее ограниченные recipes_limit во view."""
         request = self.context.get('request')
-        limit_recipes = request.query_params.get('recipes_limit')
-        if limit_recipes is not None:
-            recipes = obj.recipes.all()[:(int(limit_recipes))]
-        else:
-            recipes = obj.recipes.all()
+        recipes = obj.recipes.all()
         context = {'request': request}
         return ShortRecipeSerializer(recipes, many=True,
                                      context=context).data
 
 
-class SubscribeSerializer(serializers.ModelSerializer):
-    """Добавление и удаление подписок пользователя."""
-    class Meta:
-        model = Subscribe
-        fields = ('author', 'user')
+class LinkBatchSerializer(serializers.Serializer):
+    """Списки id для массового добавления и удаления."""
+
+    add = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), default=list
+    )
+    remove = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), default=list
+    )
 
     def validate(self, data):
-        user = data.get('user')
-        author = data.get('author')
-        if user == author:
+        add = list(dict.fromkeys(data['add']))
+        remove = list(dict.fromkeys(data['remove']))
+        if not add and not remove:
+            raise serializers.ValidationError('Передайте add или remove.')
+        if len(add) + len(remove) > settings.LINKS_BATCH_MAX_SIZE:
             raise serializers.ValidationError(
-                'Нельзя подписаться на самого себя!'
+                'Не больше {} id за один запрос.'.format(
+                    settings.LINKS_BATCH_MAX_SIZE
+                )
             )
-
-        if author.subscriber.filter(user=user).exists():
+        if set(add) & set(remove):
             raise serializers.ValidationError(
-                'Вы уже подписаны на данного автора.'
+                'Один id не может быть и в add, и в remove.'
             )
-        return data
+        return {'add': add, 'remove': remove}
@@ -0,0 +1,125 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import CustomUser, Subscribe
+from .authentication import invalidate_tokens
+from .cache import bump_versions, invalidate_user_flags
+from .feed import publish_recipe, subscriptions_changed
+
+
+def bump_on_commit(*names):
+    transaction.on_commit(lambda: bump_versions(*names))
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredients(sender, **kwargs):
+    """Сбрасывает кеш и индекс автодополнения ингредиентов."""
+    bump_on_commit('ingredients')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    bump_on_commit('tags')
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe(sender, instance, signal, **kwargs):
+    names = ['recipes', f'recipe:{instance.pk}']
+    if signal is post_delete or kwargs['created']:
+        # Меняется recipes_count автора, а он входит в ответы с рецептами.
+        names.append('users')
+    bump_on_commit(*names)
+
+
+@receiver(post_save, sender=Recipe)
+def publish_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        recipe_id, author_id = instance.pk, instance.author_id
+        transaction.on_commit(lambda: publish_recipe(recipe_id, author_id))
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def invalidate_recipe_ingredients(sender, instance, **kwargs):
+    bump_on_commit(
+        'recipes', 'recipe_ingredients', f'recipe:{instance.recipe_id}'
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        bump_on_commit('recipes', f'recipe:{instance.pk}')
+    else:
+        bump_on_commit('recipes', 'tags')
+
+
+@receiver((post_save, post_delete), sender=CustomUser)
+def invalidate_authors(sender, **kwargs):
+    """Данные автора входят в ответы с рецептами.
+
+    Обновление last_login при входе на них не влияет.
+    """
+    if kwargs.get('update_fields') == frozenset(('last_login',)):
+        return
+    bump_on_commit('users')
+
+
+@receiver((post_save, post_delete), sender=CustomUser)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    """Снимок пользователя в кеше токенов устаревает при его изменении.
+
+    Так блокировка пользователя и смена пароля действуют сразу.
+    """
+    if kwargs.get('update_fields') == frozenset(('last_login',)):
+        return
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_tokens(*Token.objects.filter(
+        user_id=user_id
+    ).values_list('key', flat=True)))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Выход через djoser удаляет токен и его снимок в кеше."""
+    key = instance.key
+    transaction.on_commit(lambda: invalidate_tokens(key))
+
+
+# Счетчики меняются через update() без сигналов моделей, поэтому версии
+# ответов со счетчиками увеличиваются здесь и в links.links_changed().
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+def invalidate_favorites(sender, instance, **kwargs):
+    invalidate_user_flags(instance.user_id, 'favorites')
+    bump_on_commit('recipes', f'recipe:{instance.recipe_id}')
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def invalidate_shopping_cart(sender, instance, **kwargs):
+    invalidate_user_flags(instance.user_id, 'shopping_cart')
+    bump_on_commit('recipes', f'recipe:{instance.recipe_id}')
+
+
+@receiver((post_save, post_delete), sender=Subscribe)
+def invalidate_subscriptions(sender, instance, **kwargs):
+    invalidate_user_flags(instance.user_id, 'subscriptions')
+    bump_on_commit('users')
+
+
+@receiver(post_save, sender=Subscribe)
+def subscription_added_to_feed(sender, instance, created, **kwargs):
+    if created:
+        subscriptions_changed(instance.user_id, [instance.author_id], 1)
+
+
+@receiver(post_delete, sender=Subscribe)
+def subscription_removed_from_feed(sender, instance, **kwargs):
+    subscriptions_changed(instance.user_id, [instance.author_id], -1)
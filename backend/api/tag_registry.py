@@ -0,0 +1,41 @@
+import threading
+
+from recipes.models import Tag
+from .cache import get_versions
+
+
+class TagRegistry:
+    """Slug и id тегов в памяти процесса.
+
+    Фильтр рецептов берет отсюда варианты выбора и id тегов вместо
+    SELECT DISTINCT по тегам рецептов на каждый запрос. Реестр
+    перечитывается, когда сигналы меняют версию 'tags' в общем кеше.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._ids = {}
+
+    def get_ids(self):
+        """Словарь slug -> id всех тегов."""
+        version = get_versions(('tags',))[0]
+        with self._lock:
+            if self._version != version:
+                self._ids = dict(
+                    Tag.objects.order_by('slug').values_list('slug', 'id')
+                )
+                self._version = version
+            return self._ids
+
+
+tag_registry = TagRegistry()
+
+
+def get_tag_choices():
+    """Варианты выбора фильтра тегов.
+
+    Функция модуля, а не метод: FilterSet копирует фильтры через
+    deepcopy, а блокировку реестра скопировать нельзя.
+    """
+    return [(slug, slug) for slug in tag_registry.get_ids()]
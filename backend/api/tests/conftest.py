@@ -0,0 +1,122 @@
+import fakeredis
+import pytest
+import redis
+from django.core.cache import cache
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import CustomUser
+
+
+@pytest.fixture(autouse=True)
+def clear_cache(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(params=('locmem', 'redis'))
+def cache_backend(request, settings, monkeypatch):
+    """Кеш в памяти процесса и RedisCache поверх fakeredis."""
+    if request.param == 'redis':
+        server = fakeredis.FakeServer()
+        monkeypatch.setattr(
+            redis.Redis,
+            'from_url',
+            lambda url, **kwargs: fakeredis.FakeRedis(
+                server=server, **kwargs
+            ),
+        )
+        settings.CACHES = {'default': {
+            'BACKEND': 'foodgram.redis_cache.RedisCache',
+            'LOCATION': 'redis://localhost:6379/0',
+        }}
+    return request.param
+
+
+@pytest.fixture
+def make_user(db):
+    def make_user(username):
+        return CustomUser.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            first_name=username,
+            last_name=username,
+            password='password-123',
+        )
+
+    return make_user
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user('user')
+
+
+@pytest.fixture
+def author(make_user):
+    return make_user('author')
+
+
+@pytest.fixture
+def tags(db):
+    return [
+        Tag.objects.create(name=f'Тег {i}', color='#00000' + str(i),
+                           slug=f'tag-{i}')
+        for i in range(3)
+    ]
+
+
+@pytest.fixture
+def ingredients(db):
+    # bulk_create не заполняет pk в SQLite, поэтому строки по одной.
+    return [
+        Ingredient.objects.create(name=f'Ингредиент {i}',
+                                  measurement_unit='г')
+        for i in range(10)
+    ]
+
+
+@pytest.fixture
+def make_recipe(db, ingredients):
+    def make_recipe(author, tags=(), ingredient_count=3, **kwargs):
+        recipe = Recipe.objects.create(
+            author=author,
+            name=kwargs.pop('name', 'Рецепт'),
+            text=kwargs.pop('text', 'Описание'),
+            cooking_time=10,
+            image='recipes/image.png',
+            **kwargs,
+        )
+        recipe.tags.set(tags)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                             amount=index + 1)
+            for index, ingredient in enumerate(ingredients[:ingredient_count])
+        )
+        return recipe
+
+    return make_recipe
+
+
+@pytest.fixture
+def anonymous_client():
+    return APIClient()
+
+
+@pytest.fixture
+def make_client():
+    def make_client(user):
+        client = APIClient()
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    return make_client
+
+
+@pytest.fixture
+def user_client(make_client, user):
+    return make_client(user)
@@ -0,0 +1,142 @@
+import asyncio
+import json
+
+import pytest
+from django.core.cache import cache
+from rest_framework.authtoken.models import Token
+
+from foodgram.asgi import application
+from recipes.models import ShoppingCart
+from users.models import Subscribe
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def asgi_get(path, query='', token=None):
+    """GET через foodgram.asgi.application: статус, заголовки и тело."""
+    headers = [(b'host', b'testserver')]
+    if token is not None:
+        headers.append((b'authorization', f'Token {token}'.encode()))
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': headers,
+        'client': ('127.0.0.1', 0),
+        'server': ('testserver', 80),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    start = messages[0]
+    body = b''.join(
+        message.get('body', b'') for message in messages[1:]
+        if message['type'] == 'http.response.body'
+    )
+    headers = {name.lower(): value for name, value in start['headers']}
+    return start['status'], headers, body
+
+
+@pytest.fixture
+def token(user):
+    return Token.objects.create(user=user).key
+
+
+@pytest.fixture
+def cart(user, author, make_recipe):
+    recipe = make_recipe(author, ingredient_count=3)
+    ShoppingCart.objects.create(user=user, recipe=recipe)
+    return recipe
+
+
+@pytest.mark.parametrize('export_format', ('txt', 'csv', 'pdf'))
+def test_download_shopping_cart_through_asgi(cart, token, ingredients,
+                                             export_format):
+    status, headers, body = asgi_get(
+        '/api/recipes/download_shopping_cart/', f'format={export_format}',
+        token,
+    )
+    assert status == 200, body
+    assert headers[b'content-disposition'] == (
+        f'attachment; filename=shopping-list.{export_format}'.encode()
+    )
+    if export_format == 'pdf':
+        assert body.startswith(b'%PDF')
+    else:
+        assert ingredients[2].name in body.decode()
+
+
+def test_download_shopping_cart_requires_auth_through_asgi():
+    status, _, _ = asgi_get('/api/recipes/download_shopping_cart/')
+    assert status == 401
+
+
+def test_async_recipe_list_through_asgi(cart, token):
+    status, _, body = asgi_get('/api/recipes/', token=token)
+    assert status == 200
+    assert json.loads(body)['results'][0]['id'] == cart.id
+
+
+def test_async_recipe_detail_cache_miss_and_hit(cart, token, make_client,
+                                                user):
+    expected = make_client(user).get(f'/api/recipes/{cart.id}/').json()
+    cache.clear()
+    for _ in range(2):
+        status, _, body = asgi_get(f'/api/recipes/{cart.id}/', token=token)
+        assert status == 200
+        assert json.loads(body) == expected
+    status, _, _ = asgi_get(f'/api/recipes/{cart.id + 1000}/', token=token)
+    assert status == 404
+
+
+@pytest.fixture
+def subscriptions(user, make_user, make_recipe):
+    for index in range(5):
+        author = make_user(f'author-{index}')
+        make_recipe(author, ingredient_count=1)
+        make_recipe(author, ingredient_count=1)
+        Subscribe.objects.create(user=user, author=author)
+
+
+@pytest.mark.parametrize('query', (
+    'limit=2',
+    'limit=2&page=2',
+    'limit=2&page=last',
+    'limit=2&page=3&recipes_limit=1',
+    'limit=10',
+))
+def test_async_subscriptions_match_sync(subscriptions, token, user,
+                                        make_client, query):
+    url = '/api/users/subscriptions/'
+    expected = make_client(user).get(f'{url}?{query}').json()
+    status, _, body = asgi_get(url, query, token)
+    assert status == 200
+    assert json.loads(body) == expected
+
+
+def test_async_subscriptions_unknown_page(subscriptions, token):
+    for query in ('page=99', 'page=0', 'page=abc'):
+        status, _, _ = asgi_get('/api/users/subscriptions/', query, token)
+        assert status == 404
+    status, _, _ = asgi_get('/api/users/subscriptions/')
+    assert status == 401
+
+
+@pytest.mark.parametrize('index_enabled', (True, False))
+def test_async_ingredient_search(ingredients, settings, index_enabled):
+    settings.INGREDIENT_INDEX_ENABLED = index_enabled
+    status, _, body = asgi_get('/api/ingredients/', 'name=Ингредиент 1')
+    assert status == 200
+    assert [item['id'] for item in json.loads(body)] == [ingredients[1].id]
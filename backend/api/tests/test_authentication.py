@@ -0,0 +1,83 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.authtoken.models import Token
+
+from api.authentication import (SNAPSHOT_FIELDS, CachedTokenAuthentication,
+                                get_token_cache_key)
+
+# Снимки удаляются в on_commit, поэтому нужны настоящие коммиты.
+pytestmark = [
+    pytest.mark.django_db(transaction=True),
+    pytest.mark.usefixtures('cache_backend'),
+]
+
+URL = '/api/users/me/'
+
+
+@pytest.fixture
+def token(user):
+    return Token.objects.create(user=user)
+
+
+@pytest.fixture
+def client(make_client, user, token):
+    """Клиент, чей снимок пользователя уже лежит в кеше токенов."""
+    client = make_client(user)
+    assert client.get(URL).status_code == 200
+    assert cache.get(get_token_cache_key(token.key)) is not None
+    return client
+
+
+def test_cache_hit_builds_user_without_queries(
+    client, user, token, django_assert_num_queries
+):
+    with django_assert_num_queries(0):
+        cached_user, cached_token = (
+            CachedTokenAuthentication().authenticate_credentials(token.key)
+        )
+    assert cached_token.key == token.key
+    assert cached_token.user is cached_user
+    assert not cached_user._state.adding
+    assert cached_user._state.db == 'default'
+    assert {name: getattr(cached_user, name) for name in SNAPSHOT_FIELDS} == {
+        name: getattr(user, name) for name in SNAPSHOT_FIELDS
+    }
+    assert 'password' in cached_user.get_deferred_fields()
+    with django_assert_num_queries(1):
+        assert cached_user.password == user.password
+        assert cached_user.date_joined == user.date_joined
+        assert cached_user.recipes_count == user.recipes_count
+    assert cached_user.get_deferred_fields() == set()
+
+
+def test_logout_rejects_cached_token(client, token):
+    assert client.post('/api/auth/token/logout/').status_code == 204
+    assert cache.get(get_token_cache_key(token.key)) is None
+    assert client.get(URL).status_code == 401
+
+
+def test_deleted_token_is_rejected(client, token):
+    token.delete()
+    assert client.get(URL).status_code == 401
+
+
+def test_inactive_user_is_rejected(client, user):
+    user.is_active = False
+    user.save()
+    assert client.get(URL).status_code == 401
+
+
+def test_password_change_rejects_cached_token(client, user):
+    response = client.post('/api/users/set_password/', {
+        'current_password': 'password-123',
+        'new_password': 'new-password-456',
+    })
+    assert response.status_code == 204
+    assert client.get(URL).status_code == 401
+    user.refresh_from_db()
+    assert user.check_password('new-password-456')
+
+
+def test_last_login_update_keeps_snapshot(client, user, token):
+    user.save(update_fields=['last_login'])
+    assert cache.get(get_token_cache_key(token.key)) is not None
@@ -0,0 +1,140 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Ingredient, Tag
+
+pytestmark = [
+    pytest.mark.django_db(transaction=True),
+    pytest.mark.usefixtures('cache_backend'),
+]
+
+
+@pytest.fixture
+def recipe(author, tags, make_recipe):
+    return make_recipe(author, tags=tags[:1], name='Борщ')
+
+
+@pytest.fixture
+def author_client(make_client, author):
+    return make_client(author)
+
+
+def read(client, url, etag=None):
+    """GET после записи: обязан быть 200 со свежими данными, не 304."""
+    headers = {} if etag is None else {'HTTP_IF_NONE_MATCH': etag}
+    response = client.get(url, **headers)
+    assert response.status_code == 200
+    return response
+
+
+def detail_url(recipe):
+    return f'/api/recipes/{recipe.id}/'
+
+
+def test_anonymous_reads_are_served_from_cache(recipe, anonymous_client):
+    first = read(anonymous_client, '/api/recipes/')
+    with CaptureQueriesContext(connection) as context:
+        second = read(anonymous_client, '/api/recipes/')
+    assert len(context) == 0
+    assert second.json() == first.json()
+
+
+def test_favorite_refreshes_counter_and_own_flag(
+    recipe, anonymous_client, user_client
+):
+    list_etag = read(anonymous_client, '/api/recipes/')['ETag']
+    own_etag = read(user_client, detail_url(recipe))['ETag']
+    user_client.post(f'/api/recipes/{recipe.id}/favorite/')
+    item = read(anonymous_client, '/api/recipes/', list_etag).json()[
+        'results'
+    ][0]
+    assert item['favorites_count'] == 1
+    assert item['is_favorited'] is False
+    data = read(user_client, detail_url(recipe), own_etag).json()
+    assert data['is_favorited'] is True
+
+
+def test_subscribe_refreshes_author_data(
+    recipe, author, anonymous_client, user_client
+):
+    etag = read(user_client, detail_url(recipe))['ETag']
+    anonymous_etag = read(anonymous_client, detail_url(recipe))['ETag']
+    user_client.post(f'/api/users/{author.id}/subscribe/')
+    data = read(user_client, detail_url(recipe), etag).json()
+    assert data['author']['is_subscribed'] is True
+    assert data['author']['followers_count'] == 1
+    data = read(anonymous_client, detail_url(recipe), anonymous_etag).json()
+    assert data['author']['is_subscribed'] is False
+    assert data['author']['followers_count'] == 1
+
+
+def test_recipe_edit_refreshes_list_and_detail(
+    recipe, tags, ingredients, anonymous_client, author_client
+):
+    list_etag = read(anonymous_client, '/api/recipes/')['ETag']
+    detail_etag = read(anonymous_client, detail_url(recipe))['ETag']
+    response = author_client.patch(detail_url(recipe), {
+        'name': 'Щи',
+        'tags': [tags[1].id],
+        'ingredients': [{'id': ingredients[5].id, 'amount': 7}],
+    }, format='json')
+    assert response.status_code == 200, response.json()
+    item = read(anonymous_client, '/api/recipes/', list_etag).json()[
+        'results'
+    ][0]
+    data = read(anonymous_client, detail_url(recipe), detail_etag).json()
+    for recipe_data in (item, data):
+        assert recipe_data['name'] == 'Щи'
+        assert [tag['id'] for tag in recipe_data['tags']] == [tags[1].id]
+        assert [
+            (ingredient['id'], ingredient['amount'])
+            for ingredient in recipe_data['ingredients']
+        ] == [(ingredients[5].id, 7)]
+
+
+def test_recipe_delete_refreshes_list(recipe, anonymous_client,
+                                      author_client):
+    etag = read(anonymous_client, '/api/recipes/')['ETag']
+    assert author_client.delete(detail_url(recipe)).status_code == 204
+    assert read(anonymous_client, '/api/recipes/', etag).json()[
+        'count'
+    ] == 0
+    assert anonymous_client.get(detail_url(recipe)).status_code == 404
+
+
+def test_tag_and_ingredient_changes_refresh_reads(
+    recipe, tags, ingredients, anonymous_client
+):
+    etags = {
+        url: read(anonymous_client, url)['ETag']
+        for url in ('/api/recipes/', '/api/tags/', '/api/ingredients/')
+    }
+    tag = Tag.objects.get(pk=tags[0].pk)
+    tag.name = 'Завтрак'
+    tag.save()
+    Ingredient.objects.create(name='Укроп', measurement_unit='г')
+    item = read(anonymous_client, '/api/recipes/', etags['/api/recipes/'])
+    assert item.json()['results'][0]['tags'][0]['name'] == 'Завтрак'
+    tags_data = read(anonymous_client, '/api/tags/', etags['/api/tags/'])
+    assert 'Завтрак' in [tag['name'] for tag in tags_data.json()]
+    names = [
+        ingredient['name'] for ingredient in read(
+            anonymous_client, '/api/ingredients/',
+            etags['/api/ingredients/'],
+        ).json()
+    ]
+    assert 'Укроп' in names
+
+
+def test_unrelated_recipe_edit_keeps_other_detail_cached(
+    recipe, author, make_recipe, anonymous_client
+):
+    other = make_recipe(author, name='Плов')
+    etag = read(anonymous_client, detail_url(recipe))['ETag']
+    other.name = 'Плов узбекский'
+    other.save()
+    response = anonymous_client.get(
+        detail_url(recipe), HTTP_IF_NONE_MATCH=etag
+    )
+    assert response.status_code == 304
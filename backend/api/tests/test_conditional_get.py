@@ -0,0 +1,104 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Favorite, Ingredient, Tag
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture
+def recipe(author, tags, make_recipe):
+    return make_recipe(author, tags=tags[:1])
+
+
+def get(client, url, etag=None, **headers):
+    if etag is not None:
+        headers['HTTP_IF_NONE_MATCH'] = etag
+    return client.get(url, **headers)
+
+
+@pytest.mark.parametrize('url', (
+    '/api/recipes/', '/api/tags/', '/api/ingredients/',
+))
+def test_unchanged_collection_answers_304_without_queries(
+    recipe, anonymous_client, url
+):
+    response = get(anonymous_client, url)
+    assert response.status_code == 200
+    with CaptureQueriesContext(connection) as context:
+        response = get(anonymous_client, url, response['ETag'])
+    assert response.status_code == 304
+    assert len(context) == 0
+
+
+def test_if_modified_since_answers_304(recipe, anonymous_client):
+    response = get(anonymous_client, f'/api/recipes/{recipe.id}/')
+    response = get(
+        anonymous_client, f'/api/recipes/{recipe.id}/',
+        HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+    )
+    assert response.status_code == 304
+
+
+@pytest.mark.parametrize('url', ('favorite', 'shopping_cart'))
+def test_other_users_link_changes_list_and_detail_validators(
+    recipe, anonymous_client, user_client, url
+):
+    urls = ('/api/recipes/', f'/api/recipes/{recipe.id}/')
+    etags = [get(anonymous_client, path)['ETag'] for path in urls]
+    user_client.post(f'/api/recipes/{recipe.id}/{url}/')
+    for path, etag in zip(urls, etags):
+        response = get(anonymous_client, path, etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+
+def test_subscription_changes_recipe_validators(
+    recipe, author, anonymous_client, user_client
+):
+    path = f'/api/recipes/{recipe.id}/'
+    etag = get(anonymous_client, path)['ETag']
+    user_client.post(f'/api/users/{author.id}/subscribe/')
+    response = get(anonymous_client, path, etag)
+    assert response.status_code == 200
+    assert response.json()['author']['followers_count'] == 1
+
+
+def test_user_flags_change_only_that_users_validator(
+    recipe, user, make_user, make_client, user_client
+):
+    other_client = make_client(make_user('other'))
+    path = f'/api/recipes/{recipe.id}/'
+    etag = get(user_client, path)['ETag']
+    other_etag = get(other_client, path)['ETag']
+    assert etag != other_etag
+    Favorite.objects.create(user=user, recipe=recipe)
+    response = get(user_client, path, etag)
+    assert response.status_code == 200
+    assert response.json()['is_favorited'] is True
+    assert response['Cache-Control'] == 'private, no-cache'
+    # favorites_count изменился и у остальных.
+    assert get(other_client, path, other_etag).status_code == 200
+
+
+@pytest.mark.parametrize('create, url', (
+    (lambda: Tag.objects.create(name='Новый', color='#ffffff', slug='new'),
+     '/api/tags/'),
+    (lambda: Ingredient.objects.create(name='Соль', measurement_unit='г'),
+     '/api/ingredients/'),
+))
+def test_new_rows_change_collection_validators(
+    anonymous_client, create, url
+):
+    etag = get(anonymous_client, url)['ETag']
+    create()
+    assert get(anonymous_client, url, etag).status_code == 200
+
+
+def test_validators_survive_cache_eviction(recipe, anonymous_client):
+    path = f'/api/recipes/{recipe.id}/'
+    etag = get(anonymous_client, path)['ETag']
+    cache.clear()
+    assert get(anonymous_client, path, etag).status_code == 200
@@ -0,0 +1,133 @@
+import pytest
+from django.core.management import call_command
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import CustomUser, Subscribe
+
+# Версии кеша увеличиваются в on_commit, поэтому нужны настоящие коммиты.
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture
+def recipe(author, make_recipe):
+    return make_recipe(author)
+
+
+def get_list_recipe(client, recipe):
+    response = client.get('/api/recipes/')
+    assert response.status_code == 200
+    return next(
+        item for item in response.json()['results']
+        if item['id'] == recipe.id
+    )
+
+
+def get_detail(client, recipe):
+    response = client.get(f'/api/recipes/{recipe.id}/')
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.mark.parametrize('url, field', (
+    ('favorite', 'favorites_count'),
+    ('shopping_cart', 'in_carts_count'),
+))
+def test_recipe_counters_are_fresh_in_cached_reads(
+    recipe, anonymous_client, user_client, url, field
+):
+    assert get_list_recipe(anonymous_client, recipe)[field] == 0
+    assert get_detail(anonymous_client, recipe)[field] == 0
+    response = user_client.post(f'/api/recipes/{recipe.id}/{url}/')
+    assert response.status_code == 201
+    assert get_list_recipe(anonymous_client, recipe)[field] == 1
+    assert get_detail(anonymous_client, recipe)[field] == 1
+    assert user_client.delete(
+        f'/api/recipes/{recipe.id}/{url}/'
+    ).status_code == 204
+    assert get_list_recipe(anonymous_client, recipe)[field] == 0
+    assert get_detail(anonymous_client, recipe)[field] == 0
+
+
+@pytest.mark.parametrize('url, field', (
+    ('favorite_batch', 'favorites_count'),
+    ('shopping_cart_batch', 'in_carts_count'),
+))
+def test_batch_updates_recipe_counters_in_cached_reads(
+    recipe, anonymous_client, user_client, url, field
+):
+    assert get_list_recipe(anonymous_client, recipe)[field] == 0
+    response = user_client.post(
+        f'/api/recipes/{url}/', {'add': [recipe.id]}, format='json'
+    )
+    assert response.status_code == 200
+    assert get_list_recipe(anonymous_client, recipe)[field] == 1
+    assert get_detail(anonymous_client, recipe)[field] == 1
+
+
+def test_subscription_updates_author_counters_in_cached_reads(
+    recipe, author, anonymous_client, user_client
+):
+    assert get_detail(anonymous_client, recipe)['author'][
+        'followers_count'
+    ] == 0
+    assert user_client.post(
+        f'/api/users/{author.id}/subscribe/'
+    ).status_code == 201
+    assert get_detail(anonymous_client, recipe)['author'][
+        'followers_count'
+    ] == 1
+    assert get_list_recipe(anonymous_client, recipe)['author'][
+        'followers_count'
+    ] == 1
+    user_client.post(
+        '/api/users/subscribe_batch/', {'remove': [author.id]},
+        format='json',
+    )
+    assert get_list_recipe(anonymous_client, recipe)['author'][
+        'followers_count'
+    ] == 0
+
+
+def test_orm_writes_update_counters_in_cached_reads(
+    recipe, user, author, anonymous_client
+):
+    get_list_recipe(anonymous_client, recipe)
+    Favorite.objects.create(user=user, recipe=recipe)
+    ShoppingCart.objects.create(user=user, recipe=recipe)
+    Subscribe.objects.create(user=user, author=author)
+    data = get_list_recipe(anonymous_client, recipe)
+    assert data['favorites_count'] == 1
+    assert data['in_carts_count'] == 1
+    assert data['author']['followers_count'] == 1
+
+
+def test_new_recipe_updates_author_recipes_count_in_cached_detail(
+    recipe, author, make_recipe, anonymous_client
+):
+    assert get_detail(anonymous_client, recipe)['author'][
+        'recipes_count'
+    ] == 1
+    other = make_recipe(author)
+    assert get_detail(anonymous_client, recipe)['author'][
+        'recipes_count'
+    ] == 2
+    other.delete()
+    assert get_detail(anonymous_client, recipe)['author'][
+        'recipes_count'
+    ] == 1
+
+
+def test_recount_repairs_drift(recipe, user, author):
+    Favorite.objects.create(user=user, recipe=recipe)
+    Subscribe.objects.create(user=user, author=author)
+    Recipe.objects.update(favorites_count=7, in_carts_count=3)
+    CustomUser.objects.update(
+        recipes_count=5, followers_count=5, following_count=5
+    )
+    call_command('recount')
+    recipe.refresh_from_db()
+    author.refresh_from_db()
+    user.refresh_from_db()
+    assert (recipe.favorites_count, recipe.in_carts_count) == (1, 0)
+    assert (author.recipes_count, author.followers_count) == (1, 1)
+    assert (user.following_count, user.followers_count) == (1, 0)
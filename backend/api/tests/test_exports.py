@@ -0,0 +1,147 @@
+import fakeredis
+import pytest
+import redis
+from rq import SimpleWorker
+
+from api import exports
+from api.exports import (ExportOutdated, build_shopping_list_export,
+                         get_cart_snapshot, get_export_file)
+from recipes.models import RecipeIngredient, ShoppingCart
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+URL = '/api/recipes/shopping_cart_exports/'
+
+
+@pytest.fixture(params=('inline', 'rq'))
+def run_jobs(request, settings, monkeypatch):
+    """Выполнение задач без Redis и в очереди RQ поверх fakeredis.
+
+    Возвращает функцию, которая отрабатывает все задачи из очереди,
+    как воркер; без очереди задачи выполняются сразу при постановке.
+    """
+    if request.param == 'inline':
+        settings.RQ_ENABLED = False
+        return lambda: None
+    import django_rq
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        redis.Redis,
+        'from_url',
+        lambda url, **kwargs: fakeredis.FakeRedis(server=server, **kwargs),
+    )
+    settings.RQ_ENABLED = True
+
+    def run_jobs():
+        queue = django_rq.get_queue()
+        SimpleWorker([queue], connection=queue.connection).work(burst=True)
+
+    return run_jobs
+
+
+@pytest.fixture
+def recipes(user, author, make_recipe):
+    recipes = [make_recipe(author, ingredient_count=count)
+               for count in (2, 3)]
+    ShoppingCart.objects.create(user=user, recipe=recipes[0])
+    return recipes
+
+
+def start(client, export_format='txt'):
+    response = client.post(URL, {'format': export_format})
+    assert response.status_code == 202
+    return response.json()
+
+
+def status(client, export_id):
+    return client.get(f'{URL}{export_id}/').json()['status']
+
+
+def download(client, export_id):
+    return client.get(f'{URL}{export_id}/download/')
+
+
+def test_export_is_built_and_reused(recipes, user_client, run_jobs,
+                                    ingredients):
+    export_id = start(user_client)['id']
+    run_jobs()
+    assert status(user_client, export_id) == 'finished'
+    assert download(user_client, export_id).content.decode().splitlines() == [
+        'Foodgram',
+        'Список покупок:',
+        f'{ingredients[0].name}, 1 г',
+        f'{ingredients[1].name}, 2 г',
+    ]
+    again = start(user_client)
+    assert again['id'] == export_id
+    assert again['status'] == 'finished'
+
+
+def test_other_user_cannot_see_export(recipes, user_client, run_jobs,
+                                      make_user, make_client):
+    export_id = start(user_client)['id']
+    run_jobs()
+    other_client = make_client(make_user('other'))
+    assert other_client.get(f'{URL}{export_id}/').status_code == 404
+    assert download(other_client, export_id).status_code == 404
+
+
+def test_cart_change_gives_new_export(recipes, user_client, run_jobs,
+                                      ingredients):
+    export_id = start(user_client)['id']
+    user_client.post(f'/api/recipes/{recipes[1].id}/shopping_cart/')
+    run_jobs()
+    new_id = start(user_client)['id']
+    run_jobs()
+    assert new_id != export_id
+    assert status(user_client, new_id) == 'finished'
+    lines = download(user_client, new_id).content.decode().splitlines()
+    assert lines[2:] == [
+        f'{ingredients[0].name}, 2 г',
+        f'{ingredients[1].name}, 4 г',
+        f'{ingredients[2].name}, 3 г',
+    ]
+
+
+def test_other_users_clicks_keep_export(recipes, user_client, run_jobs,
+                                        make_user, make_client):
+    export_id = start(user_client)['id']
+    other_client = make_client(make_user('other'))
+    for action in ('favorite', 'shopping_cart'):
+        response = other_client.post(
+            f'/api/recipes/{recipes[0].id}/{action}/'
+        )
+        assert response.status_code == 201
+    run_jobs()
+    assert status(user_client, export_id) == 'finished'
+    assert start(user_client)['id'] == export_id
+
+
+def test_queued_job_refuses_changed_cart(recipes, user_client, run_jobs,
+                                         settings):
+    if not settings.RQ_ENABLED:
+        pytest.skip('без очереди задача выполняется при постановке')
+    export_id = start(user_client)['id']
+    assert status(user_client, export_id) == 'queued'
+    user_client.post(f'/api/recipes/{recipes[1].id}/shopping_cart/')
+    run_jobs()
+    assert status(user_client, export_id) == 'failed'
+    assert download(user_client, export_id).status_code == 404
+
+
+def test_job_refuses_recipe_edited_during_build(recipes, user, monkeypatch):
+    snapshot = get_cart_snapshot(user.id)
+    aggregate = exports.get_recipes_shopping_list
+
+    def edit_during_build(recipe_ids):
+        items = aggregate(recipe_ids)
+        RecipeIngredient.objects.filter(recipe=recipes[0]).update(amount=10)
+        return items
+
+    monkeypatch.setattr(
+        exports, 'get_recipes_shopping_list', edit_during_build
+    )
+    with pytest.raises(ExportOutdated):
+        build_shopping_list_export('0' * 64, user.id, 'txt', snapshot)
+    assert get_export_file('0' * 64) is None
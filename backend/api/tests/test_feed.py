@@ -0,0 +1,68 @@
+import fakeredis
+import pytest
+
+from api import feed
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+URL = '/api/recipes/feed/'
+FEED_LENGTH = 5
+
+
+@pytest.fixture
+def redis_client(settings, monkeypatch):
+    """Ленты в fakeredis, укороченные до FEED_LENGTH рецептов."""
+    settings.FEED_TIMELINES_ENABLED = True
+    settings.FEED_LENGTH = FEED_LENGTH
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(feed, 'get_client', lambda: client)
+    return client
+
+
+def subscribe(client, author):
+    response = client.post(f'/api/users/{author.id}/subscribe/')
+    assert response.status_code == 201
+
+
+def read_feed(client, limit):
+    """id всех рецептов ленты, прочитанной постранично по курсору."""
+    ids = []
+    url, params = URL, {'limit': limit}
+    while url:
+        response = client.get(url, params)
+        assert response.status_code == 200
+        page = [recipe['id'] for recipe in response.json()['results']]
+        assert page
+        ids.extend(page)
+        url, params = response.json()['next'], None
+    return ids
+
+
+def make_recipes(author, make_recipe, count):
+    recipes = [make_recipe(author, ingredient_count=1) for _ in range(count)]
+    return [recipe.id for recipe in reversed(recipes)]
+
+
+def get_timeline_size(redis_client, user):
+    # Без отметки BUILT.
+    return redis_client.zcard(feed.get_key(user.id)) - 1
+
+
+def test_pages_past_built_timeline_come_from_db(
+    redis_client, author, make_recipe, user, user_client
+):
+    expected = make_recipes(author, make_recipe, 12)
+    subscribe(user_client, author)
+    assert read_feed(user_client, 4) == expected
+    assert get_timeline_size(redis_client, user) == FEED_LENGTH
+
+
+def test_pages_past_trimmed_timeline_come_from_db(
+    redis_client, author, make_recipe, user, user_client
+):
+    subscribe(user_client, author)
+    assert user_client.get(URL).json()['results'] == []
+    expected = make_recipes(author, make_recipe, 12)
+    assert get_timeline_size(redis_client, user) == FEED_LENGTH
+    assert read_feed(user_client, 4) == expected
+    assert read_feed(user_client, 5) == expected
@@ -0,0 +1,108 @@
+import base64
+import os
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from recipes.constants import IMAGE_VARIANTS, MAX_IMAGE_SIZE
+from recipes.models import Recipe
+from recipes.tasks import generate_image_variants
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+URL = '/api/recipes/'
+
+
+def make_image(color, image_format='PNG', size=(400, 300)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def data_uri(content, subtype='png'):
+    return f'data:image/{subtype};base64,{base64.b64encode(content).decode()}'
+
+
+@pytest.fixture
+def author_client(make_client, author):
+    return make_client(author)
+
+
+@pytest.fixture
+def payload(tags, ingredients):
+    return {
+        'name': 'Рецепт',
+        'text': 'Описание',
+        'cooking_time': 10,
+        'tags': [tags[0].id],
+        'ingredients': [{'id': ingredients[0].id, 'amount': 1}],
+        'image': data_uri(make_image('red')),
+    }
+
+
+def media_files(settings):
+    return sorted(
+        os.path.relpath(os.path.join(path, name), settings.MEDIA_ROOT)
+        for path, _, names in os.walk(settings.MEDIA_ROOT)
+        for name in names
+    )
+
+
+def variant_files(recipe):
+    return [getattr(recipe, f'image_{name}').name for name in IMAGE_VARIANTS]
+
+
+def test_create_saves_image_and_variants(payload, author_client, settings):
+    response = author_client.post(URL, payload, format='json')
+    assert response.status_code == 201, response.json()
+    recipe = Recipe.objects.get(pk=response.json()['id'])
+    assert all(variant_files(recipe))
+    assert media_files(settings) == sorted(
+        [recipe.image.name, *variant_files(recipe)]
+    )
+    with recipe.image_thumbnail.open('rb') as file:
+        size, _, _ = IMAGE_VARIANTS['thumbnail']
+        assert max(Image.open(file).size) == size
+
+
+@pytest.mark.parametrize('image', (
+    'data:image/png;base64',
+    'data:image/png,iVBORw0KGgo=',
+    'data:image/png;base64,не base64',
+    data_uri(make_image('red', 'BMP'), 'bmp'),
+    data_uri(b'not an image'),
+    'data:image/png;base64,' + 'A' * (MAX_IMAGE_SIZE * 4 // 3 + 8),
+))
+def test_invalid_image_is_rejected(payload, author_client, image):
+    payload['image'] = image
+    response = author_client.post(URL, payload, format='json')
+    assert response.status_code == 400
+    assert 'image' in response.json()
+    assert not Recipe.objects.exists()
+
+
+def test_new_image_deletes_old_variants(payload, author_client, settings):
+    recipe_id = author_client.post(URL, payload, format='json').json()['id']
+    old = variant_files(Recipe.objects.get(pk=recipe_id))
+    response = author_client.patch(
+        f'{URL}{recipe_id}/',
+        {'image': data_uri(make_image('blue'))},
+        format='json',
+    )
+    assert response.status_code == 200, response.json()
+    recipe = Recipe.objects.get(pk=recipe_id)
+    new = variant_files(recipe)
+    assert all(new) and not set(old) & set(new)
+    files = media_files(settings)
+    assert not set(old) & set(files)
+    assert set(new) <= set(files)
+
+
+def test_rerun_replaces_variants(payload, author_client, settings):
+    recipe_id = author_client.post(URL, payload, format='json').json()['id']
+    before = media_files(settings)
+    generate_image_variants(recipe_id)
+    recipe = Recipe.objects.get(pk=recipe_id)
+    assert len(media_files(settings)) == len(before)
+    assert set(variant_files(recipe)) <= set(media_files(settings))
@@ -0,0 +1,49 @@
+import pytest
+
+from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from users.models import Subscribe
+from .utils import assert_no_seq_scan
+
+
+@pytest.fixture
+def seeded(user, author, tags, make_recipe):
+    recipes = [
+        make_recipe(author if index % 2 else user, tags=tags[:index % 3])
+        for index in range(20)
+    ]
+    Favorite.objects.bulk_create(
+        Favorite(user=user, recipe=recipe) for recipe in recipes[::2]
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=user, recipe=recipe) for recipe in recipes[::3]
+    )
+    Subscribe.objects.create(user=user, author=author)
+    return recipes
+
+
+def test_recipe_list_uses_indexes(seeded, user, author):
+    assert_no_seq_scan(
+        Recipe.objects.order_by('-pub_date', '-id')[:6],
+        Recipe.objects.filter(author=author).order_by('-pub_date')[:6],
+        Recipe.objects.with_related().with_user_flags(user)[:6],
+    )
+
+
+def test_user_links_use_indexes_in_both_directions(seeded, user):
+    recipe = seeded[0]
+    assert_no_seq_scan(
+        Favorite.objects.filter(user=user).values('recipe_id'),
+        Favorite.objects.filter(recipe=recipe).values('user_id'),
+        ShoppingCart.objects.filter(user=user).values('recipe_id'),
+        ShoppingCart.objects.filter(recipe=recipe).values('user_id'),
+        Subscribe.objects.filter(user=user).values('author_id'),
+    )
+
+
+def test_recipe_relations_use_indexes(seeded, tags):
+    recipe = seeded[0]
+    assert_no_seq_scan(
+        RecipeIngredient.objects.filter(recipe=recipe),
+        Recipe.tags.through.objects.filter(tag=tags[0]).values('recipe_id'),
+        Recipe.tags.through.objects.filter(recipe=recipe),
+    )
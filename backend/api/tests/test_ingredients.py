@@ -0,0 +1,72 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api import ingredient_index
+from recipes.models import Ingredient
+from .utils import assert_no_seq_scan, select_queries
+
+URL = '/api/ingredients/'
+
+NAMES = ('Sugar', 'Sugar powder', 'Salt', 'Salo', 'Flour')
+
+
+@pytest.fixture
+def index(monkeypatch):
+    """Отдельный индекс на тест: общий мог остаться от другой БД."""
+    index = ingredient_index.IngredientPrefixIndex()
+    monkeypatch.setattr(ingredient_index, 'ingredient_index', index)
+    monkeypatch.setattr('api.views.ingredient_index', index)
+    return index
+
+
+@pytest.fixture(params=('index', 'db'))
+def source(request, settings, index):
+    settings.INGREDIENT_INDEX_ENABLED = request.param == 'index'
+    return request.param
+
+
+@pytest.fixture
+def named(db):
+    return {
+        name: Ingredient.objects.create(name=name, measurement_unit='г')
+        for name in NAMES
+    }
+
+
+def get_names(client, name=None):
+    response = client.get(URL, {'name': name} if name is not None else {})
+    assert response.status_code == 200
+    return [item['name'] for item in response.json()]
+
+
+@pytest.mark.parametrize('prefix, expected', (
+    ('sug', ('Sugar', 'Sugar powder')),
+    ('SA', ('Salt', 'Salo')),
+    ('sugar p', ('Sugar powder',)),
+    ('powder', ()),
+    ('', NAMES),
+))
+def test_prefix_search_ignores_case(source, named, anonymous_client, prefix,
+                                    expected):
+    assert get_names(anonymous_client, prefix) == list(expected)
+
+
+def test_db_search_uses_prefix_index(settings, named, anonymous_client):
+    settings.INGREDIENT_INDEX_ENABLED = False
+    with CaptureQueriesContext(connection) as context:
+        get_names(anonymous_client, 'sa')
+    assert_no_seq_scan(*select_queries(context))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rebuild_in_other_thread_falls_back_to_db(index, named,
+                                                  anonymous_client):
+    assert get_names(anonymous_client, 'sal') == ['Salt', 'Salo']
+    Ingredient.objects.create(name='Salami', measurement_unit='г')
+    # Индекс устарел, а перестройку уже ведет другой поток.
+    with index._lock:
+        assert get_names(anonymous_client, 'sal') == [
+            'Salt', 'Salo', 'Salami'
+        ]
+    assert index.search('sal') is not None
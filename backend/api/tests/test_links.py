@@ -0,0 +1,169 @@
+import threading
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api import links
+from api.links import FAVORITE, SHOPPING_CART, apply_batch
+from recipes.models import Recipe
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+MISSING_ID = 10 ** 9
+
+BATCHES = {
+    'favorite_batch': (FAVORITE, 'favorites_count'),
+    'shopping_cart_batch': (SHOPPING_CART, 'in_carts_count'),
+}
+
+
+@pytest.fixture(params=('returning', 'per_id'))
+def sql_path(request, monkeypatch):
+    """INSERT/DELETE с RETURNING и запросы по одному id без него."""
+    if request.param == 'per_id':
+        monkeypatch.setattr(links, 'can_return_rows', lambda: False)
+    return request.param
+
+
+@pytest.fixture(params=list(BATCHES))
+def batch(request):
+    return (request.param, *BATCHES[request.param])
+
+
+@pytest.fixture
+def recipes(author, make_recipe):
+    return [make_recipe(author, ingredient_count=1) for _ in range(3)]
+
+
+def post_batch(client, url, add=(), remove=()):
+    return client.post(
+        f'/api/recipes/{url}/',
+        {'add': list(add), 'remove': list(remove)},
+        format='json',
+    )
+
+
+def get_counter(recipe, counter):
+    return Recipe.objects.values_list(counter, flat=True).get(pk=recipe.pk)
+
+
+def get_links_count(link, recipe):
+    return link.model.objects.filter(recipe=recipe).count()
+
+
+def test_batch_statuses_and_counters(
+    sql_path, batch, recipes, user, user_client
+):
+    url, link, counter = batch
+    first, second, third = recipes
+    link.model.objects.create(user=user, recipe=second)
+    Recipe.objects.filter(pk=second.pk).update(**{counter: 1})
+    response = post_batch(
+        user_client,
+        url,
+        add=[first.id, first.id, second.id, MISSING_ID],
+        remove=[third.id, MISSING_ID + 1],
+    )
+    assert response.status_code == 200
+    assert response.json()['results'] == [
+        {'id': first.id, 'action': 'add', 'status': 'added'},
+        {'id': second.id, 'action': 'add', 'status': 'exists'},
+        {'id': MISSING_ID, 'action': 'add', 'status': 'not_found'},
+        {'id': third.id, 'action': 'remove', 'status': 'missing'},
+        {'id': MISSING_ID + 1, 'action': 'remove', 'status': 'not_found'},
+    ]
+    assert [get_counter(recipe, counter) for recipe in recipes] == [1, 1, 0]
+
+    response = post_batch(user_client, url, remove=[first.id, second.id])
+    assert [item['status'] for item in response.json()['results']] == [
+        'removed', 'removed'
+    ]
+    assert [get_counter(recipe, counter) for recipe in recipes] == [0, 0, 0]
+    assert not link.model.objects.filter(user=user).exists()
+
+
+@pytest.mark.parametrize('add, remove, status_code', (
+    (range(1, 501), (), 200),
+    (range(1, 301), range(301, 501), 200),
+    (range(1, 502), (), 400),
+    (range(1, 301), range(301, 502), 400),
+    ((1, 2), (2,), 400),
+    ((), (), 400),
+))
+def test_batch_validation(user_client, add, remove, status_code):
+    response = post_batch(user_client, 'favorite_batch', add, remove)
+    assert response.status_code == status_code
+
+
+def test_duplicates_count_toward_cap_once(user_client):
+    response = post_batch(
+        user_client, 'favorite_batch', add=[*range(1, 501), 1, 2]
+    )
+    assert response.status_code == 200
+    assert len(response.json()['results']) == 500
+
+
+def test_returning_batch_query_count_does_not_depend_on_size(
+    batch, recipes, make_recipe, author, user_client
+):
+    url = batch[0]
+    recipes += [make_recipe(author, ingredient_count=1) for _ in range(5)]
+    post_batch(user_client, url, add=[MISSING_ID])
+    counts = []
+    for chunk in (recipes[:1], recipes[1:]):
+        with CaptureQueriesContext(connection) as context:
+            post_batch(user_client, url, add=[r.id for r in chunk])
+        counts.append(len(context))
+    assert counts[0] == counts[1]
+
+
+def run_concurrently(*calls):
+    """Выполняет calls одновременно, каждый в своем потоке и соединении."""
+    barrier = threading.Barrier(len(calls))
+    errors = []
+
+    def run(call):
+        try:
+            barrier.wait()
+            call()
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run, args=(call,)) for call in calls]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_concurrent_batches_keep_counters(
+    sql_path, batch, recipes, make_user
+):
+    if connection.vendor != 'postgresql':
+        pytest.skip('SQLite не поддерживает параллельную запись')
+    _, link, counter = batch
+    users = [make_user(f'user-{i}') for i in range(4)]
+    ids = [recipe.id for recipe in recipes]
+    calls = [
+        lambda user=user: apply_batch(link, user, ids, [])
+        for user in users for _ in range(2)
+    ]
+    run_concurrently(*calls)
+    for recipe in recipes:
+        assert get_counter(recipe, counter) == len(users)
+        assert get_links_count(link, recipe) == len(users)
+
+    run_concurrently(*(
+        lambda user=user: apply_batch(link, user, [], ids[:2])
+        for user in users for _ in range(2)
+    ))
+    assert [get_counter(recipe, counter) for recipe in recipes] == [
+        0, 0, len(users)
+    ]
+    assert [get_links_count(link, recipe) for recipe in recipes] == [
+        0, 0, len(users)
+    ]
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory
+from prometheus_client import REGISTRY
+
+from foodgram import metrics
+from recipes.models import ShoppingCart
+
+
+def observe_in_subprocess(path):
+    """Наблюдение гистограммы пула в отдельном процессе, как в воркере."""
+    code = (
+        'from foodgram import metrics\n'
+        "metrics.DB_POOL_WAIT.labels('default').observe(0.1)\n"
+    )
+    subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=settings.BASE_DIR,
+        env={**os.environ, 'PROMETHEUS_MULTIPROC_DIR': str(path)},
+        check=True,
+    )
+
+
+def test_multiprocess_directory_is_created_on_import(tmp_path):
+    """Процессы без gunicorn (воркер RQ, manage.py) сами создают каталог."""
+    path = tmp_path / 'prometheus'
+    observe_in_subprocess(path)
+    assert any(name.startswith('histogram_') for name in os.listdir(path))
+
+
+def test_render_collects_other_processes(tmp_path, monkeypatch):
+    path = tmp_path / 'prometheus'
+    observe_in_subprocess(path)
+    observe_in_subprocess(path)
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(path))
+    body, content_type = metrics.render()
+    assert content_type.startswith('text/plain')
+    assert (
+        b'foodgram_db_pool_wait_seconds_count{alias="default"} 2.0' in body
+    )
+
+
+def test_render_without_multiprocess_directory(monkeypatch):
+    monkeypatch.delenv('PROMETHEUS_MULTIPROC_DIR', raising=False)
+    metrics.REQUEST_LATENCY.labels('render-test', 'GET', 200).observe(0.01)
+    body, _ = metrics.render()
+    assert (
+        b'foodgram_http_request_duration_seconds_count{method="GET",'
+        b'route="render-test",status="200"} 1.0'
+    ) in body
+
+
+def get_sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def get_samples(route, method='GET', status=200):
+    labels = {'route': route, 'method': method}
+    return {
+        'requests': get_sample(
+            'foodgram_http_request_duration_seconds_count',
+            status=str(status), **labels,
+        ),
+        'queries': get_sample('foodgram_db_queries_sum', **labels),
+        'serializers': get_sample(
+            'foodgram_serializer_duration_seconds_count', **labels
+        ),
+        'bytes': get_sample('foodgram_response_bytes_sum', **labels),
+    }
+
+
+def get_change(before, after):
+    return {key: after[key] - before[key] for key in before}
+
+
+@pytest.mark.django_db
+def test_middleware_observes_drf_view(tags, anonymous_client):
+    route = 'tags-list'
+    before = get_samples(route)
+    response = anonymous_client.get('/api/tags/')
+    change = get_change(before, get_samples(route))
+    assert change['requests'] == 1
+    assert change['queries'] >= 1
+    assert change['serializers'] == 1
+    assert change['bytes'] == len(response.content)
+
+
+@pytest.mark.django_db
+def test_middleware_counts_streaming_bytes(user, author, make_recipe,
+                                           user_client):
+    ShoppingCart.objects.create(user=user, recipe=make_recipe(author))
+    route = 'recipes-download-shopping-cart'
+    before = get_samples(route)
+    response = user_client.get('/api/recipes/download_shopping_cart/')
+    assert response.streaming
+    # Размер учитывается, когда тело ответа прочитано.
+    assert get_change(before, get_samples(route))['bytes'] == 0
+    content = b''.join(response.streaming_content)
+    assert get_change(before, get_samples(route))['bytes'] == len(content)
+
+
+@pytest.mark.django_db
+def test_middleware_labels_unmatched_route(anonymous_client):
+    before = get_samples(metrics.UNMATCHED_ROUTE, status=404)
+    anonymous_client.get('/no-such-page/')
+    change = get_change(
+        before, get_samples(metrics.UNMATCHED_ROUTE, status=404)
+    )
+    assert change['requests'] == 1
+    assert change['serializers'] == 0
+
+
+def test_async_middleware():
+    async def get_response(request):
+        return HttpResponse(b'12345')
+
+    middleware = metrics.MetricsMiddleware(get_response)
+    # Так Django выбирает асинхронную цепочку middleware.
+    assert asyncio.iscoroutinefunction(middleware)
+    before = get_samples(metrics.UNMATCHED_ROUTE, method='POST')
+    response = asyncio.run(middleware(RequestFactory().post('/')))
+    assert response.content == b'12345'
+    change = get_change(
+        before, get_samples(metrics.UNMATCHED_ROUTE, method='POST')
+    )
+    assert (change['requests'], change['bytes']) == (1, 5)
@@ -0,0 +1,127 @@
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from recipes.models import Recipe
+
+URL = '/api/recipes/'
+LIMIT = 2
+
+
+@pytest.fixture
+def recipes(author, make_recipe):
+    """Семь рецептов, по три с одинаковой pub_date на границах страниц."""
+    recipes = [make_recipe(author, ingredient_count=1) for _ in range(7)]
+    now = timezone.now()
+    for index, recipe in enumerate(recipes):
+        Recipe.objects.filter(pk=recipe.pk).update(
+            pub_date=now - timedelta(hours=index // 3)
+        )
+    return [
+        recipe.id for recipe in Recipe.objects.order_by('-pub_date', '-id')
+    ]
+
+
+def get_page(client, url=URL, params=None):
+    response = client.get(url, params)
+    assert response.status_code == 200
+    data = response.json()
+    return [recipe['id'] for recipe in data['results']], data
+
+
+def read_forward(client, params=None):
+    """Страницы по ссылкам next от первой страницы."""
+    pages = []
+    url, params = URL, {'cursor': '', 'limit': LIMIT, **(params or {})}
+    while url:
+        ids, data = get_page(client, url, params)
+        pages.append(ids)
+        url, params = data['next'], None
+    return pages
+
+
+def encode(value):
+    return urlsafe_b64encode(value.encode()).decode()
+
+
+@pytest.mark.django_db
+def test_cursor_pages_follow_key_order(recipes, anonymous_client):
+    pages = read_forward(anonymous_client)
+    assert pages == [recipes[start:start + LIMIT]
+                     for start in range(0, len(recipes), LIMIT)]
+
+
+@pytest.mark.django_db
+def test_previous_links_return_same_pages(recipes, anonymous_client):
+    forward = read_forward(anonymous_client)
+    first_ids, first = get_page(
+        anonymous_client, params={'cursor': '', 'limit': LIMIT}
+    )
+    assert first['previous'] is None
+    url = first['next']
+    while True:
+        ids, data = get_page(anonymous_client, url)
+        if data['next'] is None:
+            break
+        url = data['next']
+    backward = [ids]
+    while data['previous']:
+        ids, data = get_page(anonymous_client, data['previous'])
+        backward.append(ids)
+    assert backward[::-1] == forward
+    # От первой страницы, полученной назад, снова можно идти вперед.
+    assert get_page(anonymous_client, data['next'])[0] == forward[1]
+
+
+@pytest.mark.django_db
+def test_count_only_on_request(recipes, anonymous_client):
+    with CaptureQueriesContext(connection) as context:
+        _, data = get_page(
+            anonymous_client, params={'cursor': '', 'limit': LIMIT}
+        )
+    assert 'count' not in data
+    assert not any('COUNT(' in query['sql']
+                   for query in context.captured_queries)
+    _, data = get_page(
+        anonymous_client,
+        params={'cursor': '', 'limit': LIMIT, 'count': 'true'},
+    )
+    assert data['count'] == len(recipes)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('cursor', (
+    'not-base64!',
+    encode('garbage'),
+    encode('2024-01-01T00:00:00+00:00|abc'),
+    encode('not-a-date|1'),
+    encode('2024-01-01T00:00:00+00:00|1|x'),
+))
+def test_tampered_cursor_gives_404(recipes, anonymous_client, cursor):
+    response = anonymous_client.get(URL, {'cursor': cursor})
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_inserts_between_pages_do_not_shift_rows(recipes, author,
+                                                 make_recipe,
+                                                 anonymous_client):
+    ids, data = get_page(
+        anonymous_client, params={'cursor': '', 'limit': LIMIT}
+    )
+    # Новые рецепты, в том числе с той же pub_date, что у курсора.
+    cursor_date = Recipe.objects.get(pk=ids[-1]).pub_date
+    Recipe.objects.filter(pk=make_recipe(author).pk).update(
+        pub_date=cursor_date
+    )
+    make_recipe(author)
+    url = data['next']
+    while url:
+        page, data = get_page(anonymous_client, url)
+        ids.extend(page)
+        url = data['next']
+    assert ids == recipes
@@ -0,0 +1,253 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import psycopg2
+import pytest
+from django.db import connection
+from psycopg2 import extensions
+
+from foodgram.postgresql_pool import pool as pool_module
+from foodgram.postgresql_pool.base import DatabaseWrapper
+from foodgram.postgresql_pool.pool import ConnectionPool, get_pool
+
+
+class FakeCursor:
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql):
+        self.connection.queries.append(sql)
+        if not self.connection.alive:
+            raise psycopg2.OperationalError('server closed the connection')
+
+
+class FakeConnection:
+    """Соединение psycopg2 без сервера: только то, что нужно пулу."""
+
+    def __init__(self):
+        self.closed = 0
+        self.alive = True
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.queries = []
+        self.rolled_back = False
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rolled_back = True
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = 1
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(
+        pool_module, 'time', SimpleNamespace(monotonic=clock)
+    )
+    return clock
+
+
+@pytest.fixture
+def opened():
+    return []
+
+
+@pytest.fixture
+def make_pool(opened):
+    def make_pool(**options):
+        def connect():
+            opened.append(FakeConnection())
+            return opened[-1]
+
+        pool = ConnectionPool('test', 'test', connect, {
+            'MIN_SIZE': 0, **options
+        })
+        pool.fill()
+        return pool
+
+    return make_pool
+
+
+def test_checkout_and_return(make_pool, opened):
+    pool = make_pool(MIN_SIZE=1)
+    assert len(opened) == 1
+    first = pool.get()
+    assert first is opened[0]
+    second = pool.get()
+    assert pool.stats()['in_use'] == 2
+    pool.put(second)
+    pool.put(first)
+    assert pool.stats()['idle'] == 2
+    # Последнее возвращенное выдается первым.
+    assert pool.get() is first
+    assert len(opened) == 2
+
+
+def test_return_rolls_back_or_discards(make_pool):
+    pool = make_pool()
+    in_transaction = pool.get()
+    in_transaction.status = extensions.TRANSACTION_STATUS_INTRANS
+    pool.put(in_transaction)
+    assert in_transaction.rolled_back
+    assert pool.stats()['idle'] == 1
+    broken = pool.get()
+    broken.closed = 2
+    pool.put(broken)
+    assert broken.closed
+    assert (pool.stats()['size'], pool.stats()['idle']) == (0, 0)
+
+
+def test_timeout_when_pool_is_exhausted(make_pool):
+    pool = make_pool(MAX_SIZE=1, TIMEOUT=0.05)
+    busy = pool.get()
+    with pytest.raises(psycopg2.OperationalError, match='Нет свободных'):
+        pool.get()
+    assert pool.stats()['waiting'] == 0
+    pool.put(busy)
+    assert pool.get() is busy
+
+
+def test_waiter_gets_returned_connection(make_pool):
+    pool = make_pool(MAX_SIZE=1, TIMEOUT=5)
+    busy = pool.get()
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(pool.get()))
+    waiter.start()
+    while not pool.stats()['waiting']:
+        time.sleep(0.001)
+    pool.put(busy)
+    waiter.join(5)
+    assert result == [busy]
+
+
+def test_max_lifetime(make_pool, clock):
+    pool = make_pool(MAX_LIFETIME=60)
+    old = pool.get()
+    clock.now += 61
+    pool.put(old)
+    assert old.closed
+    assert pool.stats()['size'] == 0
+
+
+def test_max_idle_keeps_min_size(make_pool, clock, opened):
+    pool = make_pool(MIN_SIZE=1, MAX_IDLE=60, CHECK_IDLE=5)
+    connections = [pool.get(), pool.get(), pool.get()]
+    for item in connections:
+        pool.put(item)
+    clock.now += 61
+    kept = pool.get()
+    assert kept is connections[-1]
+    assert [item.closed for item in connections] == [1, 1, 0]
+    assert pool.stats()['size'] == 1
+    assert len(opened) == 3
+
+
+def test_health_check_after_check_idle(make_pool, clock, opened):
+    pool = make_pool(MIN_SIZE=1, CHECK_IDLE=5)
+    fresh = pool.get()
+    pool.put(fresh)
+    clock.now += 1
+    assert pool.get() is fresh
+    assert fresh.queries == []
+    pool.put(fresh)
+    clock.now += 10
+    assert pool.get() is fresh
+    assert fresh.queries == ['SELECT 1']
+    pool.put(fresh)
+    clock.now += 10
+    fresh.alive = False
+    replacement = pool.get()
+    assert replacement is not fresh
+    assert fresh.closed
+    assert len(opened) == 2
+
+
+def test_new_pool_after_fork(monkeypatch, opened):
+    def connect():
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    monkeypatch.setattr(pool_module, '_pools', {})
+    params = {'database': 'fork-test'}
+    parent = get_pool('fork-test', params, {'MIN_SIZE': 0}, connect)
+    assert get_pool('fork-test', params, {}, connect) is parent
+    inherited = parent.get()
+    monkeypatch.setattr(
+        pool_module, 'os', SimpleNamespace(getpid=lambda: parent.pid + 1)
+    )
+    child = get_pool('fork-test', params, {'MIN_SIZE': 0}, connect)
+    assert child is not parent
+    # Сокет родителя в дочернем процессе не закрывается и не переиспользуется.
+    parent.put(inherited)
+    assert not inherited.closed
+    assert child.get() is not inherited
+
+
+class FakePool:
+
+    def __init__(self):
+        self.calls = []
+
+    def put(self, connection):
+        self.calls.append(('put', connection))
+
+    def discard(self, connection, reason):
+        self.calls.append(('discard', connection))
+
+
+@pytest.mark.parametrize('in_atomic_block, call', (
+    (False, 'put'),
+    (True, 'discard'),
+))
+def test_close_in_atomic_block_discards(in_atomic_block, call):
+    wrapper = DatabaseWrapper(
+        {**connection.settings_dict, 'ENGINE': 'foodgram.postgresql_pool'},
+        alias='pool-test',
+    )
+    wrapper.pool = FakePool()
+    wrapper.connection = FakeConnection()
+    wrapper.in_atomic_block = in_atomic_block
+    raw = wrapper.connection
+    wrapper._close()
+    assert wrapper.pool.calls == [(call, raw)]
+
+
+@pytest.mark.django_db
+def test_reconnect_reuses_pooled_connection():
+    if connection.vendor != 'postgresql':
+        pytest.skip('Нужна локальная PostgreSQL')
+    # Второе соединение с тем же alias берется из того же пула.
+    wrapper = connection.copy()
+    try:
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        wrapper.close()
+        assert not raw.closed
+        wrapper.ensure_connection()
+        assert wrapper.connection is raw
+    finally:
+        wrapper.close()
@@ -0,0 +1,130 @@
+from itertools import product
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Favorite, ShoppingCart, Tag
+from .utils import assert_no_seq_scan, select_queries
+
+URL = '/api/recipes/'
+
+TAG_OPTIONS = (None, ('tag-0',), ('tag-1', 'tag-2'), ('tag-0', 'tag-1'))
+FLAG_OPTIONS = (None, 0, 1)
+
+
+@pytest.fixture
+def authors(make_user):
+    return [make_user(f'author-{index}') for index in range(2)]
+
+
+@pytest.fixture
+def recipes(authors, user, tags, make_recipe):
+    """Рецепты с разными наборами тегов, часть в избранном и корзине."""
+    recipes = [
+        make_recipe(authors[index % 2], tags=tags[index % 3:index % 4 + 1],
+                    ingredient_count=1)
+        for index in range(12)
+    ]
+    Favorite.objects.bulk_create(
+        Favorite(user=user, recipe=recipe) for recipe in recipes[::2]
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=user, recipe=recipe) for recipe in recipes[::3]
+    )
+    return recipes
+
+
+def get_params(tags, author, is_favorited, is_in_shopping_cart):
+    params = {
+        'tags': list(tags) if tags else None,
+        'author': author,
+        'is_favorited': is_favorited,
+        'is_in_shopping_cart': is_in_shopping_cart,
+    }
+    params = {key: value for key, value in params.items()
+              if value is not None}
+    params['limit'] = 100
+    return params
+
+
+def get_ids(client, params):
+    response = client.get(URL, params)
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.json()['results']]
+
+
+def expected_ids(recipes, user, tags, author, is_favorited,
+                 is_in_shopping_cart):
+    favorites = set(user.favorites.values_list('recipe_id', flat=True))
+    cart = set(user.shopping_list.values_list('recipe_id', flat=True))
+    return {
+        recipe.id for recipe in recipes
+        if (tags is None
+            or set(tags) & {tag.slug for tag in recipe.tags.all()})
+        and (author is None or recipe.author_id == author)
+        and (not is_favorited or recipe.id in favorites)
+        and (not is_in_shopping_cart or recipe.id in cart)
+    }
+
+
+def test_filter_combinations(recipes, authors, user, user_client):
+    for tags, author, is_favorited, is_in_shopping_cart in product(
+        TAG_OPTIONS, (None, authors[1].id), FLAG_OPTIONS, FLAG_OPTIONS
+    ):
+        criteria = (tags, author, is_favorited, is_in_shopping_cart)
+        ids = get_ids(user_client, get_params(*criteria))
+        assert len(ids) == len(set(ids)), criteria
+        assert set(ids) == expected_ids(recipes, user, *criteria), criteria
+
+
+@pytest.mark.parametrize('flag', ('is_favorited', 'is_in_shopping_cart'))
+def test_anonymous_user_flags_give_empty_list(recipes, anonymous_client,
+                                              flag):
+    assert get_ids(anonymous_client, {flag: 1, 'limit': 100}) == []
+    assert len(get_ids(anonymous_client, {flag: 0, 'limit': 100})) == len(
+        recipes
+    )
+
+
+def test_filters_do_not_add_queries(recipes, authors, user, user_client):
+    """Число запросов не зависит от фильтров и найденных рецептов.
+
+    Запросы с is_favorited или is_in_shopping_cart идут мимо общего
+    кеша ответов и считаются отдельно, пустые ответы не учитываются:
+    для них не выполняются prefetch-запросы.
+    """
+    get_ids(user_client, {'tags': 'tag-0'})
+    counts = {}
+    for criteria in product(
+        TAG_OPTIONS, (None, authors[1].id), FLAG_OPTIONS, FLAG_OPTIONS
+    ):
+        if not expected_ids(recipes, user, *criteria):
+            continue
+        with CaptureQueriesContext(connection) as context:
+            get_ids(user_client, get_params(*criteria))
+        bypass = criteria[2] is not None or criteria[3] is not None
+        counts.setdefault(bypass, {})[criteria] = len(context)
+    for group in counts.values():
+        assert len(set(group.values())) == 1, group
+
+
+def test_filtered_list_uses_indexes(recipes, authors, user_client):
+    with CaptureQueriesContext(connection) as context:
+        get_ids(user_client, get_params(
+            ['tag-0', 'tag-1'], authors[0].id, 1, 1
+        ))
+    assert_no_seq_scan(*select_queries(context))
+
+
+def test_unknown_tag_is_rejected(recipes, user_client):
+    response = user_client.get(URL, {'tags': 'missing'})
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db(transaction=True)
+def test_new_tag_is_available_in_filter(recipes, user_client):
+    assert user_client.get(URL, {'tags': 'new'}).status_code == 400
+    tag = Tag.objects.create(name='Новый', color='#FFFFFF', slug='new')
+    recipes[0].tags.add(tag)
+    assert get_ids(user_client, {'tags': 'new'}) == [recipes[0].id]
@@ -0,0 +1,89 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscribe
+from .utils import assert_no_seq_scan, select_queries
+
+URL = '/api/recipes/'
+
+
+def get_page(client, limit):
+    """Страница списка на пустом кеше и запросы к БД для нее."""
+    cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(URL, {'limit': limit})
+    assert response.status_code == 200
+    return response.json()['results'], context
+
+
+@pytest.fixture
+def recipes(make_user, user, tags, make_recipe):
+    authors = [make_user(f'author-{index}') for index in range(3)]
+    recipes = [
+        make_recipe(authors[index % 3], tags=tags[:index % 3 + 1],
+                    ingredient_count=index % 5 + 1)
+        for index in range(12)
+    ]
+    Favorite.objects.bulk_create(
+        Favorite(user=user, recipe=recipe) for recipe in recipes[::2]
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=user, recipe=recipe) for recipe in recipes[::3]
+    )
+    Subscribe.objects.create(user=user, author=authors[0])
+    return recipes
+
+
+@pytest.mark.parametrize('authenticated', (False, True))
+def test_list_query_count_does_not_depend_on_page_size(
+    recipes, anonymous_client, user_client, authenticated
+):
+    client = user_client if authenticated else anonymous_client
+    client.get(URL)
+    one, one_context = get_page(client, 1)
+    many, many_context = get_page(client, len(recipes))
+    assert len(one) == 1
+    assert len(many) == len(recipes)
+    assert len(many_context) == len(one_context), select_queries(
+        many_context
+    )
+
+
+def test_list_returns_user_flags_without_extra_queries(recipes, user,
+                                                       user_client):
+    results, _ = get_page(user_client, len(recipes))
+    favorites = set(
+        Favorite.objects.filter(user=user).values_list('recipe_id', flat=True)
+    )
+    cart = set(
+        ShoppingCart.objects.filter(user=user)
+        .values_list('recipe_id', flat=True)
+    )
+    for recipe in results:
+        assert recipe['is_favorited'] == (recipe['id'] in favorites)
+        assert recipe['is_in_shopping_cart'] == (recipe['id'] in cart)
+        assert recipe['author']['is_subscribed'] == (
+            recipe['author']['username'] == 'author-0'
+        )
+        assert recipe['tags'] and recipe['ingredients']
+
+
+@pytest.mark.parametrize('authenticated', (False, True))
+def test_detail_query_count_is_constant(recipes, anonymous_client,
+                                        user_client, authenticated):
+    client = user_client if authenticated else anonymous_client
+    counts = set()
+    for recipe in (recipes[0], recipes[-1]):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            assert client.get(f'{URL}{recipe.id}/').status_code == 200
+        counts.add(len(context))
+    assert len(counts) == 1
+
+
+def test_list_queries_use_indexes(recipes, user_client):
+    _, context = get_page(user_client, 6)
+    assert_no_seq_scan(*select_queries(context))
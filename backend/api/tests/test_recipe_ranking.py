@@ -0,0 +1,115 @@
+import pytest
+
+from api import recipe_index
+from recipes.models import RecipeIngredient
+
+URL = '/api/recipes/'
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('have', (
+    '99999999999999999999999',
+    '1,-5',
+    '0',
+    'abc',
+))
+def test_invalid_have_is_rejected(anonymous_client, have):
+    response = anonymous_client.get(URL, {'have': have})
+    assert response.status_code == 400
+    assert 'have' in response.json()
+
+
+# Номера ингредиентов из фикстуры ingredients у рецептов по порядку
+# создания; в ?have= передаются ингредиенты 0 и 1.
+RECIPES = ((0, 1), (2,), (0, 2), (0, 1, 2), (0,), (0, 3))
+HAVE = (0, 1)
+# Меньше недостающих, затем больше совпавших, затем новее.
+EXPECTED = (0, 4, 3, 5, 2)
+
+
+@pytest.fixture
+def index(monkeypatch):
+    """Отдельный индекс на тест: общий мог остаться от другой БД."""
+    index = recipe_index.RecipeIngredientIndex()
+    monkeypatch.setattr(recipe_index, 'recipe_index', index)
+    return index
+
+
+@pytest.fixture
+def recipes(index, author, make_user, tags, ingredients, make_recipe):
+    other = make_user('other')
+    recipes = []
+    for number, positions in enumerate(RECIPES):
+        recipe = make_recipe(
+            other if number == 5 else author,
+            tags=tags[:1] if number % 2 else tags[1:2],
+            ingredient_count=0,
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredients[position],
+                             amount=1)
+            for position in positions
+        )
+        recipes.append(recipe)
+    return recipes
+
+
+def get_ranking(client, ingredients, **params):
+    have = ','.join(str(ingredients[position].id) for position in HAVE)
+    response = client.get(URL, {'have': have, 'limit': 100, **params})
+    assert response.status_code == 200
+    return response.json()
+
+
+def ids(recipes, numbers):
+    return [recipes[number].id for number in numbers]
+
+
+@pytest.mark.django_db
+def test_ranking_order(recipes, ingredients, anonymous_client):
+    data = get_ranking(anonymous_client, ingredients)
+    assert data['count'] == len(EXPECTED)
+    assert [item['id'] for item in data['results']] == ids(recipes, EXPECTED)
+    assert [
+        (item['matched_ingredients'], item['missing_ingredients'])
+        for item in data['results']
+    ] == [(2, 0), (1, 0), (2, 1), (1, 1), (1, 1)]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name, numbers', (
+    ('tags', (3, 5)),
+    ('author', (0, 4, 3, 2)),
+))
+def test_ranking_with_other_filters(recipes, ingredients, author,
+                                    anonymous_client, name, numbers):
+    params = {'tags': 'tag-0'} if name == 'tags' else {'author': author.id}
+    data = get_ranking(anonymous_client, ingredients, **params)
+    assert [item['id'] for item in data['results']] == ids(recipes, numbers)
+
+
+@pytest.mark.django_db
+def test_ranking_pages(recipes, ingredients, anonymous_client):
+    pages = [
+        get_ranking(anonymous_client, ingredients, limit=2, page=page)
+        for page in (1, 2, 3)
+    ]
+    assert [
+        [item['id'] for item in page['results']] for page in pages
+    ] == [ids(recipes, EXPECTED[start:start + 2]) for start in (0, 2, 4)]
+    assert pages[0]['next'] and pages[2]['next'] is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_index_is_rebuilt_in_background(index, recipes, ingredients,
+                                        anonymous_client):
+    results = get_ranking(anonymous_client, ingredients)['results']
+    before = [item['id'] for item in results]
+    RecipeIngredient.objects.create(
+        recipe=recipes[1], ingredient=ingredients[0], amount=1
+    )
+    stale = get_ranking(anonymous_client, ingredients)['results']
+    assert [item['id'] for item in stale] == before
+    index.wait()
+    fresh = get_ranking(anonymous_client, ingredients)['results']
+    assert recipes[1].id in [item['id'] for item in fresh]
@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+import pytest
+from django.db import connection
+
+from api import filters
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+URL = '/api/recipes/'
+
+
+@pytest.fixture
+def recipes(author, make_recipe):
+    """Слова запроса в названии, в ингредиентах и в описании."""
+    tomato = Ingredient.objects.create(name='Томаты', measurement_unit='г')
+    in_text = make_recipe(author, name='Суп', ingredient_count=0,
+                          text='Подавать с томатами и зеленью')
+    in_name = make_recipe(author, name='Томаты в соусе', ingredient_count=0)
+    in_ingredients = make_recipe(author, name='Салат', ingredient_count=0)
+    RecipeIngredient.objects.create(
+        recipe=in_ingredients, ingredient=tomato, amount=1
+    )
+    other = make_recipe(author, name='Компот', ingredient_count=0,
+                        text='Сварить ягоды')
+    Recipe.objects.update_search_vector()
+    return SimpleNamespace(in_text=in_text, in_name=in_name,
+                           in_ingredients=in_ingredients, other=other)
+
+
+def search(client, value):
+    response = client.get(URL, {'search': value, 'limit': 100})
+    assert response.status_code == 200
+    return response.json()['results']
+
+
+@pytest.fixture
+def postgresql():
+    if connection.vendor != 'postgresql':
+        pytest.skip('Полнотекстовый поиск есть только в PostgreSQL')
+
+
+@pytest.mark.django_db
+def test_search_ranks_name_then_ingredients_then_text(
+    postgresql, recipes, anonymous_client
+):
+    # Разные формы слова приводятся к одной основе.
+    results = search(anonymous_client, 'томатов')
+    assert [item['id'] for item in results] == [
+        recipes.in_name.id, recipes.in_ingredients.id, recipes.in_text.id
+    ]
+
+
+@pytest.mark.django_db
+def test_search_headline_marks_words(postgresql, recipes, anonymous_client):
+    results = search(anonymous_client, 'томаты')
+    headlines = {item['id']: item['search_headline'] for item in results}
+    assert '<mark>томатами</mark>' in headlines[recipes.in_text.id]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('value, expected', (
+    ('томаты -соус', ('in_ingredients', 'in_text')),
+    ('"томаты в соусе"', ('in_name',)),
+    ('компот or суп', ('in_text', 'other')),
+    ('томаты ягоды', ()),
+))
+def test_websearch_syntax(postgresql, recipes, anonymous_client, value,
+                          expected):
+    results = search(anonymous_client, value)
+    assert {item['id'] for item in results} == {
+        getattr(recipes, name).id for name in expected
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('value, expected', (
+    ('омат', ('in_name', 'in_ingredients', 'in_text')),
+    ('ягоды', ('other',)),
+    ('соус', ('in_name',)),
+))
+def test_icontains_fallback(recipes, anonymous_client, monkeypatch, value,
+                            expected):
+    monkeypatch.setattr(
+        filters, 'connection', SimpleNamespace(vendor='sqlite')
+    )
+    results = search(anonymous_client, value)
+    assert {item['id'] for item in results} == {
+        getattr(recipes, name).id for name in expected
+    }
+    assert all('search_headline' not in item for item in results)
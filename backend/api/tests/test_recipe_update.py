@@ -0,0 +1,164 @@
+from importlib import import_module
+
+import pytest
+from django.apps import apps
+from django.db import connection
+
+from api.cache import get_versions
+from recipes.models import RecipeIngredient
+
+merge_duplicate_recipe_ingredients = import_module(
+    'recipes.migrations.0005_hot_path_indexes'
+).merge_duplicate_recipe_ingredients
+
+# search_vector пересчитывается отдельным UPDATE только в PostgreSQL.
+SEARCH_VECTOR_UPDATES = ['UPDATE'] if connection.vendor == 'postgresql' else []
+
+
+@pytest.fixture
+def recipe(author, tags, make_recipe):
+    return make_recipe(author, tags=tags[:2], ingredient_count=6)
+
+
+@pytest.fixture
+def author_client(make_client, author):
+    client = make_client(author)
+    # Токен кешируется: первый запрос не должен попасть в подсчет.
+    client.get('/api/users/me/')
+    return client
+
+
+def get_payload(recipe):
+    return {
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'tags': [tag.id for tag in recipe.tags.all()],
+        'ingredients': [
+            {'id': item.ingredient_id, 'amount': item.amount}
+            for item in recipe.recipe_ingredients.order_by('id')
+        ],
+    }
+
+
+def patch(client, recipe, payload):
+    response = client.patch(
+        f'/api/recipes/{recipe.id}/', payload, format='json'
+    )
+    assert response.status_code == 200, response.json()
+    return response.json()
+
+
+def get_amounts(recipe):
+    return dict(
+        recipe.recipe_ingredients.values_list('ingredient_id', 'amount')
+    )
+
+
+def get_writes(context):
+    return [
+        query['sql'].split()[0] for query in context.captured_queries
+        if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+    ]
+
+
+def test_noop_edit_writes_nothing(
+    recipe, author_client, django_assert_num_queries
+):
+    payload = get_payload(recipe)
+    with django_assert_num_queries(16) as context:
+        patch(author_client, recipe, payload)
+    assert get_writes(context) == []
+
+
+def test_small_edit_updates_one_row(
+    recipe, author_client, django_assert_num_queries
+):
+    payload = get_payload(recipe)
+    payload['ingredients'][0]['amount'] = 100
+    amounts = get_amounts(recipe)
+    with django_assert_num_queries(
+        18 + len(SEARCH_VECTOR_UPDATES)
+    ) as context:
+        patch(author_client, recipe, payload)
+    assert get_writes(context) == ['UPDATE', 'UPDATE', *SEARCH_VECTOR_UPDATES]
+    amounts[payload['ingredients'][0]['id']] = 100
+    assert get_amounts(recipe) == amounts
+
+
+def test_full_edit(
+    recipe, author_client, tags, ingredients, django_assert_num_queries
+):
+    payload = get_payload(recipe)
+    payload.update(
+        name='Новое название',
+        tags=[tags[2].id],
+        ingredients=[
+            {'id': payload['ingredients'][0]['id'], 'amount': 50},
+            {'id': payload['ingredients'][1]['id'], 'amount': 2},
+            *({'id': ingredient.id, 'amount': 7}
+              for ingredient in ingredients[6:]),
+        ],
+    )
+    with django_assert_num_queries(24 + len(SEARCH_VECTOR_UPDATES)):
+        data = patch(author_client, recipe, payload)
+    assert data['name'] == 'Новое название'
+    assert [tag['id'] for tag in data['tags']] == [tags[2].id]
+    assert get_amounts(recipe) == {
+        ingredients[0].id: 50,
+        ingredients[1].id: 2,
+        **{ingredient.id: 7 for ingredient in ingredients[6:]},
+    }
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('edit', ('remove', 'change', 'add'))
+def test_ingredient_edit_bumps_version(recipe, author_client, ingredients,
+                                       edit):
+    """Индекс рецептов по ингредиентам узнает о любом изменении состава."""
+    payload = get_payload(recipe)
+    if edit == 'remove':
+        payload['ingredients'].pop()
+    elif edit == 'change':
+        payload['ingredients'][0]['amount'] += 10
+    else:
+        payload['ingredients'].append({'id': ingredients[9].id, 'amount': 1})
+    before = get_versions(['recipe_ingredients'])
+    patch(author_client, recipe, payload)
+    assert get_versions(['recipe_ingredients']) != before
+
+
+def test_merge_duplicate_recipe_ingredients(recipe, ingredients):
+    """Слияние дублей из миграции 0005 перед уникальным ограничением."""
+    if connection.vendor == 'sqlite':
+        pytest.skip('SQLite не меняет схему внутри транзакции теста')
+    constraint = next(
+        constraint for constraint in RecipeIngredient._meta.constraints
+        if constraint.name == 'unique_recipe_ingredient'
+    )
+    if connection.vendor == 'postgresql':
+        # Отложенные проверки внешних ключей мешают ALTER TABLE.
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+    with connection.schema_editor() as editor:
+        editor.remove_constraint(RecipeIngredient, constraint)
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(recipe=recipe, ingredient=ingredients[0], amount=5),
+        RecipeIngredient(recipe=recipe, ingredient=ingredients[0], amount=4),
+        RecipeIngredient(recipe=recipe, ingredient=ingredients[2], amount=7),
+    ])
+    first_id = recipe.recipe_ingredients.filter(
+        ingredient=ingredients[0]
+    ).order_by('id').first().id
+    merge_duplicate_recipe_ingredients(apps, None)
+    with connection.schema_editor() as editor:
+        editor.add_constraint(RecipeIngredient, constraint)
+    amounts = {
+        ingredient.id: index + 1
+        for index, ingredient in enumerate(ingredients[:6])
+    }
+    amounts.update({ingredients[0].id: 1 + 5 + 4, ingredients[2].id: 3 + 7})
+    assert get_amounts(recipe) == amounts
+    assert recipe.recipe_ingredients.get(ingredient=ingredients[0]).id == (
+        first_id
+    )
@@ -0,0 +1,70 @@
+import csv
+import io
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+
+from api.renderers import PDFShoppingListRenderer, ShoppingListRenderer
+from recipes.models import ShoppingCart
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+@pytest.fixture
+def cart(user, author, make_recipe, ingredients):
+    recipes = [make_recipe(author, ingredient_count=count)
+               for count in (2, 3)]
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=user, recipe=recipe) for recipe in recipes
+    )
+    return recipes
+
+
+def download(client, export_format):
+    response = client.get(URL, {'format': export_format})
+    assert response.status_code == 200
+    return b''.join(response.streaming_content)
+
+
+def test_txt_sums_amounts_of_all_recipes(cart, user_client, ingredients):
+    lines = download(user_client, 'txt').decode().splitlines()
+    assert lines == [
+        'Foodgram',
+        'Список покупок:',
+        f'{ingredients[0].name}, 2 г',
+        f'{ingredients[1].name}, 4 г',
+        f'{ingredients[2].name}, 3 г',
+    ]
+
+
+def test_csv_has_header_and_rows(cart, user_client, ingredients):
+    rows = list(csv.reader(io.StringIO(download(user_client, 'csv').decode())))
+    assert rows[0] == ['Ингредиент', 'Количество', 'Единица']
+    assert rows[1:] == [
+        [ingredients[0].name, '2', 'г'],
+        [ingredients[1].name, '4', 'г'],
+        [ingredients[2].name, '3', 'г'],
+    ]
+
+
+def test_pdf_embeds_configured_font(cart, user_client):
+    content = download(user_client, 'pdf')
+    assert content.startswith(b'%PDF')
+    assert b'DejaVu' in content
+
+
+def test_empty_cart_returns_header_only(user_client):
+    assert download(user_client, 'txt').decode().splitlines() == [
+        'Foodgram', 'Список покупок:'
+    ]
+
+
+def test_pdf_without_font_fails_before_streaming(settings, tmp_path):
+    settings.SHOPPING_LIST_PDF_FONT = str(tmp_path / 'missing.ttf')
+    with pytest.raises(ImproperlyConfigured):
+        PDFShoppingListRenderer().stream(iter(()))
+
+
+def test_base_renderer_is_abstract():
+    with pytest.raises(TypeError):
+        ShoppingListRenderer()
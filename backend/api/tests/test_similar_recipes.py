@@ -0,0 +1,120 @@
+import pytest
+from django.core.management import call_command
+
+from recipes.models import Recipe, RecipeIngredient, RecipeSimilarity
+from recipes.similarity import refresh_similar_recipes
+
+# Номера ингредиентов из фикстуры ingredients у рецептов по порядку.
+RECIPES = ((0, 1, 2), (0, 1, 2), (0, 1, 3), (4, 5), (0,), (4, 6), ())
+COUNT = 2
+CHUNK_SIZE = 2
+
+
+@pytest.fixture
+def recipes(author, ingredients, make_recipe):
+    recipes = []
+    for positions in RECIPES:
+        recipe = make_recipe(author, ingredient_count=0)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredients[position],
+                             amount=1)
+            for position in positions
+        )
+        recipes.append(recipe)
+    return recipes
+
+
+def refresh(full=False):
+    return refresh_similar_recipes(
+        full=full, count=COUNT, chunk_size=CHUNK_SIZE
+    )
+
+
+def get_table():
+    """Соседи каждого рецепта по рангу со сходством до 5 знаков."""
+    table = {}
+    for row in RecipeSimilarity.objects.order_by('recipe_id', 'rank'):
+        table.setdefault(row.recipe_id, []).append(
+            (row.similar_id, round(row.score, 5))
+        )
+    return table
+
+
+def get_similar(client, recipe):
+    response = client.get(f'/api/recipes/{recipe.id}/similar/')
+    assert response.status_code == 200
+    return [item['id'] for item in response.json()]
+
+
+def swap_ingredient(recipe, old, new):
+    """Меняет ингредиент рецепта, сохраняя частоты ингредиентов."""
+    RecipeIngredient.objects.filter(
+        recipe=recipe, ingredient=old
+    ).update(ingredient=new)
+    recipe.save()
+
+
+@pytest.mark.django_db
+def test_similar_endpoint_order(recipes, anonymous_client):
+    assert refresh(full=True) == len(recipes)
+    # Одинаковый состав, затем больше общих редких ингредиентов.
+    assert get_similar(anonymous_client, recipes[0]) == [
+        recipes[1].id, recipes[2].id
+    ]
+    assert get_similar(anonymous_client, recipes[3]) == [recipes[5].id]
+    assert get_similar(anonymous_client, recipes[6]) == []
+    response = anonymous_client.get('/api/recipes/999999/similar/')
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_incremental_refresh_matches_full(recipes, ingredients):
+    refresh(full=True)
+    assert refresh() == 0
+    # Рецепты 2 и 3 обмениваются ингредиентами 3 и 5: веса IDF те же.
+    swap_ingredient(recipes[2], ingredients[3], ingredients[5])
+    swap_ingredient(recipes[3], ingredients[5], ingredients[3])
+    updated = refresh()
+    assert 2 <= updated < len(recipes)
+    incremental = get_table()
+    refresh(full=True)
+    assert incremental == get_table()
+
+
+@pytest.mark.django_db
+def test_new_recipe_becomes_neighbour(recipes, ingredients, author,
+                                      make_recipe, anonymous_client):
+    refresh(full=True)
+    twin = make_recipe(author, ingredient_count=0)
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=twin, ingredient=ingredients[position],
+                         amount=1)
+        for position in (4, 5)
+    )
+    assert refresh() < len(recipes) + 1
+    assert get_similar(anonymous_client, recipes[3])[0] == twin.id
+    assert get_similar(anonymous_client, twin)[0] == recipes[3].id
+
+
+@pytest.mark.django_db
+def test_deleted_neighbour_marks_recipes_for_refresh(recipes,
+                                                     anonymous_client):
+    refresh(full=True)
+    recipes[1].delete()
+    marked = set(Recipe.objects.filter(
+        similar_built_at__isnull=True
+    ).values_list('id', flat=True))
+    # Все, у кого рецепт 1 был среди соседей.
+    assert marked == {recipes[0].id, recipes[2].id, recipes[4].id}
+    refresh()
+    assert not Recipe.objects.filter(similar_built_at__isnull=True).exists()
+    assert get_similar(anonymous_client, recipes[0]) == [
+        recipes[2].id, recipes[4].id
+    ]
+
+
+@pytest.mark.django_db
+def test_command_runs_full_refresh(recipes, capsys):
+    call_command('similar_recipes', '--full', '--count', str(COUNT))
+    assert 'Пересчитано рецептов: 7' in capsys.readouterr().out
+    assert len(get_table()) == len(recipes) - 1
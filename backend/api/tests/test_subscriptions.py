@@ -0,0 +1,80 @@
+from datetime import timedelta
+from itertools import product
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from recipes.models import Recipe
+from users.models import Subscribe
+
+URL = '/api/users/subscriptions/'
+RECIPES_PER_AUTHOR = 4
+
+
+@pytest.fixture
+def authors(user, make_user, make_recipe):
+    """Авторы с рецептами; подписки оформляются в тестах."""
+    authors = []
+    for index in range(6):
+        author = make_user(f'author-{index}')
+        author.recipe_ids = [
+            make_recipe(author, ingredient_count=1).id
+            for _ in range(RECIPES_PER_AUTHOR)
+        ]
+        authors.append(author)
+    now = timezone.now()
+    for author in authors:
+        # Разные pub_date: порядок превью не зависит от совпадений.
+        for index, pk in enumerate(author.recipe_ids):
+            Recipe.objects.filter(pk=pk).update(
+                pub_date=now + timedelta(minutes=index)
+            )
+    return authors
+
+
+def get_subscriptions(client, recipes_limit):
+    params = {'limit': 100}
+    if recipes_limit is not None:
+        params['recipes_limit'] = recipes_limit
+    response = client.get(URL, params)
+    assert response.status_code == 200
+    return response.json()['results']
+
+
+@pytest.mark.django_db
+def test_recipes_limit_keeps_newest_recipes(authors, user, user_client):
+    Subscribe.objects.bulk_create(
+        Subscribe(user=user, author=author) for author in authors
+    )
+    for recipes_limit in (None, 1, 2, RECIPES_PER_AUTHOR + 1):
+        results = get_subscriptions(user_client, recipes_limit)
+        assert [item['id'] for item in results] == [
+            author.id for author in authors
+        ]
+        shown = recipes_limit or RECIPES_PER_AUTHOR
+        for item, author in zip(results, authors):
+            assert [recipe['id'] for recipe in item['recipes']] == (
+                author.recipe_ids[::-1][:shown]
+            )
+            assert item['recipes_count'] == RECIPES_PER_AUTHOR
+
+
+@pytest.mark.django_db
+def test_query_count_does_not_grow(authors, user, user_client):
+    """Число запросов не зависит от recipes_limit и числа авторов."""
+    get_subscriptions(user_client, None)
+    counts = {}
+    subscribed = 0
+    for author_count, recipes_limit in product((1, 3, 6), (None, 1, 3)):
+        Subscribe.objects.bulk_create(
+            Subscribe(user=user, author=author)
+            for author in authors[subscribed:author_count]
+        )
+        subscribed = author_count
+        with CaptureQueriesContext(connection) as context:
+            results = get_subscriptions(user_client, recipes_limit)
+        assert len(results) == author_count
+        counts[author_count, recipes_limit] = len(context)
+    assert len(set(counts.values())) == 1, counts
@@ -0,0 +1,119 @@
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.management.commands import upload_ingredients
+from recipes.models import Ingredient
+
+ROWS = [
+    ('абрикосы', 'г'),
+    ('базилик', 'г'),
+    ('ванилин', 'г'),
+    ('абрикосы', 'г'),
+    ('ванилин', 'шт.'),
+    ('', 'г'),
+    ('гвоздика', ''),
+]
+# Без повтора абрикосов и строк без названия или единицы.
+EXPECTED = {
+    ('абрикосы', 'г'), ('базилик', 'г'), ('ванилин', 'г'), ('ванилин', 'шт.')
+}
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / 'ingredients.csv'
+    path.write_text(
+        ''.join(f'{name},{unit}\n' for name, unit in ROWS) + 'лишнее\n',
+        encoding='UTF-8',
+    )
+    return path
+
+
+@pytest.fixture
+def json_file(tmp_path, monkeypatch):
+    # Маленькие порции чтения: объекты разрываются на границах порций.
+    monkeypatch.setattr(upload_ingredients, 'JSON_READ_SIZE', 7)
+    path = tmp_path / 'ingredients.json'
+    path.write_text(json.dumps(
+        [{'name': name, 'measurement_unit': unit} for name, unit in ROWS],
+        ensure_ascii=False,
+        indent=2,
+    ), encoding='UTF-8')
+    return path
+
+
+@pytest.fixture(params=('csv', 'json'))
+def data_file(request):
+    return request.getfixturevalue(f'{request.param}_file')
+
+
+def upload(path, *args):
+    call_command('upload_ingredients', '--path', str(path), *args)
+
+
+def stored():
+    return set(Ingredient.objects.values_list('name', 'measurement_unit'))
+
+
+@pytest.fixture(params=('bulk_create', 'copy'))
+def load_args(request):
+    if request.param == 'copy':
+        if connection.vendor != 'postgresql':
+            pytest.skip('COPY есть только в PostgreSQL')
+        return ('--copy',)
+    return ()
+
+
+@pytest.mark.django_db
+def test_upload_skips_duplicates(data_file, load_args, capsys):
+    Ingredient.objects.bulk_create([Ingredient(
+        name='базилик', measurement_unit='г'
+    )])
+    upload(data_file, *load_args)
+    assert stored() == EXPECTED
+    out = capsys.readouterr().out
+    assert 'добавлено: 3' in out
+    upload(data_file, *load_args)
+    assert Ingredient.objects.count() == len(EXPECTED)
+    assert 'добавлено: 0' in capsys.readouterr().out
+
+
+@pytest.mark.django_db
+def test_dry_run_writes_nothing(data_file, load_args, capsys):
+    upload(data_file, '--dry-run', *load_args)
+    assert not Ingredient.objects.exists()
+    out = capsys.readouterr().out
+    assert 'добавлено: 4' in out and 'dry-run' in out
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('batch_size, inserts', ((1, 5), (2, 3), (100, 1)))
+def test_batch_size(csv_file, batch_size, inserts):
+    with CaptureQueriesContext(connection) as context:
+        upload(csv_file, '--batch-size', str(batch_size))
+    assert sum(
+        query['sql'].startswith('INSERT') for query in context.captured_queries
+    ) == inserts
+    assert stored() == EXPECTED
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('content', ('{"name": "соль"}', '[{"name": "соль"'))
+def test_invalid_json(tmp_path, content):
+    path = tmp_path / 'ingredients.json'
+    path.write_text(content, encoding='UTF-8')
+    with pytest.raises(CommandError):
+        upload(path)
+    assert not Ingredient.objects.exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('args', (('--batch-size', '0'), ()))
+def test_invalid_arguments(tmp_path, csv_file, args):
+    path = csv_file if args else tmp_path / 'missing.csv'
+    with pytest.raises(CommandError):
+        upload(path, *args)
@@ -0,0 +1,33 @@
+import pytest
+from django.db import connection
+
+from foodgram.explain import find_seq_scans
+
+
+def get_sql(query):
+    if isinstance(query, str):
+        return query, None
+    return query.query.sql_with_params()
+
+
+def assert_no_seq_scan(*queries, min_rows=0):
+    """Падает, если план запроса читает таблицу последовательно.
+
+    queries: QuerySet или текст SELECT, например из
+    CaptureQueriesContext. Планы строятся с enable_seqscan = off, поэтому
+    Seq Scan в плане значит, что подходящего индекса нет.
+    """
+    if connection.vendor != 'postgresql':
+        pytest.skip('Планы запросов проверяются только в PostgreSQL')
+    scans = find_seq_scans(
+        [get_sql(query) for query in queries], min_rows, force_index=True
+    )
+    assert not scans, f'Последовательное чтение таблиц: {scans}'
+
+
+def select_queries(context):
+    """Тексты SELECT из CaptureQueriesContext."""
+    return [
+        query['sql'] for query in context.captured_queries
+        if query['sql'].lstrip().upper().startswith('SELECT')
+    ]
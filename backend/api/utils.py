@@ -3,19 +3,35 @@ from django.db.models import Sum
 from recipes.models import RecipeIngredient
 
 
-def create_shopping_list_report(shopping_cart):
-    buy_list = (
-        RecipeIngredient.objects.filter(
-            recipe__in=shopping_cart.values('recipe_id')
-        ).values(
+def get_shopping_list(user):
+    """Суммарное количество ингредиентов из корзины пользователя.
+
+    Агрегация выполняется в БД, строк не больше, чем разных
+    ингредиентов, поэтому они загружаются сразу: ответ потом отдается
+    без запросов к БД, в том числе из цикла событий ASGI. Серверный
+    курсор здесь не нужен: для него PostgreSQL выбирает план с быстрым
+    первым ответом, и агрегация идет дольше.
+    """
+    return sum_ingredients(
+        RecipeIngredient.objects.filter(recipe__shopping_list__user=user)
+    )
+
+
+def get_recipes_shopping_list(recipe_ids):
+    """Суммарное количество ингредиентов рецептов recipe_ids."""
+    return sum_ingredients(
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+    )
+
+
+def sum_ingredients(queryset):
+    return list(
+        queryset.values(
             'ingredient__name',
             'ingredient__measurement_unit',
-        ).annotate(amount=Sum('amount'))
+        ).annotate(
+            amount=Sum('amount')
+        ).order_by(
+            'ingredient__name'
+        )
     )
-    buy_list_text = 'Foodgram\nСписок покупок:\n'
-    for item in buy_list:
-        name = item['ingredient__name']
-        measurement_unit = item['ingredient__measurement_unit']
-        amount = item['amount']
-        buy_list_text += f'{name}, {amount} {measurement_unit}\n'
-    return buy_list_text
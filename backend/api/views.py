@@ -1,121 +1,368 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import OuterRef, Prefetch, Subquery
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import SAFE_METHODS, AllowAny, IsAuthenticated
+from rest_framework.permissions import (SAFE_METHODS, AllowAny, IsAdminUser,
+                                        IsAuthenticated)
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from recipes.models import Ingredient, Recipe, ShoppingCart, Tag
-from users.models import CustomUser, Subscribe
+from foodgram import metrics
+from foodgram.metrics import SerializerTimingMixin
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import CustomUser
+from .cache import CachedReadMixin
+from .exports import (EXPORT_RENDERERS, get_export, get_export_file,
+                      get_export_status, start_export)
 from .filters import IngredientFilter, RecipeFilter
-from .paginators import LimitPageNumberPaginator
-from .serializers import (FavoriteSerializer, IngredientSerializer,
+from .ingredient_index import ingredient_index
+from .links import (ADDED, EXISTS, FAVORITE, MISSING, REMOVED, SELF,
+                    SHOPPING_CART, SUBSCRIBE, apply_batch)
+from .paginators import (FeedPaginator, LimitPageNumberPaginator,
+                         RecipePaginator)
+from .recipe_index import CoverageRanking
+from .renderers import SHOPPING_LIST_RENDERERS, TextShoppingListRenderer
+from .serializers import (IngredientSerializer, LinkBatchSerializer,
                           RecipeCreateSerializer, RecipeReadSerializer,
-                          ShoppingCartSerializer, SubscriptionSerializer,
-                          TagSerializer, SubscribeSerializer)
-from .utils import create_shopping_list_report
+                          ShortRecipeSerializer, SubscriptionSerializer,
+                          TagSerializer)
+from .utils import get_shopping_list
 
 User = get_user_model()
 
+FAVORITE_ERRORS = {
+    EXISTS: 'Этот рецепт уже есть в избранном',
+    MISSING: 'Рецепт не добавлен в избранное',
+}
+SHOPPING_CART_ERRORS = {
+    EXISTS: 'Этот рецепт уже есть в списке покупок',
+}
+SUBSCRIBE_ERRORS = {
+    EXISTS: 'Вы уже подписаны на данного автора.',
+    SELF: 'Нельзя подписаться на самого себя!',
+}
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+
+def change_link(request, link, pk, errors):
+    """Добавляет (POST) или удаляет одну связь одним запросом к БД.
+
+    Возвращает ответ 400 с текстом из errors или None, если связь
+    изменена. Для остальных отказов, в том числе отсутствующей связи
+    без текста в errors, отвечает 404.
+    """
+    try:
+        pk = int(pk)
+    except ValueError:
+        raise Http404
+    if request.method == 'POST':
+        result = apply_batch(link, request.user, [pk], [])
+    else:
+        result = apply_batch(link, request.user, [], [pk])
+    result = result[0]['status']
+    if result in (ADDED, REMOVED):
+        return None
+    if result in errors:
+        return Response(
+            {'errors': errors[result]}, status=status.HTTP_400_BAD_REQUEST
+        )
+    raise Http404
+
+
+def batch_links_response(request, link):
+    """Ответ массового эндпоинта со статусом каждого id."""
+    serializer = LinkBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    results = apply_batch(link, request.user, **serializer.validated_data)
+    return Response({'results': results})
+
+
+class TagViewSet(SerializerTimingMixin, CachedReadMixin,
+                 viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
+    cache_dependencies = ('tags',)
     serializer_class = TagSerializer
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Ingredient.objects.all()
+class IngredientViewSet(SerializerTimingMixin, CachedReadMixin,
+                        viewsets.ReadOnlyModelViewSet):
+    queryset = Ingredient.objects.order_by('id')
     serializer_class = IngredientSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = IngredientFilter
     search_fields = ('^name',)
     pagination_class = None
 
+    cache_dependencies = ('ingredients',)
+
+    def list(self, request, *args, **kwargs):
+        """Автодополнение по началу названия из индекса в памяти."""
+        return self.conditional_response(
+            lambda key: self.search(key, request, *args, **kwargs),
+            request,
+        )
+
+    def search(self, key, request, *args, **kwargs):
+        items = None
+        if settings.INGREDIENT_INDEX_ENABLED:
+            items = ingredient_index.search(
+                request.query_params.get('name', '')
+            )
+        if items is not None:
+            return Response(items)
+        # Без индекса в памяти фильтр istartswith идет по индексу
+        # UPPER(name) из миграции recipes 0004.
+        return self.get_shared_response(
+            key, super(CachedReadMixin, self).list, request, *args, **kwargs
+        )
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(SerializerTimingMixin, CachedReadMixin,
+                    viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    pagination_class = RecipePaginator
+    cache_bypass_params = ('is_favorited', 'is_in_shopping_cart', 'have')
+    user_flag_kinds = ('favorites', 'shopping_cart', 'subscriptions')
+
+    def get_queryset(self):
+        if self.request.method in SAFE_METHODS:
+            user = self.request.user
+            if self.shared_payload:
+                user = AnonymousUser()
+            return Recipe.objects.with_related().with_user_flags(user)
+        if self.action in ('update', 'partial_update'):
+            # Текущие ингредиенты и теги нужны для обновления по разнице.
+            return Recipe.objects.with_related()
+        return super().get_queryset()
+
+    def filter_queryset(self, queryset):
+        """С ?have= рецепты ранжируются по покрытию ингредиентов.
+
+        Остальные фильтры ограничивают ранжируемые рецепты, порядок
+        задают меньше недостающих, затем больше совпавших ингредиентов.
+        """
+        queryset = super().filter_queryset(queryset)
+        have = self.request.query_params.get('have')
+        if self.action != 'list' or not have:
+            return queryset
+        return CoverageRanking(
+            queryset, [int(pk) for pk in have.split(',') if pk]
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ('list', 'feed'):
+            context['image_variant'] = 'medium'
+        return context
+
+    def get_cache_dependencies(self):
+        if self.action == 'retrieve':
+            recipe = f'recipe:{self.kwargs[self.lookup_field]}'
+            return (recipe, 'tags', 'ingredients', 'users')
+        return ('recipes', 'tags', 'ingredients', 'users')
+
+    def overlay_user_data(self, data, flags):
+        """Проставляет флаги пользователя в общий закешированный ответ."""
+        recipes = data['results'] if 'results' in data else [data]
+        for recipe in recipes:
+            recipe['is_favorited'] = recipe['id'] in flags['favorites']
+            recipe['is_in_shopping_cart'] = (
+                recipe['id'] in flags['shopping_cart']
+            )
+            recipe['author']['is_subscribed'] = (
+                recipe['author']['id'] in flags['subscriptions']
+            )
+        return data
 
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return RecipeReadSerializer
         return RecipeCreateSerializer
 
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(IsAuthenticated,),
+        pagination_class=FeedPaginator,
+    )
+    def feed(self, request):
+        """Рецепты авторов из подписок, от новых к старым."""
+        recipes = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(recipes, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=('get',))
+    def similar(self, request, pk=None):
+        """Похожие по составу рецепты из предрассчитанной таблицы.
+
+        Соседи читаются одним запросом по индексу (recipe, rank), наличие
+        рецепта проверяется только при пустом результате.
+        """
+        try:
+            pk = int(pk)
+        except ValueError:
+            raise Http404
+        recipes = list(
+            Recipe.objects.defer('search_vector')
+            .filter(similar_to__recipe_id=pk)
+            .order_by('similar_to__rank')
+        )
+        if not recipes and not Recipe.objects.filter(pk=pk).exists():
+            raise Http404
+        return Response(ShortRecipeSerializer(
+            recipes, many=True, context={'request': request}
+        ).data)
+
     @action(
         detail=True,
         methods=['post', 'delete'],
         permission_classes=[IsAuthenticated],
     )
     def favorite(self, request, pk=None):
+        error = change_link(request, FAVORITE, pk, FAVORITE_ERRORS)
+        if error is not None:
+            return error
         if request.method == 'POST':
-            serializer = FavoriteSerializer(
-                data={
-                    'recipe_id': pk,
-                    'user_id': request.user.id
-                }, context={'request': request}
-            )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-        recipe = get_object_or_404(Recipe, id=pk)
-        favorite = request.user.favorites.filter(recipe=recipe)
-
-        if not favorite:
+            recipe = Recipe.objects.defer('search_vector').get(pk=pk)
             return Response(
-                {'errors': 'Рецепт не добавлен в избранное'},
-                status=status.HTTP_400_BAD_REQUEST,
+                ShortRecipeSerializer(
+                    recipe, context={'request': request}
+                ).data,
+                status=status.HTTP_201_CREATED,
             )
-        favorite.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
         detail=True,
         methods=['POST', 'DELETE'],
         permission_classes=(IsAuthenticated,),
-        serializer_class=ShoppingCartSerializer,
     )
     def shopping_cart(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, id=pk)
-        serializer = ShoppingCartSerializer(
-            data={
-                'recipe_id': recipe.id,
-                'user_id': request.user.id
-            }, context={'request': request}
-        )
-
+        error = change_link(request, SHOPPING_CART, pk, SHOPPING_CART_ERRORS)
+        if error is not None:
+            return error
         if request.method == 'POST':
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-        shopping_cart_item = get_object_or_404(
-            ShoppingCart, user=request.user, recipe=recipe
-        )
-        shopping_cart_item.delete()
+            return Response(
+                {'recipe': int(pk), 'user': request.user.id},
+                status=status.HTTP_201_CREATED,
+            )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        detail=False,
+        methods=('post',),
+        permission_classes=(IsAuthenticated,),
+        serializer_class=LinkBatchSerializer,
+    )
+    def favorite_batch(self, request):
+        """Добавление и удаление нескольких рецептов в избранном."""
+        return batch_links_response(request, FAVORITE)
+
+    @action(
+        detail=False,
+        methods=('post',),
+        permission_classes=(IsAuthenticated,),
+        serializer_class=LinkBatchSerializer,
+    )
+    def shopping_cart_batch(self, request):
+        """Добавление и удаление нескольких рецептов в списке покупок."""
+        return batch_links_response(request, SHOPPING_CART)
+
     @action(
         detail=False,
         methods=('get',),
         permission_classes=(IsAuthenticated,),
+        renderer_classes=(*SHOPPING_LIST_RENDERERS, JSONRenderer),
     )
     def download_shopping_cart(self, request):
-        """Скачивание списка покупок."""
-        shopping_cart_items = ShoppingCart.objects.filter(user=request.user)
-        buy_list_text = create_shopping_list_report(shopping_cart_items)
-        response = HttpResponse(buy_list_text, content_type="text/plain")
+        """Скачивание списка покупок в формате txt, csv или pdf."""
+        renderer = request.accepted_renderer
+        if not isinstance(renderer, SHOPPING_LIST_RENDERERS):
+            renderer = TextShoppingListRenderer()
+        response = StreamingHttpResponse(
+            renderer.stream(get_shopping_list(request.user)),
+            content_type=renderer.media_type,
+        )
         response['Content-Disposition'] = (
-            'attachment; filename=shopping-list.txt')
+            f'attachment; filename=shopping-list.{renderer.format}')
         return response
 
+    @action(
+        detail=False,
+        methods=('post',),
+        permission_classes=(IsAuthenticated,),
+        url_path='shopping_cart_exports',
+    )
+    def create_shopping_cart_export(self, request):
+        """Фоновая сборка списка покупок, возвращает id выгрузки."""
+        export_format = request.data.get(
+            'format', TextShoppingListRenderer.format
+        )
+        if export_format not in EXPORT_RENDERERS:
+            formats = ', '.join(EXPORT_RENDERERS)
+            return Response(
+                {'format': f'Допустимые форматы: {formats}'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        export_id = start_export(request.user, export_format)
+        return Response(
+            self.get_export_data(request, export_id),
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(IsAuthenticated,),
+        url_path=r'shopping_cart_exports/(?P<export_id>[0-9a-f]{64})',
+    )
+    def shopping_cart_export(self, request, export_id=None):
+        """Статус фоновой выгрузки списка покупок."""
+        if get_export(export_id, request.user) is None:
+            raise Http404
+        return Response(self.get_export_data(request, export_id))
 
-class CustomUserViewSet(UserViewSet):
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(IsAuthenticated,),
+        url_path=r'shopping_cart_exports/(?P<export_id>[0-9a-f]{64})/download',
+    )
+    def download_shopping_cart_export(self, request, export_id=None):
+        """Скачивание готовой выгрузки списка покупок."""
+        export = get_export(export_id, request.user)
+        content = get_export_file(export_id) if export else None
+        if content is None:
+            raise Http404
+        renderer = EXPORT_RENDERERS[export['format']]
+        response = HttpResponse(content, content_type=renderer.media_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename=shopping-list.{renderer.format}')
+        return response
+
+    def get_export_data(self, request, export_id):
+        return {
+            'id': export_id,
+            'status': get_export_status(export_id) or 'expired',
+            'download_url': request.build_absolute_uri(
+                reverse(
+                    'recipes-download-shopping-cart-export',
+                    kwargs={'export_id': export_id},
+                )
+            ),
+        }
+
+
+class CustomUserViewSet(SerializerTimingMixin, UserViewSet):
     queryset = CustomUser.objects.all()
     search_fields = ('username',)
     permission_classes = (AllowAny,)
@@ -132,25 +379,61 @@ class CustomUserViewSet(UserViewSet):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=('post', 'delete'),
-            serializer_class=SubscribeSerializer,
             permission_classes=(IsAuthenticated,),
             )
     def subscribe(self, request, id=None):
         """Добавление и удаление подписок пользователя."""
-        user = self.request.user
-        author = get_object_or_404(CustomUser, id=id)
+        error = change_link(request, SUBSCRIBE, id, SUBSCRIBE_ERRORS)
+        if error is not None:
+            return error
         if request.method == 'POST':
-            serializer = SubscribeSerializer(
-                data={'user': user.id, 'author': author.id},
-                context={'request': request, 'id': id}
+            return Response(
+                {'author': int(id), 'user': request.user.id},
+                status=status.HTTP_201_CREATED,
             )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        subscription = get_object_or_404(Subscribe, user=user, author=author)
-        subscription.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        detail=False,
+        methods=('post',),
+        permission_classes=(IsAuthenticated,),
+        serializer_class=LinkBatchSerializer,
+    )
+    def subscribe_batch(self, request):
+        """Подписка и отписка от нескольких авторов."""
+        return batch_links_response(request, SUBSCRIBE)
+
+    def get_subscriptions_queryset(self, request):
+        """Авторы с числом рецептов и последними recipes_limit рецептами.
+
+        Превью рецептов всех авторов страницы загружаются одним запросом
+        через коррелированный подзапрос с LIMIT.
+        """
+        recipes = Recipe.objects.only(
+            'id',
+            'name',
+            'image',
+            'image_thumbnail',
+            'image_medium',
+            'image_webp',
+            'cooking_time',
+            'author_id',
+        )
+        recipes_limit = request.query_params.get('recipes_limit', '')
+        if recipes_limit.isdigit():
+            recipes = recipes.filter(
+                pk__in=Subquery(
+                    Recipe.objects.filter(
+                        author=OuterRef('author')
+                    ).values('pk')[:int(recipes_limit)]
+                )
+            )
+        return CustomUser.objects.filter(
+            subscribing__user=request.user
+        ).order_by('id').prefetch_related(
+            Prefetch('recipes', queryset=recipes)
+        )
+
     @action(
         methods=('get',),
         detail=False,
@@ -162,9 +445,19 @@ class CustomUserViewSet(UserViewSet):
         """Просмотр подписок пользователя."""
 
         paginated_users = self.paginate_queryset(
-            CustomUser.objects.filter(subscribing__user=request.user)
+            self.get_subscriptions_queryset(request)
         )
         serializer = self.serializer_class(
             paginated_users, many=True, context={'request': request}
         )
         return self.get_paginated_response(serializer.data)
+
+
+class MetricsView(APIView):
+    """Метрики API в формате Prometheus, только для администраторов."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        body, content_type = metrics.render()
+        return HttpResponse(body, content_type=content_type)
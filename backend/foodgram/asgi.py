@@ -0,0 +1,19 @@
+import os
+
+import django
+from django.core.handlers import asgi
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+
+
+class ASGIRequest(asgi.ASGIRequest):
+    # Через ASGI горячие эндпоинты чтения обслуживают async-представления.
+    urlconf = 'foodgram.asgi_urls'
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    request_class = ASGIRequest
+
+
+django.setup(set_prefix=False)
+application = ASGIHandler()
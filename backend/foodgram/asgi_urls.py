@@ -0,0 +1,20 @@
+from django.urls import include, path
+
+from api import async_views
+
+# Маршруты запросов через ASGI: горячие эндпоинты чтения обслуживают
+# асинхронные представления, остальное - обычные из foodgram.urls.
+urlpatterns = [
+    path('api/recipes/', async_views.recipe_list, name='recipes-list'),
+    path('api/recipes/<int:pk>/', async_views.recipe_detail,
+         name='recipes-detail'),
+    path('api/tags/', async_views.tag_list, name='tags-list'),
+    path('api/tags/<int:pk>/', async_views.tag_detail, name='tags-detail'),
+    path('api/ingredients/', async_views.ingredient_list,
+         name='ingridients-list'),
+    path('api/ingredients/<int:pk>/', async_views.ingredient_detail,
+         name='ingridients-detail'),
+    path('api/users/subscriptions/', async_views.subscriptions,
+         name='users-subscriptions'),
+    path('', include('foodgram.urls')),
+]
@@ -0,0 +1,34 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def change_counter(queryset, field, delta):
+    """Атомарно меняет счетчик на delta, не опуская его ниже нуля."""
+    queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def count_subquery(model, lookup):
+    """Подзапрос с количеством строк model, ссылающихся на OuterRef('pk')."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{lookup: OuterRef('pk')})
+            .order_by()
+            .values(lookup)
+            .annotate(total=Count('*'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def recount(queryset, counters):
+    """Пересчитывает счетчики одним UPDATE.
+
+    counters: словарь {поле счетчика: (модель, поле внешнего ключа)}.
+    Возвращает количество обновленных строк.
+    """
+    return queryset.update(**{
+        field: count_subquery(model, lookup)
+        for field, (model, lookup) in counters.items()
+    })
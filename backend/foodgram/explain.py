@@ -0,0 +1,52 @@
+import json
+
+from django.db import connection
+
+
+def walk_plan(plan):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from walk_plan(child)
+
+
+def get_plan(cursor, sql, params=None):
+    cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+def find_seq_scans(queries, min_rows=0, force_index=False):
+    """Таблицы не меньше min_rows строк, читаемые в планах целиком.
+
+    queries: пары (sql, params) SELECT-запросов, только для PostgreSQL.
+    С force_index планы строятся с enable_seqscan = off: на маленьких
+    тестовых данных планировщик выбирает Seq Scan даже при подходящем
+    индексе, а так Seq Scan остается, только если индекса нет.
+    """
+    found = {}
+    with connection.cursor() as cursor:
+        if force_index:
+            cursor.execute('SET enable_seqscan = off')
+        try:
+            for sql, params in queries:
+                for node in walk_plan(get_plan(cursor, sql, params)):
+                    if node['Node Type'] == 'Seq Scan':
+                        found[node['Relation Name']] = None
+        finally:
+            if force_index:
+                cursor.execute('RESET enable_seqscan')
+        if not found:
+            return []
+        cursor.execute(
+            'SELECT relname, GREATEST(reltuples, 0)::bigint FROM pg_class '
+            'WHERE relname = ANY(%s)',
+            [list(found)],
+        )
+        sizes = dict(cursor.fetchall())
+    return [
+        {'table': table, 'rows': sizes.get(table, 0)}
+        for table in sorted(found)
+        if sizes.get(table, 0) >= min_rows
+    ]
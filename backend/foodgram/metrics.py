@@ -0,0 +1,215 @@
+import os
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connection
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+LABELS = ('route', 'method')
+UNMATCHED_ROUTE = 'unmatched'
+
+# Каталог создает и хук gunicorn, но переменная задана для всего образа:
+# без каталога воркер RQ и команды manage.py падают на первой метрике.
+if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+REQUEST_LATENCY = Histogram(
+    'foodgram_http_request_duration_seconds',
+    'Время обработки запроса',
+    LABELS + ('status',),
+    buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10),
+)
+DB_QUERIES = Histogram(
+    'foodgram_db_queries',
+    'Количество SQL-запросов за один HTTP-запрос',
+    LABELS,
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200),
+)
+DB_TIME = Histogram(
+    'foodgram_db_duration_seconds',
+    'Суммарное время SQL-запросов за один HTTP-запрос',
+    LABELS,
+    buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5),
+)
+SERIALIZER_TIME = Histogram(
+    'foodgram_serializer_duration_seconds',
+    'Время представлений DRF без SQL-запросов: построение данных ответа',
+    LABELS,
+    buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1),
+)
+RESPONSE_BYTES = Histogram(
+    'foodgram_response_bytes',
+    'Размер тела ответа',
+    LABELS,
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+DB_POOL_CONNECTIONS = Gauge(
+    'foodgram_db_pool_connections',
+    'Соединения в пуле по состояниям',
+    ('alias', 'state'),
+    multiprocess_mode='livesum',
+)
+DB_POOL_EVENTS = Counter(
+    'foodgram_db_pool_events',
+    'Открытия и закрытия соединений пула по причинам',
+    ('alias', 'event'),
+)
+DB_POOL_WAIT = Histogram(
+    'foodgram_db_pool_wait_seconds',
+    'Время получения соединения из пула',
+    ('alias',),
+    buckets=(.0005, .001, .005, .01, .05, .1, .5, 1, 5, 10),
+)
+
+current_stats = ContextVar('current_stats', default=None)
+
+
+class RequestStats:
+    """Счетчики одного запроса: SQL-запросы и работа представления."""
+
+    __slots__ = ('queries', 'db_time', 'serializer_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обертка для connection.execute_wrapper."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+
+class SerializerTimingMixin:
+    """Замер построения данных ответа в представлении DRF.
+
+    Время от проверки прав до finalize_response за вычетом SQL-запросов
+    почти целиком уходит на сериализаторы.
+    """
+
+    _timing = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        stats = current_stats.get()
+        if stats is not None:
+            self._timing = (stats, time.perf_counter(), stats.db_time)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self._timing is not None:
+            stats, started, db_time = self._timing
+            stats.serializer_time += (
+                time.perf_counter() - started - (stats.db_time - db_time)
+            )
+            self._timing = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+def track_queries():
+    """Учитывает SQL-запросы текущего потока в статистике запроса.
+
+    Асинхронные представления выполняют запросы к БД в других потоках,
+    куда статистика попадает через контекстную переменную.
+    """
+    stats = current_stats.get()
+    if stats is None:
+        return nullcontext()
+    return connection.execute_wrapper(stats)
+
+
+def get_route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNMATCHED_ROUTE
+    return match.view_name or match.route or UNMATCHED_ROUTE
+
+
+def count_streaming_bytes(content, observe):
+    size = 0
+    try:
+        for chunk in content:
+            size += len(chunk)
+            yield chunk
+    finally:
+        observe(size)
+
+
+class MetricsMiddleware:
+    """Собирает метрики по маршрутам и методам HTTP.
+
+    Работает и в синхронной, и в асинхронной цепочке middleware, чтобы
+    под ASGI не переводить каждый запрос в общий синхронный поток.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            # Так Django распознает асинхронный middleware.
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            with track_queries():
+                response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.observe(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.observe(request, response, stats, started)
+
+    def observe(self, request, response, stats, started):
+        elapsed = time.perf_counter() - started
+        labels = (get_route(request), request.method)
+        REQUEST_LATENCY.labels(*labels, response.status_code).observe(
+            elapsed
+        )
+        DB_QUERIES.labels(*labels).observe(stats.queries)
+        DB_TIME.labels(*labels).observe(stats.db_time)
+        if stats.serializer_time:
+            SERIALIZER_TIME.labels(*labels).observe(stats.serializer_time)
+        response_bytes = RESPONSE_BYTES.labels(*labels)
+        if response.streaming:
+            response.streaming_content = count_streaming_bytes(
+                response.streaming_content, response_bytes.observe
+            )
+        else:
+            response_bytes.observe(len(response.content))
+        return response
+
+
+def render():
+    """Метрики в текстовом формате Prometheus.
+
+    При запуске нескольких воркеров gunicorn с PROMETHEUS_MULTIPROC_DIR
+    значения всех процессов собираются из общего каталога.
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,58 @@
+import psycopg2
+import psycopg2.extras
+from django.db.backends.postgresql import base
+
+from .creation import DatabaseCreation
+from .pool import get_pool
+
+
+def connect(conn_params, isolation_level):
+    """Новое соединение, как в get_new_connection() Django."""
+    connection = psycopg2.connect(**conn_params)
+    if (
+        isolation_level is not None
+        and isolation_level != connection.isolation_level
+    ):
+        connection.set_session(isolation_level=isolation_level)
+    psycopg2.extras.register_default_jsonb(
+        conn_or_curs=connection, loads=lambda x: x
+    )
+    return connection
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL-бэкенд с пулом соединений в каждом процессе.
+
+    Django 3.2 закрывает соединение в конце запроса (при CONN_MAX_AGE=0)
+    или по истечении CONN_MAX_AGE; здесь закрытие возвращает его в пул,
+    а следующий запрос получает готовое соединение без нового
+    подключения и аутентификации. Параметры пула задаются в ключе POOL
+    настроек базы, см. pool.DEFAULTS.
+    """
+
+    creation_class = DatabaseCreation
+    pool = None
+
+    def get_new_connection(self, conn_params):
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        self.pool = get_pool(
+            self.alias,
+            conn_params,
+            self.settings_dict.get('POOL'),
+            lambda: connect(conn_params, isolation_level),
+        )
+        connection = self.pool.get()
+        if isolation_level is None:
+            isolation_level = connection.isolation_level
+        self.isolation_level = isolation_level
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                if self.in_atomic_block:
+                    # Обертка держит соединение до выхода из atomic,
+                    # поэтому в пул оно не возвращается.
+                    self.pool.discard(self.connection, 'closed')
+                else:
+                    self.pool.put(self.connection)
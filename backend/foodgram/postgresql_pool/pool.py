@@ -0,0 +1,261 @@
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+import psycopg2
+from psycopg2 import extensions
+
+from foodgram.metrics import DB_POOL_CONNECTIONS, DB_POOL_EVENTS, DB_POOL_WAIT
+
+Idle = namedtuple('Idle', 'connection released')
+
+DEFAULTS = {
+    'MIN_SIZE': 1,
+    'MAX_SIZE': 10,
+    # Сколько секунд ждать свободного соединения при исчерпании пула.
+    'TIMEOUT': 10,
+    # Соединение старше MAX_LIFETIME секунд закрывается при возврате.
+    'MAX_LIFETIME': 60 * 60,
+    # Соединения сверх MIN_SIZE закрываются после MAX_IDLE секунд простоя.
+    'MAX_IDLE': 10 * 60,
+    # Перед выдачей соединение, простоявшее дольше CHECK_IDLE секунд,
+    # проверяется запросом SELECT 1.
+    'CHECK_IDLE': 5,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def close_quietly(connection):
+    try:
+        connection.close()
+    except psycopg2.Error:
+        pass
+
+
+class ConnectionPool:
+    """Пул соединений psycopg2 внутри одного процесса.
+
+    Свободные соединения выдаются в порядке LIFO, поэтому редко
+    используемые простаивают и закрываются по MAX_IDLE. Проверка
+    соединения и открытие нового выполняются вне блокировки.
+    """
+
+    def __init__(self, alias, database, connect, options=None):
+        options = {**DEFAULTS, **(options or {})}
+        if not 0 <= options['MIN_SIZE'] <= options['MAX_SIZE']:
+            raise ValueError('Нужно 0 <= MIN_SIZE <= MAX_SIZE')
+        self.alias = alias
+        self.database = database
+        self.connect = connect
+        self.min_size = options['MIN_SIZE']
+        self.max_size = options['MAX_SIZE']
+        self.timeout = options['TIMEOUT']
+        self.max_lifetime = options['MAX_LIFETIME']
+        self.max_idle = options['MAX_IDLE']
+        self.check_idle = options['CHECK_IDLE']
+        self.pid = os.getpid()
+        self.closed = False
+        self._condition = threading.Condition()
+        self._idle = deque()
+        self._opened_at = {}
+        # Открытые соединения и места, зарезервированные под открытие.
+        self._size = 0
+        self._waiting = 0
+
+    def fill(self):
+        """Открывает соединения до MIN_SIZE."""
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            self.put(self._open())
+
+    def get(self):
+        started = time.monotonic()
+        while True:
+            idle, expired = self._checkout(started)
+            for connection in expired:
+                self.discard(connection, 'idle_timeout')
+            if idle is None:
+                connection = self._open()
+                break
+            if self._is_healthy(idle):
+                connection = idle.connection
+                break
+            self.discard(idle.connection, 'health_check_failed')
+        DB_POOL_WAIT.labels(self.alias).observe(time.monotonic() - started)
+        return connection
+
+    def put(self, connection):
+        """Возвращает соединение в пул или закрывает его."""
+        if self.closed or os.getpid() != self.pid:
+            self.discard(connection, 'closed')
+            return
+        if not connection.closed and connection.get_transaction_status() in (
+            extensions.TRANSACTION_STATUS_INTRANS,
+            extensions.TRANSACTION_STATUS_INERROR,
+        ):
+            try:
+                connection.rollback()
+            except psycopg2.Error:
+                pass
+        if connection.closed or connection.get_transaction_status() != (
+            extensions.TRANSACTION_STATUS_IDLE
+        ):
+            self.discard(connection, 'broken')
+            return
+        if self._age(connection) >= self.max_lifetime:
+            self.discard(connection, 'max_lifetime')
+            return
+        with self._condition:
+            self._idle.append(Idle(connection, time.monotonic()))
+            self._condition.notify()
+            self._publish()
+
+    def close(self):
+        """Закрывает свободные соединения, занятые закроются при возврате."""
+        with self._condition:
+            self.closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+        for item in idle:
+            self.discard(item.connection, 'closed')
+
+    def stats(self):
+        with self._condition:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'waiting': self._waiting,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+            }
+
+    def _checkout(self, started):
+        """Свободное соединение или None, если можно открыть новое.
+
+        Заодно забирает из пула соединения, простоявшие дольше MAX_IDLE.
+        """
+        with self._condition:
+            if self.closed:
+                raise psycopg2.OperationalError('Пул соединений закрыт')
+            expired = self._pop_expired()
+            while not self._idle and self._size >= self.max_size:
+                remaining = started + self.timeout - time.monotonic()
+                if remaining <= 0:
+                    DB_POOL_EVENTS.labels(self.alias, 'timeout').inc()
+                    raise psycopg2.OperationalError(
+                        f'Нет свободных соединений в пуле {self.alias!r} '
+                        f'за {self.timeout} с'
+                    )
+                self._waiting += 1
+                try:
+                    self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            if self._idle:
+                idle = self._idle.pop()
+            else:
+                idle = None
+                self._size += 1
+            self._publish()
+            return idle, expired
+
+    def _pop_expired(self):
+        expired = []
+        now = time.monotonic()
+        while (
+            self._idle
+            and self._size - len(expired) > self.min_size
+            and now - self._idle[0].released > self.max_idle
+        ):
+            expired.append(self._idle.popleft().connection)
+        return expired
+
+    def _open(self):
+        """Открывает соединение на уже зарезервированное место."""
+        try:
+            connection = self.connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+                self._publish()
+            raise
+        with self._condition:
+            self._opened_at[connection] = time.monotonic()
+        DB_POOL_EVENTS.labels(self.alias, 'opened').inc()
+        return connection
+
+    def _age(self, connection):
+        with self._condition:
+            opened_at = self._opened_at.get(connection, 0)
+        return time.monotonic() - opened_at
+
+    def _is_healthy(self, idle):
+        connection = idle.connection
+        if connection.closed:
+            return False
+        if self._age(connection) >= self.max_lifetime:
+            return False
+        if time.monotonic() - idle.released < self.check_idle:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except psycopg2.Error:
+            return False
+        return True
+
+    def discard(self, connection, reason):
+        """Закрывает соединение и освобождает его место в пуле."""
+        if os.getpid() == self.pid:
+            close_quietly(connection)
+        with self._condition:
+            if self._opened_at.pop(connection, None) is not None:
+                self._size -= 1
+            self._condition.notify()
+            self._publish()
+        DB_POOL_EVENTS.labels(self.alias, reason).inc()
+
+    def _publish(self):
+        idle = len(self._idle)
+        DB_POOL_CONNECTIONS.labels(self.alias, 'idle').set(idle)
+        DB_POOL_CONNECTIONS.labels(self.alias, 'in_use').set(
+            self._size - idle
+        )
+
+
+def get_pool(alias, conn_params, options, connect):
+    """Пул текущего процесса для alias и параметров подключения.
+
+    После fork (например, в воркерах gunicorn с --preload) создается
+    новый пул, соединения родителя в дочернем процессе не используются.
+    """
+    key = (alias, repr(sorted(conn_params.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is not None and pool.pid == os.getpid() and not pool.closed:
+            return pool
+        pool = ConnectionPool(
+            alias, conn_params.get('database'), connect, options
+        )
+        _pools[key] = pool
+    pool.fill()
+    return pool
+
+
+def close_pools(database=None):
+    """Закрывает пулы процесса, все или только для БД database."""
+    with _pools_lock:
+        pools = [
+            pool for pool in _pools.values()
+            if database is None or pool.database == database
+        ]
+    for pool in pools:
+        pool.close()
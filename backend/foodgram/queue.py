@@ -0,0 +1,25 @@
+from django.conf import settings
+
+
+def enqueue(func, *args, job_id=None, **kwargs):
+    """Ставит задачу в очередь RQ или выполняет ее сразу без Redis."""
+    if not settings.RQ_ENABLED:
+        return func(*args, **kwargs)
+    import django_rq
+
+    return django_rq.enqueue(func, *args, job_id=job_id, **kwargs)
+
+
+def get_job_status(job_id):
+    """Статус задачи RQ или None, если задача неизвестна."""
+    if not settings.RQ_ENABLED:
+        return None
+    import django_rq
+    from rq.job import JobStatus
+
+    job = django_rq.get_queue().fetch_job(job_id)
+    if job is None:
+        return None
+    # rq возвращает из Redis строку, а не JobStatus.
+    status = job.get_status()
+    return JobStatus(status).value if status is not None else None
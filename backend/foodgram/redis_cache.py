@@ -0,0 +1,109 @@
+import pickle
+
+import redis
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class RedisCache(BaseCache):
+    """Минимальный кеш-бэкенд Django поверх redis-py.
+
+    В Django 3.2 нет встроенного бэкенда для Redis, а django-redis
+    не входит в зависимости проекта.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        self._client = redis.Redis.from_url(server)
+
+    def _dumps(self, value):
+        # Целые числа хранятся как есть, чтобы работал INCRBY.
+        if type(value) is int:
+            return value
+        return pickle.dumps(value)
+
+    def _loads(self, value):
+        try:
+            return int(value)
+        except ValueError:
+            return pickle.loads(value)
+
+    def _key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _timeout(self, timeout):
+        """Таймаут в миллисекундах для redis или None без ограничения."""
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return None
+        return max(int(timeout * 1000), 1)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return bool(self._client.set(
+            self._key(key, version),
+            self._dumps(value),
+            px=self._timeout(timeout),
+            nx=True,
+        ))
+
+    def get(self, key, default=None, version=None):
+        value = self._client.get(self._key(key, version))
+        if value is None:
+            return default
+        return self._loads(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._client.set(
+            self._key(key, version),
+            self._dumps(value),
+            px=self._timeout(timeout),
+        )
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        key = self._key(key, version)
+        if timeout is None:
+            return bool(self._client.persist(key))
+        return bool(self._client.pexpire(key, timeout))
+
+    def delete(self, key, version=None):
+        return bool(self._client.delete(self._key(key, version)))
+
+    def has_key(self, key, version=None):
+        return bool(self._client.exists(self._key(key, version)))
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self._client.mget([self._key(key, version) for key in keys])
+        return {
+            key: self._loads(value)
+            for key, value in zip(keys, values)
+            if value is not None
+        }
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        with self._client.pipeline() as pipeline:
+            for key, value in data.items():
+                pipeline.set(
+                    self._key(key, version), self._dumps(value), px=timeout
+                )
+            pipeline.execute()
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._client.delete(*keys)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        if not self._client.exists(key):
+            raise ValueError(f'Ключ {key!r} не найден.')
+        return self._client.incrby(key, delta)
+
+    def clear(self):
+        self._client.flushdb()
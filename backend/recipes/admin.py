@@ -21,10 +21,16 @@ class RecipeIngredientInline(admin.TabularInline):
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author', 'cooking_time', 'pub_date')
+    list_display = (
+        'name', 'author', 'cooking_time', 'pub_date', 'updated_at'
+    )
     filter_horizontal = ('ingredients', 'tags')
     inlines = [RecipeIngredientInline]
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        Recipe.objects.filter(pk=form.instance.pk).update_search_vector()
+
 
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
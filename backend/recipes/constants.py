@@ -8,3 +8,14 @@ MAX_COOKING_TIME = 32767
 MIN_QUANTITY = 1
 MIN_INGREDIENT_AMOUNT = 0
 COOKING_TIME = 0
+MAX_IMAGE_SIZE = 5 * 1024 * 1024
+ALLOWED_IMAGE_FORMATS = ('jpeg', 'jpg', 'png', 'gif', 'webp')
+IMAGE_VARIANTS = {
+    'thumbnail': (320, 'JPEG', 'jpg'),
+    'medium': (960, 'JPEG', 'jpg'),
+    'webp': (960, 'WEBP', 'webp'),
+}
+IMAGE_VARIANT_QUALITY = 82
+SEARCH_CONFIG = 'russian'
+SIMILAR_RECIPES = 10
+SIMILARITY_CHUNK_SIZE = 500
@@ -0,0 +1,257 @@
+import io
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from PIL import Image
+
+from api.cache import bump_versions
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import CustomUser, Subscribe
+from .upload_ingredients import batched
+
+WORDS = (
+    'суп', 'борщ', 'салат', 'пирог', 'каша', 'рагу', 'омлет', 'блины',
+    'куриный', 'овощной', 'грибной', 'сырный', 'томатный', 'сливочный',
+    'быстрый', 'домашний', 'летний', 'острый', 'сладкий', 'постный',
+)
+UNITS = ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.', 'по вкусу')
+IMAGE_SIZE = (960, 640)
+
+
+def insert(model, objects, batch_size):
+    """Вставляет объекты пачками и возвращает id новых строк.
+
+    bulk_create возвращает первичные ключи не во всех БД, поэтому новые
+    строки находятся по id больше максимального до вставки.
+    """
+    last_id = model.objects.aggregate(last=Max('id'))['last'] or 0
+    for batch in batched(objects, batch_size):
+        model.objects.bulk_create(batch)
+    return list(
+        model.objects.filter(id__gt=last_id)
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+
+
+class Command(BaseCommand):
+    """
+    Сгенерировать синтетические данные для нагрузочных тестов:
+    python manage.py generate_data --users 1000 --recipes-per-user 20
+
+    Все строки вставляются через bulk_create, поэтому сигналы не
+    срабатывают: в конце счетчики пересчитываются командой recount,
+    поисковые векторы обновляются одним UPDATE, а версии кеша API
+    сбрасываются.
+    """
+
+    help = 'Генерация пользователей, рецептов, избранного, корзин и подписок'
+
+    def add_arguments(self, parser):
+        counts = (
+            ('--users', 100, 'Количество пользователей'),
+            ('--recipes-per-user', 10, 'Рецептов у каждого пользователя'),
+            ('--ingredients-per-recipe', 8, 'Ингредиентов в рецепте'),
+            ('--tags-per-recipe', 2, 'Тегов у рецепта'),
+            ('--favorites-per-user', 20, 'Рецептов в избранном'),
+            ('--carts-per-user', 5, 'Рецептов в списке покупок'),
+            ('--subscriptions-per-user', 10, 'Подписок у пользователя'),
+            ('--tags', 8, 'Минимальное количество тегов'),
+            ('--ingredients', 2000, 'Минимальный размер справочника'),
+            ('--batch-size', 5000, 'Строк в одном INSERT'),
+            ('--seed', 0, 'Начальное значение генератора случайных чисел'),
+        )
+        for name, default, help_text in counts:
+            parser.add_argument(name, type=int, default=default,
+                                help=help_text)
+        parser.add_argument(
+            '--prefix',
+            default='bench',
+            help='Префикс имен пользователей, тегов и ингредиентов',
+        )
+        parser.add_argument(
+            '--password',
+            default='bench-password',
+            help='Пароль всех сгенерированных пользователей',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        self.options = options
+        self.prefix = options['prefix']
+        self.random = random.Random(options['seed'])
+        self.started = time.monotonic()
+        with transaction.atomic():
+            tag_ids = self.step('теги', self.ensure_tags)
+            ingredient_ids = self.step('ингредиенты', self.ensure_ingredients)
+            user_ids = self.step('пользователи', self.create_users)
+            recipe_ids = self.step(
+                'рецепты', self.create_recipes, user_ids
+            )
+            self.step(
+                'состав и теги рецептов',
+                self.create_recipe_relations,
+                recipe_ids, tag_ids, ingredient_ids,
+            )
+            self.step(
+                'избранное', self.create_links, Favorite, 'recipe',
+                user_ids, recipe_ids, options['favorites_per_user'],
+            )
+            self.step(
+                'списки покупок', self.create_links, ShoppingCart, 'recipe',
+                user_ids, recipe_ids, options['carts_per_user'],
+            )
+            self.step(
+                'подписки', self.create_links, Subscribe, 'author',
+                user_ids, user_ids, options['subscriptions_per_user'],
+            )
+            self.step(
+                'поисковые векторы',
+                Recipe.objects.filter(id__in=recipe_ids).update_search_vector,
+            )
+            self.step(
+                'счетчики', call_command, 'recount', stdout=io.StringIO()
+            )
+            transaction.on_commit(lambda: bump_versions(
+                'ingredients', 'tags', 'recipe_ingredients'
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(user_ids)}, '
+            f'рецептов: {len(recipe_ids)} '
+            f'за {time.monotonic() - self.started:.1f} с'
+        ))
+
+    def step(self, title, func, *args, **kwargs):
+        started = time.monotonic()
+        result = func(*args, **kwargs)
+        self.stdout.write(f'{title}: {time.monotonic() - started:.2f} с')
+        return result
+
+    def ensure_tags(self):
+        existing = Tag.objects.count()
+        Tag.objects.bulk_create(
+            Tag(
+                name=f'{self.prefix} тег {number}',
+                slug=f'{self.prefix}-tag-{number}',
+                color='#{:06X}'.format(self.random.randrange(0x1000000)),
+            )
+            for number in range(existing, self.options['tags'])
+        )
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def ensure_ingredients(self):
+        existing = Ingredient.objects.count()
+        insert(
+            Ingredient,
+            (
+                Ingredient(
+                    name=f'{self.random.choice(WORDS)} {self.prefix} '
+                         f'{number}',
+                    measurement_unit=self.random.choice(UNITS),
+                )
+                for number in range(existing, self.options['ingredients'])
+            ),
+            self.options['batch_size'],
+        )
+        return list(Ingredient.objects.values_list('id', flat=True))
+
+    def create_users(self):
+        first = CustomUser.objects.filter(
+            username__startswith=f'{self.prefix}_'
+        ).count()
+        password = make_password(self.options['password'])
+        return insert(
+            CustomUser,
+            (
+                CustomUser(
+                    username=f'{self.prefix}_{number}',
+                    email=f'{self.prefix}_{number}@example.com',
+                    first_name=self.prefix,
+                    last_name=str(number),
+                    password=password,
+                )
+                for number in range(first, first + self.options['users'])
+            ),
+            self.options['batch_size'],
+        )
+
+    def create_recipes(self, user_ids):
+        image = self.save_image()
+        per_user = self.options['recipes_per_user']
+        return insert(
+            Recipe,
+            (
+                Recipe(
+                    author_id=user_id,
+                    name=self.words(3).capitalize(),
+                    text=self.words(40),
+                    cooking_time=self.random.randint(5, 180),
+                    image=image,
+                )
+                for user_id in user_ids
+                for _ in range(per_user)
+            ),
+            self.options['batch_size'],
+        )
+
+    def create_recipe_relations(self, recipe_ids, tag_ids, ingredient_ids):
+        tags_per_recipe = min(self.options['tags_per_recipe'], len(tag_ids))
+        ingredients_per_recipe = min(
+            self.options['ingredients_per_recipe'], len(ingredient_ids)
+        )
+        batch_size = self.options['batch_size']
+        for batch in batched(recipe_ids, batch_size):
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in batch
+                for tag_id in self.random.sample(tag_ids, tags_per_recipe)
+            )
+            RecipeIngredient.objects.bulk_create(
+                (
+                    RecipeIngredient(
+                        recipe_id=recipe_id,
+                        ingredient_id=ingredient_id,
+                        amount=self.random.randint(1, 500),
+                    )
+                    for recipe_id in batch
+                    for ingredient_id in self.random.sample(
+                        ingredient_ids, ingredients_per_recipe
+                    )
+                ),
+                batch_size=batch_size,
+            )
+
+    def create_links(self, model, field, user_ids, target_ids, per_user):
+        """Связывает каждого пользователя со случайными target_ids."""
+        per_user = min(per_user, len(target_ids))
+        objects = (
+            model(user_id=user_id, **{f'{field}_id': target_id})
+            for user_id in user_ids
+            for target_id in self.random.sample(target_ids, per_user)
+            if not (model is Subscribe and target_id == user_id)
+        )
+        for batch in batched(objects, self.options['batch_size']):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def words(self, count):
+        return ' '.join(self.random.choices(WORDS, k=count))
+
+    def save_image(self):
+        """Одна общая картинка для всех рецептов."""
+        name = f'recipes/{self.prefix}.jpg'
+        if not default_storage.exists(name):
+            buffer = io.BytesIO()
+            Image.new('RGB', IMAGE_SIZE, (200, 120, 60)).save(
+                buffer, 'JPEG'
+            )
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+        return name
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.cache import bump_versions
+from foodgram.counters import recount
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import CustomUser, Subscribe
+
+RECIPE_COUNTERS = {
+    'favorites_count': (Favorite, 'recipe'),
+    'in_carts_count': (ShoppingCart, 'recipe'),
+}
+USER_COUNTERS = {
+    'recipes_count': (Recipe, 'author'),
+    'followers_count': (Subscribe, 'author'),
+    'following_count': (Subscribe, 'user'),
+}
+
+
+class Command(BaseCommand):
+    """
+    Пересчитать счетчики рецептов и пользователей:
+    python manage.py recount
+
+    Каждая таблица обновляется одним UPDATE с коррелированными
+    подзапросами COUNT, поэтому команда исправляет расхождения без
+    загрузки строк в Python.
+    """
+
+    help = 'Пересчет счетчиков избранного, корзины, рецептов и подписок'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipes = recount(Recipe.objects.all(), RECIPE_COUNTERS)
+            users = recount(CustomUser.objects.all(), USER_COUNTERS)
+            transaction.on_commit(lambda: bump_versions('recipes', 'users'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {recipes}, пользователей: {users}'
+        ))
@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from foodgram.queue import enqueue
+from recipes.constants import SIMILAR_RECIPES, SIMILARITY_CHUNK_SIZE
+from recipes.similarity import refresh_similar_recipes
+
+
+class Command(BaseCommand):
+    """
+    Пересчитать похожие рецепты:
+    python manage.py similar_recipes [--full] [--enqueue]
+
+    По умолчанию пересчитываются только рецепты, измененные после
+    прошлого запуска, и рецепты, у которых из-за них меняются соседи.
+    Команду удобно запускать по расписанию, с --enqueue расчет
+    выполняет воркер RQ.
+    """
+
+    help = 'Расчет похожих по составу рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать все рецепты',
+        )
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=SIMILAR_RECIPES,
+            help='Похожих рецептов у каждого рецепта',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=SIMILARITY_CHUNK_SIZE,
+            help='Строк матрицы сходства в одном блоке',
+        )
+        parser.add_argument(
+            '--enqueue',
+            action='store_true',
+            help='Поставить расчет в очередь RQ',
+        )
+
+    def handle(self, *args, **options):
+        if options['count'] < 1 or options['chunk_size'] < 1:
+            raise CommandError(
+                '--count и --chunk-size должны быть больше нуля'
+            )
+        kwargs = {
+            'full': options['full'],
+            'count': options['count'],
+            'chunk_size': options['chunk_size'],
+        }
+        if options['enqueue']:
+            enqueue(refresh_similar_recipes, **kwargs)
+            self.stdout.write(self.style.SUCCESS('Расчет поставлен в очередь'))
+            return
+        started = time.monotonic()
+        updated = refresh_similar_recipes(**kwargs)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {updated} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
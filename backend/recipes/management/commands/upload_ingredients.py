@@ -1,8 +1,69 @@
-from csv import reader
+import csv
+import io
+import json
+import re
+import time
+from itertools import islice
+from pathlib import Path
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.cache import bump_versions
+from recipes.constants import MAX_MEASUREMENT_UNIT_LENGTH, MAX_NAME_LENGTH
 from recipes.models import Ingredient
 
+DEFAULT_PATH = Path(settings.BASE_DIR) / 'recipes' / 'data' / 'ingredients.csv'
+DEFAULT_BATCH_SIZE = 5000
+JSON_READ_SIZE = 64 * 1024
+JSON_SEPARATORS = re.compile(r'[\s,]*')
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) == 2:
+            yield row[0], row[1]
+
+
+def decode_objects(decoder, buffer):
+    """Разбирает полные объекты из буфера и возвращает остаток."""
+    objects = []
+    position = 0
+    while True:
+        position = JSON_SEPARATORS.match(buffer, position).end()
+        try:
+            obj, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            return objects, buffer[position:]
+        objects.append(obj)
+
+
+def read_json(file):
+    """Разбирает JSON-массив объектов по частям, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_READ_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается JSON-массив ингредиентов')
+    buffer = buffer[1:]
+    while True:
+        chunk = file.read(JSON_READ_SIZE)
+        objects, buffer = decode_objects(decoder, buffer + chunk)
+        for obj in objects:
+            yield obj.get('name'), obj.get('measurement_unit')
+        if not chunk:
+            break
+    if buffer.strip() != ']':
+        raise CommandError('Некорректный JSON-массив ингредиентов')
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    batch = list(islice(rows, size))
+    while batch:
+        yield batch
+        batch = list(islice(rows, size))
+
 
 class Command(BaseCommand):
     """
@@ -12,15 +73,123 @@ class Command(BaseCommand):
     или
     sudo docker compose -f docker-compose.production.yml
     exec backend python manage.py upload_ingredients (для удаленного сервера)
+
+    Файл читается пачками по --batch-size строк, уже существующие
+    ингредиенты пропускаются по ограничению unique_name_measurement_unit.
+    Загрузка идет в одной транзакции, --dry-run откатывает ее в конце.
     """
 
-    def handle(self, *args, **kwargs):
-        with open(
-            'recipes/data/ingredients.csv', 'r', encoding='UTF-8'
-        ) as ingredients:
-            for row in reader(ingredients):
-                if len(row) == 2:
-                    Ingredient.objects.get_or_create(
-                        name=row[0],
-                        measurement_unit=row[1],
-                    )
+    help = 'Загрузка ингредиентов из CSV или JSON файла'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=str(DEFAULT_PATH),
+            help='Путь к файлу с ингредиентами (.csv или .json)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Количество строк в одной пачке',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Выполнить загрузку и откатить транзакцию',
+        )
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Загрузка через COPY во временную таблицу (PostgreSQL)',
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        batch_size = options['batch_size']
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден')
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy поддерживается только в PostgreSQL')
+
+        reader = read_json if path.suffix.lower() == '.json' else read_csv
+        self.invalid = 0
+        started = time.monotonic()
+        with path.open(encoding='UTF-8') as file, transaction.atomic():
+            rows = self.validate_rows(reader(file))
+            if options['copy']:
+                total, inserted = self.load_with_copy(rows, batch_size)
+            else:
+                total, inserted = self.load_with_bulk_create(rows, batch_size)
+            if options['dry_run']:
+                transaction.set_rollback(True)
+            elif inserted:
+                transaction.on_commit(lambda: bump_versions('ingredients'))
+        elapsed = time.monotonic() - started
+
+        rate = total / elapsed if elapsed else total
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {total}, добавлено: {inserted}, '
+            f'пропущено: {total - inserted + self.invalid}, '
+            f'{rate:.0f} строк/с'
+            + (' (dry-run, изменения отменены)' if options['dry_run'] else '')
+        ))
+
+    def validate_rows(self, rows):
+        for name, measurement_unit in rows:
+            if (
+                not name
+                or not measurement_unit
+                or len(name) > MAX_NAME_LENGTH
+                or len(measurement_unit) > MAX_MEASUREMENT_UNIT_LENGTH
+            ):
+                self.invalid += 1
+                continue
+            yield name, measurement_unit
+
+    def load_with_bulk_create(self, rows, batch_size):
+        count_before = Ingredient.objects.count()
+        total = 0
+        for batch in batched(rows, batch_size):
+            Ingredient.objects.bulk_create(
+                [
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in batch
+                ],
+                ignore_conflicts=True,
+            )
+            total += len(batch)
+        return total, Ingredient.objects.count() - count_before
+
+    def load_with_copy(self, rows, batch_size):
+        table = Ingredient._meta.db_table
+        total = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE ingredient_staging '
+                '(name text, measurement_unit text) ON COMMIT DROP'
+            )
+            for batch in batched(rows, batch_size):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    'COPY ingredient_staging (name, measurement_unit) '
+                    'FROM STDIN WITH (FORMAT csv)',
+                    buffer,
+                )
+                total += len(batch)
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit, updated_at) '
+                'SELECT DISTINCT name, measurement_unit, now() '
+                'FROM ingredient_staging '
+                'ON CONFLICT ON CONSTRAINT unique_name_measurement_unit '
+                'DO NOTHING'
+            )
+            inserted = cursor.rowcount
+            # ON COMMIT DROP не срабатывает, если команду вызвали внутри
+            # внешней транзакции, и повторный вызов не создал бы таблицу.
+            cursor.execute('DROP TABLE ingredient_staging')
+        return total, inserted
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.16 on 2026-10-17 04:10
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+INDEX_NAME = 'recipes_recipe_search_vector_idx'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON recipes_recipe '
+        f'USING gin (search_vector)'
+    )
+    schema_editor.execute(
+        "UPDATE recipes_recipe SET search_vector = "
+        "setweight(to_tsvector('russian', coalesce(recipes_recipe.name, '')), 'A') "
+        "|| setweight(to_tsvector('russian', coalesce(("
+        "SELECT string_agg(i.name, ' ') FROM recipes_recipeingredient ri "
+        "JOIN recipes_ingredient i ON i.id = ri.ingredient_id "
+        "WHERE ri.recipe_id = recipes_recipe.id), '')), 'B') "
+        "|| setweight(to_tsvector('russian', coalesce(recipes_recipe.text, '')), 'C')"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,11 +1,16 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import (MaxValueValidator, MinValueValidator,
                                     RegexValidator)
-from django.db import models
+from django.db import connection, models
+from django.db.models import (BooleanField, Exists, OuterRef, Prefetch,
+                              Subquery, Value)
 
-from users.models import CustomUser
+from users.models import CustomUser, Subscribe
 from .constants import (HEX_COLOR_REGEX, MAX_COLOR_LENGTH, MAX_COOKING_TIME,
                         MAX_MEASUREMENT_UNIT_LENGTH, MAX_NAME_LENGTH,
-                        MAX_SLUG_LENGTH, MIN_COOKING_TIME, MIN_QUANTITY)
+                        MAX_SLUG_LENGTH, MIN_COOKING_TIME, MIN_QUANTITY,
+                        SEARCH_CONFIG)
 
 
 class Tag(models.Model):
@@ -26,6 +31,10 @@ class Tag(models.Model):
     slug = models.SlugField(
         max_length=MAX_SLUG_LENGTH, unique=True, verbose_name='Slug'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
 
     class Meta:
         verbose_name = 'Тег'
@@ -50,6 +59,10 @@ class Ingredient(models.Model):
         unique=False,
         verbose_name='Единица измерения',
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
 
     class Meta:
         constraints = [
@@ -63,6 +76,67 @@ class Ingredient(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Запросы рецептов для чтения без лишних обращений к БД."""
+
+    def with_related(self):
+        """Подгружает автора, теги и ингредиенты рецептов."""
+        return self.defer('search_vector').select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient'),
+            ),
+        )
+
+    def with_user_flags(self, user):
+        """Добавляет флаги избранного, корзины и подписки для user."""
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+                is_subscribed=Value(False, output_field=BooleanField()),
+            )
+        return self.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_subscribed=Exists(
+                Subscribe.objects.filter(user=user, author=OuterRef('author'))
+            ),
+        )
+
+    def update_search_vector(self):
+        """Пересчитывает search_vector по названию, описанию и ингредиентам.
+
+        Полнотекстовый поиск есть только в PostgreSQL, в остальных БД
+        поиск работает через icontains и вектор не нужен.
+        """
+        if connection.vendor != 'postgresql':
+            return 0
+        ingredient_names = RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk')
+        ).values('recipe').annotate(
+            names=StringAgg('ingredient__name', delimiter=' ')
+        ).values('names')
+        return self.update(
+            search_vector=(
+                SearchVector('name', weight='A', config=SEARCH_CONFIG)
+                + SearchVector(
+                    Subquery(ingredient_names),
+                    weight='B',
+                    config=SEARCH_CONFIG,
+                )
+                + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+            )
+        )
+
+
 class Recipe(models.Model):
     """Модель рецепт"""
 
@@ -72,6 +146,27 @@ class Recipe(models.Model):
     image = models.ImageField(
         upload_to='recipes/', null=True, blank=True, verbose_name='Изображение'
     )
+    image_thumbnail = models.ImageField(
+        upload_to='recipes/variants/',
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Миниатюра',
+    )
+    image_medium = models.ImageField(
+        upload_to='recipes/variants/',
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Изображение среднего размера',
+    )
+    image_webp = models.ImageField(
+        upload_to='recipes/variants/',
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Изображение WebP',
+    )
     author = models.ForeignKey(
         CustomUser,
         on_delete=models.CASCADE,
@@ -106,9 +201,45 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации',
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в избранное',
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в список покупок',
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор',
+    )
+    similar_built_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Дата расчета похожих рецептов',
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='recipe_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx',
+            ),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -138,6 +269,11 @@ class Favorite(models.Model):
                 fields=['user', 'recipe'], name='unique_user_recipe'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'], name='favorite_recipe_user_idx'
+            ),
+        ]
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранные'
 
@@ -167,6 +303,39 @@ class ShoppingCart(models.Model):
                 fields=['user', 'recipe'], name='unique_shopping_cart_item'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'], name='cart_recipe_user_idx'
+            ),
+        ]
+
+
+class RecipeSimilarity(models.Model):
+    """Модель похожего рецепта, рассчитывается командой similar_recipes"""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similarities',
+        verbose_name='Рецепт',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт',
+    )
+    rank = models.PositiveSmallIntegerField(verbose_name='Место')
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'rank'], name='unique_recipe_similar_rank'
+            )
+        ]
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
 
 
 class RecipeIngredient(models.Model):
@@ -191,5 +360,11 @@ class RecipeIngredient(models.Model):
     )
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'ingredient'],
+                name='unique_recipe_ingredient',
+            )
+        ]
         verbose_name = ('Ингредиент в рецепте',)
         verbose_name_plural = 'Ингредиенты в рецепте'
@@ -0,0 +1,62 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from foodgram.counters import change_counter
+from users.models import CustomUser
+from .models import Favorite, Recipe, ShoppingCart
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Recipe.objects.filter(pk=instance.recipe_id), 'favorites_count', 1
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    change_counter(
+        Recipe.objects.filter(pk=instance.recipe_id), 'favorites_count', -1
+    )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_created(sender, instance, created, **kwargs):
+    if created and instance.recipe_id is not None:
+        change_counter(
+            Recipe.objects.filter(pk=instance.recipe_id), 'in_carts_count', 1
+        )
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_deleted(sender, instance, **kwargs):
+    if instance.recipe_id is not None:
+        change_counter(
+            Recipe.objects.filter(pk=instance.recipe_id), 'in_carts_count', -1
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            CustomUser.objects.filter(pk=instance.author_id),
+            'recipes_count',
+            1,
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    change_counter(
+        CustomUser.objects.filter(pk=instance.author_id), 'recipes_count', -1
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def similar_recipe_deleted(sender, instance, **kwargs):
+    """Рецепты, похожие на удаляемый, пересчитаются при обновлении."""
+    Recipe.objects.filter(similarities__similar=instance).update(
+        similar_built_at=None
+    )
@@ -0,0 +1,213 @@
+import csv
+import io
+from itertools import chain
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from scipy import sparse
+
+from .constants import SIMILAR_RECIPES, SIMILARITY_CHUNK_SIZE
+from .models import Recipe, RecipeIngredient, RecipeSimilarity
+
+# Сходство хранится в float32, этой точности для сравнения достаточно.
+DTYPE = np.float32
+
+
+def fetch_ids(queryset, chunk_size):
+    """Значения values_list(flat=True) в виде массива int64."""
+    return np.fromiter(
+        queryset.iterator(chunk_size=chunk_size), dtype=np.int64
+    )
+
+
+def load_matrix(chunk_size=SIMILARITY_CHUNK_SIZE):
+    """Разреженная матрица рецепт × ингредиент и id рецептов ее строк.
+
+    Ингредиенты взвешены по IDF, поэтому общие для многих рецептов
+    соль и вода мало влияют на сходство. Строки нормированы, и
+    произведение строк равно косинусному сходству рецептов.
+    """
+    pairs = np.fromiter(
+        chain.from_iterable(
+            RecipeIngredient.objects.values_list('recipe_id', 'ingredient_id')
+            .iterator(chunk_size=chunk_size * 10)
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    recipe_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+    ingredient_ids, columns = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=DTYPE), (rows, columns)),
+        shape=(len(recipe_ids), len(ingredient_ids)),
+    )
+    recipes = len(recipe_ids)
+    frequency = np.bincount(columns, minlength=len(ingredient_ids))
+    idf = np.log((1 + recipes) / (1 + frequency)).astype(DTYPE) + 1
+    matrix = matrix @ sparse.diags(idf)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1))).ravel()
+    matrix = sparse.diags(1 / np.maximum(norms, 1e-12)) @ matrix
+    return matrix.astype(DTYPE).tocsr(), recipe_ids
+
+
+def get_scores(matrix, rows):
+    """Сходство строк rows со всеми рецептами, размер len(rows) × N."""
+    return (matrix[rows] @ matrix.T).tocsr()
+
+
+def top_neighbours(scores, rows, count):
+    """count самых похожих рецептов для каждой строки rows.
+
+    Возвращает пары (индексы, сходства) по убыванию сходства, при
+    равенстве - по возрастанию id. Сам рецепт в соседи не входит.
+    """
+    for position, row in enumerate(rows):
+        start, end = scores.indptr[position], scores.indptr[position + 1]
+        columns = scores.indices[start:end]
+        values = scores.data[start:end]
+        other = (columns != row) & (values > 0)
+        columns, values = columns[other], values[other]
+        if len(values) > count:
+            top = np.argpartition(-values, count - 1)[:count]
+            columns, values = columns[top], values[top]
+        order = np.lexsort((columns, -values))
+        yield columns[order], values[order]
+
+
+def insert_rows(rows):
+    """Вставляет строки (recipe_id, similar_id, rank, score) без ORM.
+
+    В PostgreSQL строки загружаются через COPY, в остальных БД - одним
+    executemany: на миллионе строк bulk_create в основном тратит время
+    на создание объектов моделей.
+    """
+    opts = RecipeSimilarity._meta
+    table = connection.ops.quote_name(opts.db_table)
+    columns = ', '.join(
+        connection.ops.quote_name(opts.get_field(name).column)
+        for name in ('recipe', 'similar', 'rank', 'score')
+    )
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            cursor.copy_expert(
+                f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)',
+                buffer,
+            )
+        else:
+            cursor.executemany(
+                f'INSERT INTO {table} ({columns}) VALUES (%s, %s, %s, %s)',
+                rows,
+            )
+
+
+@transaction.atomic
+def save_neighbours(ids, neighbours, built_at):
+    """Заменяет соседей рецептов ids и отмечает время расчета.
+
+    neighbours: пары (id соседей, сходства) в порядке ids.
+    """
+    ids = ids.tolist()
+    RecipeSimilarity.objects.filter(recipe_id__in=ids).delete()
+    rows = [
+        (pk, similar_id, rank, score)
+        for pk, (similar_ids, scores) in zip(ids, neighbours)
+        for rank, (similar_id, score) in enumerate(
+            zip(similar_ids.tolist(), scores.tolist()), 1
+        )
+    ]
+    if rows:
+        insert_rows(rows)
+    Recipe.objects.filter(id__in=ids).update(similar_built_at=built_at)
+
+
+def get_affected_rows(matrix, recipe_ids, changed_rows, count, chunk_size):
+    """Строки рецептов, чьи соседи могли измениться из-за changed_rows.
+
+    Это рецепты, среди соседей которых есть измененные, и рецепты,
+    для которых измененный рецепт теперь не хуже последнего соседа или
+    у которых меньше count соседей.
+    """
+    changed_ids = recipe_ids[changed_rows].tolist()
+    referencing = set()
+    for start in range(0, len(changed_ids), chunk_size):
+        referencing.update(
+            RecipeSimilarity.objects.filter(
+                similar_id__in=changed_ids[start:start + chunk_size]
+            ).values_list('recipe_id', flat=True)
+        )
+    referencing = np.array(sorted(referencing), dtype=np.int64)
+    referencing = referencing[np.isin(referencing, recipe_ids)]
+    best = np.zeros(len(recipe_ids), dtype=DTYPE)
+    for start in range(0, len(changed_rows), chunk_size):
+        scores = get_scores(matrix, changed_rows[start:start + chunk_size])
+        best = np.maximum(best, scores.max(axis=0).toarray().ravel())
+    candidates = np.flatnonzero(best > 0)
+    candidate_ids = recipe_ids[candidates].tolist()
+    thresholds = dict.fromkeys(candidate_ids, 0.0)
+    for start in range(0, len(candidate_ids), chunk_size):
+        thresholds.update(
+            (row['recipe_id'], row['lowest'] if row['total'] >= count else 0)
+            for row in RecipeSimilarity.objects.filter(
+                recipe_id__in=candidate_ids[start:start + chunk_size]
+            ).values('recipe_id').annotate(
+                total=Count('id'), lowest=Min('score')
+            )
+        )
+    thresholds = np.array(
+        [thresholds[pk] for pk in candidate_ids], dtype=DTYPE
+    )
+    return np.union1d(
+        np.searchsorted(recipe_ids, referencing),
+        candidates[best[candidates] >= thresholds],
+    )
+
+
+def refresh_similar_recipes(full=False, count=SIMILAR_RECIPES,
+                            chunk_size=SIMILARITY_CHUNK_SIZE):
+    """Пересчитывает таблицу похожих рецептов.
+
+    Без full пересчитываются только рецепты, измененные после
+    прошлого расчета, и рецепты, на чьих соседей они влияют. Веса IDF
+    при этом берутся текущие, а сходство остальных рецептов остается
+    посчитанным по прежним весам, поэтому полный расчет стоит время от
+    времени повторять.
+    Матрица сходства считается блоками по chunk_size строк, поэтому
+    в памяти не бывает больше chunk_size × N значений сходства.
+    Возвращает количество пересчитанных рецептов.
+    """
+    built_at = timezone.now()
+    recipes = Recipe.objects.all()
+    if not full:
+        recipes = recipes.filter(
+            Q(similar_built_at__isnull=True)
+            | Q(updated_at__gt=F('similar_built_at'))
+        )
+    changed = fetch_ids(recipes.values_list('id', flat=True), chunk_size)
+    if not len(changed):
+        return 0
+    matrix, recipe_ids = load_matrix(chunk_size)
+    with_ingredients = np.isin(changed, recipe_ids)
+    if not with_ingredients.all():
+        save_neighbours(changed[~with_ingredients], (), built_at)
+    rows = np.searchsorted(recipe_ids, changed[with_ingredients])
+    if not full and len(rows) < len(recipe_ids):
+        rows = np.union1d(rows, get_affected_rows(
+            matrix, recipe_ids, rows, count, chunk_size
+        ))
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        save_neighbours(
+            recipe_ids[chunk],
+            (
+                (recipe_ids[columns], values)
+                for columns, values in top_neighbours(
+                    get_scores(matrix, chunk), chunk, count
+                )
+            ),
+            built_at,
+        )
+    return int((~with_ingredients).sum()) + len(rows)
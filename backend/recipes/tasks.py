@@ -0,0 +1,58 @@
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from .constants import IMAGE_VARIANT_QUALITY, IMAGE_VARIANTS
+from .models import Recipe
+
+
+def make_variant(image, size, image_format):
+    variant = image.copy()
+    variant.thumbnail((size, size))
+    if image_format == 'JPEG' and variant.mode != 'RGB':
+        variant = variant.convert('RGB')
+    buffer = BytesIO()
+    variant.save(
+        buffer, format=image_format, quality=IMAGE_VARIANT_QUALITY,
+        optimize=True,
+    )
+    return ContentFile(buffer.getvalue())
+
+
+def generate_image_variants(recipe_id, stale_files=()):
+    """Создает уменьшенные копии и WebP-версию изображения рецепта.
+
+    Удаляет файлы прежних копий: переданные в stale_files копии
+    замененного изображения и копии от предыдущего запуска задачи.
+    """
+    stale_files = list(stale_files)
+    recipe = Recipe.objects.filter(id=recipe_id).first()
+    if recipe is not None and recipe.image:
+        stale_files += save_variants(recipe)
+    for name in stale_files:
+        default_storage.delete(name)
+
+
+def save_variants(recipe):
+    """Сохраняет копии изображения и возвращает файлы прежних копий."""
+    with recipe.image.open('rb') as file:
+        image = Image.open(file)
+        image.load()
+    base_name = recipe.image.name.rsplit('/', 1)[-1].rsplit('.', 1)[0]
+    update_fields = []
+    replaced = []
+    for name, (size, image_format, extension) in IMAGE_VARIANTS.items():
+        field_name = f'image_{name}'
+        field = getattr(recipe, field_name)
+        if field:
+            replaced.append(field.name)
+        field.save(
+            f'{base_name}_{name}.{extension}',
+            make_variant(image, size, image_format),
+            save=False,
+        )
+        update_fields.append(field_name)
+    recipe.save(update_fields=update_fields)
+    return replaced
@@ -13,6 +13,15 @@ class CustomUser(AbstractUser):
     first_name = models.CharField(max_length=MAX_LENGTH)
     last_name = models.CharField(max_length=MAX_LENGTH)
     password = models.CharField(max_length=MAX_LENGTH)
+    recipes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Подписок'
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -25,6 +34,13 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.username
 
+    def refresh_from_db(self, using=None, fields=None):
+        """Первое обращение к отложенному полю загружает их все сразу."""
+        deferred = self.get_deferred_fields()
+        if fields is not None and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using, fields)
+
 
 class Subscribe(models.Model):
     user = models.ForeignKey(
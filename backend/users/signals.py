@@ -0,0 +1,32 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from foodgram.counters import change_counter
+from .models import CustomUser, Subscribe
+
+
+@receiver(post_save, sender=Subscribe)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            CustomUser.objects.filter(pk=instance.user_id),
+            'following_count',
+            1,
+        )
+        change_counter(
+            CustomUser.objects.filter(pk=instance.author_id),
+            'followers_count',
+            1,
+        )
+
+
+@receiver(post_delete, sender=Subscribe)
+def subscription_deleted(sender, instance, **kwargs):
+    change_counter(
+        CustomUser.objects.filter(pk=instance.user_id), 'following_count', -1
+    )
+    change_counter(
+        CustomUser.objects.filter(pk=instance.author_id),
+        'followers_count',
+        -1,
+    )